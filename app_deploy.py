@@ -1,567 +1,1324 @@
-import streamlit as st
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-import io
-import json
-import os
-import re
-import time
-import google.generativeai as genai
-from PIL import Image
-from streamlit_cropper import st_cropper
-import matplotlib.pyplot as plt
-
-# ==========================================
-# 0. 전역 상수 설정
-# ==========================================
-BUCKET_NAME = "math-problem-collector.firebasestorage.app"
-TEMP_DIR = "temp_images"
-
-# 임시 디렉토리 생성 (필요시)
-os.makedirs(TEMP_DIR, exist_ok=True)
-
-# ==========================================
-# 1. 설정 및 인증 (Configuration & Auth)
-# ==========================================
-st.set_page_config(layout="wide", page_title="Cloud Math Labeler AI+")
-
-@st.cache_resource
-def init_firebase():
-    """
-    Firebase 인증을 세션당 한 번만 수행하여 리소스 낭비를 막습니다.
-    """
-    try:
-        if not firebase_admin._apps:
-            if "firebase" in st.secrets:
-                cred = credentials.Certificate(dict(st.secrets["firebase"]))
-            elif os.path.exists("serviceAccountKey.json"):
-                cred = credentials.Certificate("serviceAccountKey.json")
-            else:
-                return None, None
-            
-            app = firebase_admin.initialize_app(cred, {'storageBucket': BUCKET_NAME})
-            return firestore.client(), storage.bucket()
-        else:
-            return firestore.client(), storage.bucket()
-    except Exception as e:
-        st.error(f"🔥 Firebase 초기화 오류: {e}")
-        return None, None
-
-@st.cache_resource
-def get_drive_service():
-    """
-    구글 드라이브 인증. token_uri 누락 패치 포함.
-    """
-    SCOPES = ['https://www.googleapis.com/auth/drive']
-    creds = None
-    
-    try:
-        if "firebase" in st.secrets:
-            key_dict = dict(st.secrets["firebase"])
-            if "token_uri" not in key_dict:
-                key_dict["token_uri"] = "https://oauth2.googleapis.com/token"
-            
-            creds = service_account.Credentials.from_service_account_info(
-                key_dict, scopes=SCOPES
-            )
-        elif os.path.exists("serviceAccountKey.json"):
-            creds = service_account.Credentials.from_service_account_file(
-                "serviceAccountKey.json", scopes=SCOPES
-            )
-        
-        if creds:
-            return build('drive', 'v3', credentials=creds)
-        return None
-    except Exception as e:
-        st.error(f"🚗 드라이브 인증 오류: {e}")
-        return None
-
-# 리소스 초기화
-db, bucket = init_firebase()
-drive_service = get_drive_service()
-
-if not db or not drive_service:
-    st.error("❌ 치명적 오류: 인증 키를 찾을 수 없거나 올바르지 않습니다.")
-    st.stop()
-
-# ==========================================
-# 2. 로직 및 데이터 처리
-# ==========================================
-
-# 분류 옵션 정의
-OPTIONS = {
-    "subject": ["수학II", "수학I", "미적분", "확률과통계", "기하", "공통수학", "중등수학"],
-    "grade": ["고2", "고1", "고3", "N수", "중등"],
-    "unit_major": [
-        "함수의 극한과 연속", "미분법", "적분법", 
-        "지수함수와 로그함수", "삼각함수", "수열",
-        "순열과 조합", "확률", "통계",
-        "이차곡선", "평면벡터", "공간도형과 공간좌표",
-        "다항식", "방정식과 부등식", "행렬", "집합과 명제", "함수", "기타"
-    ],
-    "difficulty": ["상", "최상(Killer)", "중", "하", "최하"],
-    "question_type": ["추론형", "계산형", "이해형", "문제해결형", "합답형"],
-    "source_org": ["평가원", "교육청", "사관학교/경찰대", "EBS", "내신", "기타"],
-    "concepts": ["샌드위치 정리", "절댓값 함수", "미분계수의 정의", "평균값 정리", "롤의 정리", "사이값 정리", "극대/극소", "변곡점", "정적분 정의", "부분적분", "치환적분", "도함수 활용", "삼수선의 정리", "기타"] 
-}
-
-def list_drive_images(folder_id):
-    try:
-        query = f"'{folder_id}' in parents and (mimeType contains 'image/') and trashed = false"
-        results = drive_service.files().list(
-            q=query, 
-            fields="files(id, name)", 
-            pageSize=100
-        ).execute()
-        return results.get('files', [])
-    except Exception as e:
-        st.error(f"파일 목록 조회 실패: {e}")
-        return []
-
-def download_image_from_drive(file_id):
-    try:
-        request = drive_service.files().get_media(fileId=file_id)
-        file_obj = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_obj, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-        file_obj.seek(0)
-        return Image.open(file_obj)
-    except Exception as e:
-        st.error(f"이미지 다운로드 실패: {e}")
-        return None
-
-def move_file_to_done(file_id, current_folder_id, done_folder_id):
-    try:
-        drive_service.files().update(
-            fileId=file_id,
-            addParents=done_folder_id,
-            removeParents=current_folder_id,
-            fields='id, parents'
-        ).execute()
-        return True
-    except Exception as e:
-        st.error(f"파일 이동 실패: {e}")
-        return False
-
-def upload_image_to_storage(image, filename):
-    img_byte_arr = io.BytesIO()
-    image.save(img_byte_arr, format='JPEG')
-    img_byte_arr = img_byte_arr.getvalue()
-    path = f"cropped_problems/{filename}"
-    blob = bucket.blob(path)
-    blob.upload_from_string(img_byte_arr, content_type='image/jpeg')
-    blob.make_public()
-    return blob.public_url
-
-def extract_gemini(image, options_dict):
-    """
-    이미지를 분석하여 텍스트, 도형 설명 및 카테고리 분류를 수행합니다.
-    [기능 개선]
-    1. LaTeX 백슬래시(\) 파싱 오류 자동 수정
-    2. JSON이 리스트([])로 반환될 경우 자동 언패킹
-    """
-    if "GEMINI_API_KEY" not in st.secrets:
-        return {"error": "API Key Missing in Secrets"}
-
-    try:
-        genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-        
-        generation_config = {
-            "temperature": 0.1, 
-            "response_mime_type": "application/json"
-        }
-        
-        model = genai.GenerativeModel("gemini-2.0-flash", generation_config=generation_config) 
-        
-        options_str = json.dumps(options_dict, ensure_ascii=False, indent=2)
-
-        prompt = f"""
-        당신은 한국의 수학 교육 전문가이자 Python Matplotlib 코딩 전문가입니다.
-        제공된 수학 문제 이미지를 분석하여 다음 작업을 수행하고 JSON으로 반환하세요.
-
-        [작업 1: 텍스트 및 수식 추출]
-        - 문제의 모든 텍스트를 한국어 그대로 추출하세요.
-        - 수식은 LaTeX 포맷($...$)을 사용하세요.
-        - 보기가 있다면 보기까지 모두 포함하세요.
-
-        [작업 2: 도형 설명 (diagram_desc)]
-        - 시각장애인을 위해 그래프나 도형의 생김새를 한국어로 상세히 묘사하세요.
-
-        [작업 3: Python Matplotlib 코드 생성 (diagram_code)]
-        - **매우 중요:** 이 필드는 절대로 비워둘 수 없습니다. ("" 금지)
-        - 문제에 그래프, 도형, 함수식이 조금이라도 보인다면 그것을 그리는 코드를 작성하세요.
-        - 그림이 없는 단순 계산 문제라면, 빈 좌표평면(x축, y축)이라도 그리는 코드를 반드시 넣으세요.
-        - 코드는 `import matplotlib.pyplot as plt`와 `fig, ax = plt.subplots()`를 포함해야 합니다.
-        - plt.show()는 절대 사용하지 마세요.
-        - **핵심:** LaTeX 수식이 포함된 라벨은 반드시 **Raw String**을 사용해야 합니다.
-          (예: label=r'$y=\\frac{{1}}{{2}}x$')
-        - 줄바꿈은 `\\n`으로 이스케이프 처리하세요.
-
-        [작업 4: 자동 분류]
-        - 아래 리스트에서 가장 적절한 값을 선택하세요:
-        {options_str}
-
-        [응답 스키마 (JSON)]
-        {{
-            "problem_text": "...",
-            "diagram_desc": "...",
-            "diagram_code": "...",
-            "subject": "...",
-            "unit_major": "...",
-            "question_type": "...",
-            "concept": "...",
-            "difficulty": "..."
-        }}
-        """
-        
-        response = model.generate_content([prompt, image])
-        text = response.text
-        
-        # 1. 마크다운 제거
-        clean_text = re.sub(r"```json|```", "", text).strip()
-
-        parsed_data = None
-
-        # 2. JSON 파싱 시도 (백슬래시 에러 복구 로직 포함)
-        try:
-            parsed_data = json.loads(clean_text)
-        except json.JSONDecodeError:
-            # Invalid Escape 문자(\alpha 등)를 \\alpha로 치환하여 재시도
-            fixed_text = re.sub(r'\\(?!["\\/bfnrtu])', r'\\\\', clean_text)
-            try:
-                parsed_data = json.loads(fixed_text)
-            except json.JSONDecodeError as e2:
-                return {
-                    "error": f"JSON Parsing Failed: {str(e2)}", 
-                    "problem_text": "", 
-                    "diagram_code": "",
-                    "raw_text_debug": clean_text
-                }
-
-        # 3. [핵심 수정] 리스트([])로 감싸져서 왔을 경우 껍질 벗기기
-        if isinstance(parsed_data, list):
-            if len(parsed_data) > 0:
-                parsed_data = parsed_data[0] # 첫 번째 요소만 추출
-            else:
-                return {"error": "Empty JSON list returned"}
-        
-        return parsed_data
-            
-    except Exception as e:
-        return {
-            "error": f"Logic Failed: {str(e)}", 
-            "problem_text": "", 
-            "diagram_code": "",
-            "raw_text_debug": "Error before parsing"
-        }
-
-def get_index_or_default(options_list, value, default_index=0):
-    """AI가 예측한 값이 리스트에 있으면 그 인덱스를 반환, 없으면 0 반환"""
-    try:
-        return options_list.index(value)
-    except ValueError:
-        return default_index
-
-# ==========================================
-# 3. 메인 UI 레이아웃
-# ==========================================
-st.title("✂️ Smart Math Labeler (AI Classification)")
-
-with st.sidebar:
-    st.header("⚙️ 설정")
-    
-    default_folder = st.secrets.get("DEFAULT_FOLDER_ID", "")
-    done_folder_default = st.secrets.get("DONE_FOLDER_ID", "")
-    
-    folder_id = st.text_input("작업 폴더 ID (Source)", value=default_folder)
-    done_folder_id = st.text_input("완료 폴더 ID (Done)", value=done_folder_default)
-    
-    if st.button("📂 드라이브 불러오기", type="primary"):
-        if folder_id:
-            with st.spinner("파일 스캔 중..."):
-                files = list_drive_images(folder_id)
-                st.session_state['drive_files'] = files
-                st.session_state['idx'] = 0
-                st.session_state.pop('cropped_img', None)
-                st.session_state.pop('extracted', None)
-                st.success(f"{len(files)}개 이미지 발견!")
-        else:
-            st.warning("폴더 ID를 입력하세요.")
-
-    st.markdown("---")
-    
-    c_prev, c_next = st.columns(2)
-    with c_prev:
-        if st.button("◀ 이전"):
-            if st.session_state.get('idx', 0) > 0:
-                st.session_state['idx'] -= 1
-                st.session_state.pop('cropped_img', None)
-                st.session_state.pop('extracted', None)
-                st.rerun()
-    with c_next:
-        if st.button("다음 ▶"):
-            files = st.session_state.get('drive_files', [])
-            if files and st.session_state['idx'] < len(files) - 1:
-                st.session_state['idx'] += 1
-                st.session_state.pop('cropped_img', None)
-                st.session_state.pop('extracted', None)
-                st.rerun()
-
-# ==========================================
-# 4. 작업 공간
-# ==========================================
-if 'drive_files' in st.session_state and st.session_state['drive_files']:
-    files = st.session_state['drive_files']
-    idx = st.session_state['idx']
-    
-    if idx >= len(files):
-        st.session_state['idx'] = 0
-        st.rerun()
-        
-    current_file = files[idx]
-    st.subheader(f"🖼️ [{idx+1}/{len(files)}] {current_file['name']}")
-    
-    if 'current_file_id' not in st.session_state or st.session_state['current_file_id'] != current_file['id']:
-        with st.spinner("이미지 로딩 중..."):
-            img = download_image_from_drive(current_file['id'])
-            if img:
-                st.session_state['original_img'] = img
-                st.session_state['current_file_id'] = current_file['id']
-                st.session_state.pop('cropped_img', None)
-                st.session_state.pop('extracted', None)
-    
-    if 'original_img' in st.session_state:
-        st.info("💡 문제 영역을 드래그하세요.")
-        cropped_img = st_cropper(
-            st.session_state['original_img'],
-            realtime_update=True,
-            box_color='#FF0000',
-            aspect_ratio=None
-        )
-        
-        col_view, col_action = st.columns([1, 1])
-        with col_view:
-            st.image(cropped_img, width="stretch")
-        with col_action:
-            if st.button("✨ AI 분석 및 자동 분류", type="primary"):
-                with st.spinner("Gemini가 문제를 풀고 분류 중입니다..."):
-                    st.session_state['cropped_img'] = cropped_img
-                    
-                    extracted_data = extract_gemini(cropped_img, OPTIONS)
-                    
-                    # [디버깅 3] 화면에 디버그용 확장 패널 추가
-                    with st.expander("🕵️‍♂️ AI 응답 데이터 뜯어보기 (Debug)", expanded=True):
-                        st.json(extracted_data) # JSON 구조를 예쁘게 보여줌
-                        
-                        # 만약 에러가 나서 raw_text_debug가 있다면 원본 텍스트 출력
-                        if "raw_text_debug" in extracted_data:
-                            st.warning("⚠️ 파싱 실패한 원본 텍스트:")
-                            st.code(extracted_data["raw_text_debug"], language="text")
-
-                    if "error" in extracted_data:
-                        st.error(extracted_data['error'])
-                    else:
-                        st.session_state['extracted'] = extracted_data
-                        st.success("분석 완료!")
-
-    st.divider()
-
-    # ... (이전 코드: st.cropper 등) ...
-
-    if 'extracted' in st.session_state:
-        item = st.session_state['extracted']
-        
-        # 기본값 로드 (수정 중인 데이터가 날아가지 않게 session state 활용)
-        default_prob = item.get('problem_text', "")
-        default_code = item.get('diagram_code', "")
-        
-        st.divider()
-        st.subheader("📝 데이터 검증 및 저장")
-
-        # 1. 메타데이터 선택 (즉시 반영)
-        c1, c2, c3, c4 = st.columns(4)
-        subject = c1.selectbox("과목", OPTIONS['subject'], index=get_index_or_default(OPTIONS['subject'], item.get("subject")))
-        grade = c2.selectbox("학년", OPTIONS['grade'], index=0)
-        source = c3.selectbox("출처", OPTIONS['source_org'], index=0)
-        unit = c4.selectbox("단원", OPTIONS['unit_major'], index=get_index_or_default(OPTIONS['unit_major'], item.get("unit_major")))
-        
-        c5, c6, c7 = st.columns(3)
-        diff = c5.selectbox("난이도", OPTIONS['difficulty'], index=get_index_or_default(OPTIONS['difficulty'], item.get("difficulty")))
-        q_type = c6.selectbox("유형", OPTIONS['question_type'], index=get_index_or_default(OPTIONS['question_type'], item.get("question_type")))
-        concept = c7.selectbox("핵심 개념", OPTIONS['concepts'], index=get_index_or_default(OPTIONS['concepts'], item.get("concept")))
-
-        st.markdown("---")
-
-        # 2. 실시간 편집 & 미리보기
-        col_edit, col_preview = st.columns(2)
-        
-        with col_edit:
-            st.markdown("#### ✏️ 편집기")
-            prob_text = st.text_area("문제 (LaTeX)", value=default_prob, height=300, key="prob_input")
-            st.caption("도형 Python 코드")
-            diag_code = st.text_area("Matplotlib Code", value=default_code, height=200, key="code_input")
-            diag_desc = st.text_area("도형 설명 (텍스트)", value=item.get('diagram_desc', ""), height=100)
-
-        with col_preview:
-            st.markdown("#### 👁️ 미리보기")
-            if prob_text:
-                st.info("수식 렌더링 확인")
-                st.markdown(prob_text)
-            else:
-                st.warning("텍스트가 없습니다.")
-            
-            if diag_code and "plt" in diag_code:
-                st.markdown("---")
-                st.info("📊 그래프 렌더링 확인")
-                try:
-                    local_vars = {}
-                    
-                    # 1. plt.show() 주석 처리 (Streamlit 간섭 방지)
-                    safe_code = diag_code.replace("plt.show()", "# plt.show()")
-                    
-                    # 2. 코드 실행
-                    # exec는 로컬 툴에서만 허용 (보안 유의)
-                    exec(safe_code, globals(), local_vars)
-                    
-                    # [Linus Coach Fix] 'fig' 변수가 없어도 그림을 찾아내는 로직
-                    target_fig = None
-                    if 'fig' in local_vars:
-                        target_fig = local_vars['fig']
-                    elif len(plt.get_fignums()) > 0:
-                        # 변수명이 fig가 아니거나 없어도, 현재 활성화된 그림(Figure)을 강제로 가져옴
-                        target_fig = plt.gcf()
-                    
-                    if target_fig:
-                        # 1. 메모리 버퍼 생성
-                        import io
-                        buf = io.BytesIO()
-                        
-                        # 2. 그래프를 버퍼에 PNG 포맷으로 저장 (고해상도, 여백 제거)
-                        target_fig.savefig(buf, format="png", bbox_inches='tight', dpi=150)
-                        
-                        # 3. 버퍼 포인터 리셋
-                        buf.seek(0)
-                        
-                        # 4. Streamlit 이미지로 출력
-                        st.image(buf, width="stretch")
-                        
-                        # 5. 메모리 해제
-                        plt.close(target_fig)
-                        
-                    else:
-                        st.warning("코드는 실행되었으나 그려진 그래프(Figure)를 찾을 수 없습니다.")
-                        
-                except Exception as e:
-                    st.error(f"그래프 오류: {e}")
-
-        st.markdown("---")
-        
-        # ==========================================
-        # 3. 버튼 분리 (핵심 변경 사항)
-        # ==========================================
-        col_btn_save, col_btn_move = st.columns([1, 1])
-
-        # [버튼 1] 데이터 저장만 수행 (이동 X, 리프레시 X)
-        with col_btn_save:
-            if st.button("💾 데이터 저장 (DB Save)", type="secondary", width="stretch"):
-                if 'cropped_img' not in st.session_state:
-                    st.error("이미지 세션 만료")
-                else:
-                    try:
-                        with st.spinner("데이터베이스에 저장 중..."):
-                            # 1. 이미지 업로드
-                            timestamp = int(time.time())
-                            clean_name = re.sub(r'[^a-zA-Z0-9가-힣_-]', '', current_file['name'].rsplit('.', 1)[0])
-                            img_filename = f"{clean_name}_{timestamp}.jpg"
-                            img_url = upload_image_to_storage(st.session_state['cropped_img'], img_filename)
-                            
-                            # 2. Firestore 저장
-                            doc_data = {
-                                "original_filename": current_file['name'],
-                                "drive_file_id": current_file['id'],
-                                "image_url": img_url,
-                                "storage_path": f"cropped_problems/{img_filename}",
-                                "meta": {
-                                    "subject": subject, "grade": grade, "source": source,
-                                    "unit": unit, "difficulty": diff, "question_type": q_type,
-                                    "concept": concept
-                                },
-                                "content": {
-                                    "problem": prob_text, 
-                                    "diagram_desc": diag_desc,
-                                    "diagram_code": diag_code
-                                },
-                                "created_at": firestore.SERVER_TIMESTAMP,
-                                "labeler_version": "v3.2-split-actions"
-                            }
-                            db.collection("math_dataset").add(doc_data)
-                            
-                            # 성공 표시 (저장되었다는 플래그 설정)
-                            st.session_state['is_saved'] = True
-                            st.toast("✅ 데이터가 안전하게 저장되었습니다!", icon="💾")
-                            st.success("저장 완료. 더 수정하거나 '완료 처리'를 눌러 넘어가세요.")
-                            
-                    except Exception as e:
-                        st.error(f"저장 실패: {e}")
-
-        # [버튼 2] 파일 이동 및 다음 사진 (저장 로직 없음)
-        with col_btn_move:
-            # 저장을 안 했으면 경고를 띄워주기 위해 help 메시지 추가
-            btn_label = "✅ 완료 및 다음 파일 (Move & Next)"
-            if not st.session_state.get('is_saved', False):
-                btn_label += " [⚠️미저장 상태]"
-            
-            if st.button(btn_label, type="primary", width="stretch"):
-                # 안전장치: 저장을 안 했는데 이동하려고 하면 경고
-                if not st.session_state.get('is_saved', False):
-                    st.warning("⚠️ 데이터를 아직 저장하지 않았습니다! 먼저 '데이터 저장'을 눌러주세요.")
-                    st.stop()
-                
-                if done_folder_id:
-                    with st.spinner("파일 정리 중..."):
-                        success = move_file_to_done(current_file['id'], folder_id, done_folder_id)
-                        if success:
-                            st.toast("🚀 파일 이동 완료! 다음 문제로 넘어갑니다.")
-                            # 로컬 리스트 업데이트
-                            st.session_state['drive_files'].pop(idx)
-                            # 상태 초기화
-                            st.session_state.pop('cropped_img', None)
-                            st.session_state.pop('extracted', None)
-                            st.session_state.pop('is_saved', None) # 저장 플래그 초기화
-                            
-                            time.sleep(0.5)
-                            st.rerun()
-                        else:
-                            st.error("파일 이동 실패 (권한을 확인하세요)")
-                else:
-                    st.error("완료 폴더(Done Folder ID)가 설정되지 않았습니다.")
-
-else:
-    st.info("👈 드라이브 연결 필요")
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+import streamlit as st
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+# firebase_admin / googleapiclient / streamlit_cropper 등 무거운 모듈은 처음 쓰는 함수 안에서 import 합니다.
+# (콜드 스타트 시 사이드바가 클라우드 클라이언트 생성보다 먼저 그려지도록)
+
+import drive_io
+import extraction
+import labeling
+import metrics
+import preprocess
+from drafts import FirestoreDraftStore, JsonlDraftStore, usable
+from extraction_cache import ExtractionCache
+from image_cache import DiskImageCache, file_version
+from leases import DEFAULT_TTL, FirestoreLeaseStore, MemoryLeaseStore
+from diagram_render import DiagramRenderer
+from drive_sync import FolderSync
+from duplicate_index import DEFAULT_TOLERANCE, DuplicateIndex, labels_from_doc
+from move_queue import MoveBatcher
+from prefetch import ImagePrefetcher
+from save_queue import SaveQueue
+
+# ==========================================
+# 0. 전역 상수 설정
+# ==========================================
+BUCKET_NAME = "math-problem-collector.firebasestorage.app"
+TEMP_DIR = "temp_images"
+PREFETCH_WORKERS = 4  # 백그라운드 다운로드 스레드 수 (전체 세션 공유)
+IMAGE_CACHE_MB = 1024  # TEMP_DIR 원본 이미지 캐시 용량 (기본값, secrets로 변경 가능)
+EXTRACTION_CACHE_PATH = "extraction_cache.sqlite3"  # AI 분석 결과 캐시
+SAVE_QUEUE_PATH = "save_queue.sqlite3"  # 저장 대기열 (업로드/DB 기록 전 로컬 보관)
+LEASE_BATCH = 5  # 세션마다 임대해 두는 파일 수 (secrets LEASE_BATCH로 변경 가능)
+DRIVE_SYNC_DIR = "drive_sync"  # 폴더별 목록 스냅숏 + 변경 피드 토큰
+DRIVE_POLL_SECONDS = 30  # 작업 폴더 변경 확인 간격 (secrets DRIVE_POLL_SECONDS로 변경 가능)
+
+# 임시 디렉토리 생성 (필요시)
+os.makedirs(TEMP_DIR, exist_ok=True)
+
+# ==========================================
+# 1. 설정 및 인증 (Configuration & Auth)
+# ==========================================
+st.set_page_config(layout="wide", page_title="Cloud Math Labeler AI+")
+
+def use_fake_backends():
+    """secrets에 FAKE_BACKENDS = true 이면 인증 키 없이 fakes.py의 가짜 드라이브/Firebase/Gemini로 실행합니다."""
+    return bool(st.secrets.get("FAKE_BACKENDS", False))
+
+@st.cache_resource
+def get_fake_backends():
+    """
+    로컬 시연/측정용 가짜 백엔드 (모든 세션 공유).
+    작업 폴더 'fake-src'에 합성 스캔 FAKE_IMAGES장, 완료 폴더는 'fake-done'.
+    FAKE_LATENCY: 모델 응답 지연(초), 드라이브/Storage는 그 1/10
+    """
+    from fakes import FakeBucket, FakeDriveService, FakeFirestore, FakeGenerativeModel
+
+    latency = float(st.secrets.get("FAKE_LATENCY", 1.0))
+    drive = FakeDriveService.with_images("fake-src", int(st.secrets.get("FAKE_IMAGES", 200)), page_size=(1654, 2339))
+    drive.download_latency = drive.list_latency = drive.latency = latency / 10
+    return {
+        "drive": drive,
+        "db": FakeFirestore(latency=latency / 10),
+        "bucket": FakeBucket(BUCKET_NAME, latency=latency / 10),
+        "model": FakeGenerativeModel(latency=latency),
+    }
+
+@st.cache_resource
+def init_firebase():
+    """
+    Firebase 인증을 세션당 한 번만 수행하여 리소스 낭비를 막습니다.
+    """
+    if use_fake_backends():
+        return get_fake_backends()["db"], get_fake_backends()["bucket"]
+    import firebase_admin
+    from firebase_admin import credentials, firestore, storage
+
+    try:
+        if not firebase_admin._apps:
+            if "firebase" in st.secrets:
+                cred = credentials.Certificate(dict(st.secrets["firebase"]))
+            elif os.path.exists("serviceAccountKey.json"):
+                cred = credentials.Certificate("serviceAccountKey.json")
+            else:
+                return None, None
+            
+            app = firebase_admin.initialize_app(cred, {'storageBucket': BUCKET_NAME})
+            return firestore.client(), storage.bucket()
+        else:
+            return firestore.client(), storage.bucket()
+    except Exception as e:
+        st.error(f"🔥 Firebase 초기화 오류: {e}")
+        return None, None
+
+@st.cache_resource
+def get_drive_credentials():
+    """
+    구글 드라이브 인증. token_uri 누락 패치 포함.
+    """
+    SCOPES = ['https://www.googleapis.com/auth/drive']
+    if use_fake_backends():
+        return get_fake_backends()["drive"]
+    from google.oauth2 import service_account
+    
+    try:
+        if "firebase" in st.secrets:
+            key_dict = dict(st.secrets["firebase"])
+            if "token_uri" not in key_dict:
+                key_dict["token_uri"] = "https://oauth2.googleapis.com/token"
+            
+            return service_account.Credentials.from_service_account_info(
+                key_dict, scopes=SCOPES
+            )
+        elif os.path.exists("serviceAccountKey.json"):
+            return service_account.Credentials.from_service_account_file(
+                "serviceAccountKey.json", scopes=SCOPES
+            )
+        return None
+    except Exception as e:
+        st.error(f"🚗 드라이브 인증 오류: {e}")
+        return None
+
+def build_drive_service(creds):
+    """캐시 없이 새 드라이브 서비스를 만듭니다 (백그라운드 스레드 전용 인스턴스용)."""
+    if hasattr(creds, "files"):
+        return creds  # 가짜 백엔드: 인증 정보 자리에 서비스 자체가 들어 있습니다 (스레드 간 공유 가능)
+    from googleapiclient.discovery import build
+
+    return build('drive', 'v3', credentials=creds)
+
+@st.cache_resource
+def get_drive_service():
+    creds = get_drive_credentials()
+    if creds:
+        return build_drive_service(creds)
+    return None
+
+def get_db():
+    return init_firebase()[0]
+
+def get_bucket():
+    return init_firebase()[1]
+
+# ==========================================
+# 2. 로직 및 데이터 처리
+# ==========================================
+
+# 분류 옵션 정의 (extraction.py와 공유)
+OPTIONS = extraction.OPTIONS
+
+@st.cache_resource
+def get_metrics_sink():
+    """
+    외부 지표 수집기 (선택). secrets의 METRICS_SINK:
+    "statsd://host:8125" 또는 "모듈:함수" (함수는 sink(stage, seconds, tags) 형태)
+    """
+    try:
+        return metrics.load_sink(st.secrets.get("METRICS_SINK"))
+    except Exception as e:
+        st.error(f"METRICS_SINK 설정 오류: {e}")
+        return None
+
+@st.cache_resource
+def get_background_metrics():
+    """백그라운드 작업(다운로드/업로드/DB 기록/이동 배치) 지연 시간 (모든 세션 공유)"""
+    return metrics.SpanRecorder(sink=get_metrics_sink())
+
+background_metrics = get_background_metrics()
+
+def session_metrics():
+    """화면에서 기다린 시간 기준의 세션별 지연 시간"""
+    recorder = st.session_state.get('metrics')
+    if recorder is None:
+        recorder = st.session_state['metrics'] = metrics.SpanRecorder(sink=get_metrics_sink())
+    return recorder
+
+def list_drive_images(folder_id):
+    """폴더의 모든 이미지를 반환합니다 (nextPageToken을 끝까지 추적)."""
+    try:
+        return list(drive_io.iter_drive_images(get_drive_service(), folder_id))
+    except Exception as e:
+        st.error(f"파일 목록 조회 실패: {e}")
+        return []
+
+def load_drive_pages(folder_id, page_token=None, max_pages=None, on_page=None):
+    """
+    드라이브 목록을 페이지 단위로 받아 st.session_state['folder_files']에 바로 이어 붙입니다.
+    (이 세션이 작업할 파일은 여기서 임대받아 'drive_files'로 옮깁니다. claim_files 참고)
+    다음 페이지 토큰은 'drive_page_token'에 저장되므로 중간에 rerun 되어도 이어서 불러옵니다.
+    """
+    pages = 0
+    try:
+        for files, next_token in drive_io.iter_drive_image_pages(get_drive_service(), folder_id, page_token=page_token):
+            st.session_state.setdefault('folder_files', []).extend(files)
+            st.session_state['drive_page_token'] = next_token
+            pages += 1
+            if on_page:
+                on_page(len(st.session_state['folder_files']))
+            if max_pages and pages >= max_pages:
+                break
+    except Exception as e:
+        st.session_state['drive_page_token'] = None
+        st.session_state.pop('drive_sync_token', None)
+        st.error(f"파일 목록 조회 실패: {e}")
+        return
+    if not st.session_state.get('drive_page_token') and 'drive_sync_token' in st.session_state:
+        # 전체 목록이 끝났으면 목록을 받기 전에 잡아 둔 토큰과 함께 스냅숏으로 저장 → 이후로는 변경분만 받습니다
+        st.session_state['drive_sync_version'] = get_folder_sync(folder_id).reset(
+            st.session_state['folder_files'], st.session_state.pop('drive_sync_token')
+        )
+
+@st.cache_resource
+def get_folder_sync(folder_id):
+    """작업 폴더 목록 + 변경 피드 토큰 (모든 세션 공유). 가짜 백엔드는 프로세스마다 새로 만들어지므로 파일에 저장하지 않습니다."""
+    path = None
+    if not use_fake_backends():
+        os.makedirs(DRIVE_SYNC_DIR, exist_ok=True)
+        path = os.path.join(DRIVE_SYNC_DIR, "".join(c if c.isalnum() or c in "-_" else "_" for c in folder_id) + ".json")
+    return FolderSync(folder_id, path)
+
+def open_folder(folder_id):
+    """
+    작업 폴더 목록을 세션에 채웁니다.
+    이전에 받은 스냅숏이 있으면 변경분만 받아 반영하고, 없으면 변경 피드 토큰을 먼저 잡은 뒤 전체 목록을 페이지 단위로 받습니다.
+    """
+    sync = get_folder_sync(folder_id)
+    st.session_state.pop('drive_sync_version', None)
+    st.session_state.pop('drive_sync_token', None)
+    if sync.ready:
+        try:
+            sync.poll(get_drive_service(), metrics=session_metrics())
+            st.session_state['folder_files'], st.session_state['drive_sync_version'] = sync.snapshot()
+            st.session_state['drive_page_token'] = None
+            return
+        except Exception as e:
+            st.warning(f"드라이브 변경 확인 실패, 전체 목록을 다시 받습니다: {e}")
+    try:
+        st.session_state['drive_sync_token'] = drive_io.start_page_token(get_drive_service())
+    except Exception as e:
+        st.warning(f"변경 피드를 쓸 수 없어 목록 자동 갱신을 끕니다: {e}")
+    load_drive_pages(folder_id, max_pages=1)
+
+def drop_session_files(removed):
+    """
+    이 세션의 작업 목록('drive_files')에서 removed(id 집합)를 뺍니다. 보고 있는 파일(idx)은 그대로 유지합니다.
+    반환: (뺀 파일 목록, 보고 있던 파일이 빠졌으면 그 파일 아니면 None)
+    """
+    files = st.session_state.get('drive_files', [])
+    lost = [f for f in files if f['id'] in removed]
+    if not lost:
+        return lost, None
+    idx = st.session_state.get('idx', 0)
+    current = files[idx] if idx < len(files) and files[idx]['id'] in removed else None
+    # 현재 파일 앞에서 빠진 만큼 idx를 당겨 같은 파일을 계속 보게 합니다
+    st.session_state['idx'] = max(0, idx - sum(1 for f in files[:idx] if f['id'] in removed))
+    st.session_state['drive_files'] = [f for f in files if f['id'] not in removed]
+    if current is not None:
+        st.session_state.pop('crop_box', None)
+        st.session_state.pop('extracted', None)
+    return lost, current
+
+def merge_folder_changes(upserts, removed):
+    """
+    변경분을 작업 폴더 목록과 이 세션의 작업 목록에 병합합니다. 보고 있는 파일(idx)은 그대로 유지합니다.
+    반환: (새로 들어온 파일 수, 빠진 파일 수)
+    """
+    incoming = {f['id']: f for f in upserts}
+    folder_files = st.session_state.get('folder_files', [])
+    merged = []
+    dropped = 0
+    for f in folder_files:
+        if f['id'] in removed:
+            dropped += 1
+            continue
+        merged.append(incoming.pop(f['id'], f))
+    merged.extend(incoming.values())  # 새 파일은 목록 끝에 (claim_files가 임대해 감)
+    st.session_state['folder_files'] = merged
+    if incoming:
+        st.session_state.pop('lease_retry_at', None)
+
+    lost, current = drop_session_files(removed)
+    if lost:
+        if current is not None:
+            st.warning(f"보고 있던 파일이 작업 폴더에서 빠졌습니다 (다른 곳에서 이동/삭제): {current['name']}")
+        release_leases(lost)
+    updated = {f['id']: f for f in upserts}
+    st.session_state['drive_files'] = [updated.get(f['id'], f) for f in st.session_state.get('drive_files', [])]
+    return len(incoming), dropped
+
+def sync_folder_changes(force=False):
+    """DRIVE_POLL_SECONDS마다 변경 피드를 확인해 작업 폴더에 들어오고 나간 파일만 병합합니다."""
+    folder = st.session_state.get('drive_folder_id')
+    version = st.session_state.get('drive_sync_version')
+    if not folder or version is None:
+        return  # 전체 목록을 받는 중이거나 변경 피드를 쓸 수 없음
+    sync = get_folder_sync(folder)
+    interval = 0 if force else float(st.secrets.get("DRIVE_POLL_SECONDS", DRIVE_POLL_SECONDS))
+    try:
+        sync.poll(get_drive_service(), min_interval=interval, metrics=session_metrics())
+    except Exception as e:
+        st.warning(f"드라이브 변경 확인 실패 (다음 실행 때 다시 시도): {e}")
+        return
+    if sync.version == version:
+        return
+    delta = sync.changes_since(version)
+    if delta is None:
+        # 변경 기록이 잘렸으면 스냅숏과 비교합니다
+        files, latest = sync.snapshot()
+        known = {f['id'] for f in files}
+        current = {f['id'] for f in st.session_state.get('folder_files', [])}
+        delta = [f for f in files if f['id'] not in current], current - known, latest
+    upserts, removed, st.session_state['drive_sync_version'] = delta
+    added, dropped = merge_folder_changes(upserts, removed)
+    if added or dropped:
+        st.toast(f"📂 작업 폴더 변경: 새 파일 {added}개 / 빠진 파일 {dropped}개")
+
+@st.cache_resource
+def get_image_cache():
+    """TEMP_DIR 디스크 캐시 (모든 세션 공유)"""
+    max_mb = int(st.secrets.get("IMAGE_CACHE_MB", IMAGE_CACHE_MB))
+    return DiskImageCache(TEMP_DIR, max_bytes=max_mb * 1024 * 1024)
+
+image_cache = get_image_cache()
+
+def fetch_drive_image(drive_file):
+    """
+    압축 바이트 + cropper용 축소본(PageImage)을 반환합니다. (Streamlit 호출 없음 → 백그라운드 스레드에서 사용 가능)
+    디스크 캐시에 같은 버전이 있으면 드라이브를 거치지 않습니다. (labeling.fetch_page 참고)
+    전체 해상도 디코딩은 분석/저장할 때만 합니다.
+    """
+    return labeling.fetch_page(
+        drive_file, image_cache, lambda: build_drive_service(drive_creds), metrics=background_metrics
+    )
+
+def download_image_from_drive(drive_file):
+    try:
+        return fetch_drive_image(drive_file)
+    except Exception as e:
+        st.error(f"이미지 다운로드 실패: {e}")
+        return None
+
+@st.cache_resource
+def get_prefetch_executor():
+    """모든 세션이 공유하는 다운로드 스레드 풀"""
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+def get_prefetcher(depth):
+    """
+    세션별 프리페처. 스레드 풀은 공유하고, 예약 상태만 세션에 둡니다.
+    이미지와 함께 사전 분석 결과도 받아 (page, draft)로 돌려줍니다 (화면 전환 중 Firestore 조회를 없앰).
+    """
+    prefetcher = st.session_state.get('prefetcher')
+    if prefetcher is None:
+        draft_store = get_draft_store()
+        prefetcher = ImagePrefetcher(
+            lambda f: (fetch_drive_image(f), lookup_draft(draft_store, f)),
+            depth=depth, executor=get_prefetch_executor(), key=lambda f: f['id']
+        )
+        st.session_state['prefetcher'] = prefetcher
+    prefetcher.depth = depth
+    return prefetcher
+
+@st.cache_resource
+def get_move_batcher():
+    """완료 폴더 이동 배치 처리기 (모든 세션 공유, N건 또는 일정 시간마다 배치 요청으로 전송)"""
+    creds = get_drive_credentials()
+    lease_store = get_lease_store()
+
+    def settle_leases(owner, file_ids, moved):
+        # 이동이 확인된 파일만 완료로 반납하고, 최종 실패한 파일은 보통 반납합니다 (reconcile_failed_moves가 다시 잡음).
+        # 이동 전에 프로세스가 끝나면 임대가 완료로 남지 않아 ttl 뒤에 다른 세션이 다시 가져갈 수 있습니다.
+        try:
+            lease_store.release(owner, file_ids, done=moved)
+        except Exception:
+            pass
+
+    return MoveBatcher(
+        lambda: build_drive_service(creds),
+        batch_size=int(st.secrets.get("MOVE_BATCH_SIZE", 20)),
+        flush_interval=float(st.secrets.get("MOVE_FLUSH_SECONDS", 3)),
+        metrics=background_metrics,
+        on_settled=settle_leases,
+    ).start()
+
+
+def session_token():
+    """배치 이동 실패를 요청한 세션에 되돌려주기 위한 세션 식별자"""
+    return st.session_state.setdefault('session_token', uuid.uuid4().hex)
+
+@st.cache_resource
+def get_lease_store():
+    """
+    파일 임대 저장소 (모든 세션 공유). 같은 작업 폴더를 여러 라벨러가 열어도 서로 다른 파일을 받습니다.
+    LEASE_TTL: 갱신이 끊긴 임대가 풀리기까지의 시간(초)
+    """
+    ttl = float(st.secrets.get("LEASE_TTL", DEFAULT_TTL))
+    if use_fake_backends():
+        return MemoryLeaseStore(ttl=ttl)
+    return FirestoreLeaseStore(get_db(), ttl=ttl)
+
+def claim_files(retry_after=30):
+    """
+    작업 폴더 목록에서 임대를 받아 이 세션의 작업 목록('drive_files')을 LEASE_BATCH개까지 채웁니다.
+    다른 세션이 모두 가져가 더 받을 파일이 없으면 retry_after초 동안은 다시 묻지 않습니다.
+    """
+    files = st.session_state.setdefault('drive_files', [])
+    need = int(st.secrets.get("LEASE_BATCH", LEASE_BATCH)) - len(files)
+    if need <= 0 or time.time() < st.session_state.get('lease_retry_at', 0):
+        return 0
+    held = {f['id'] for f in files}
+    candidates = [f for f in st.session_state.get('folder_files', []) if f['id'] not in held]
+    if not candidates:
+        return 0
+    try:
+        claimed = set(get_lease_store().claim(session_token(), [f['id'] for f in candidates], need))
+    except Exception as e:
+        st.error(f"작업 임대 실패: {e}")
+        return 0
+    files.extend(f for f in candidates if f['id'] in claimed)
+    if len(claimed) < need and not st.session_state.get('drive_page_token'):
+        st.session_state['lease_retry_at'] = time.time() + retry_after
+    st.session_state['lease_renewed'] = time.time()
+    return len(claimed)
+
+def renew_leases():
+    """
+    작업 중인 파일의 임대를 ttl의 1/3마다 갱신합니다.
+    갱신이 늦어 다른 세션이 가져간 파일은 작업 목록에서 뺍니다.
+    """
+    store = get_lease_store()
+    files = st.session_state.get('drive_files', [])
+    if not files or time.time() - st.session_state.get('lease_renewed', 0) < store.ttl / 3:
+        return
+    try:
+        held = set(store.renew(session_token(), [f['id'] for f in files]))
+    except Exception as e:
+        st.warning(f"작업 임대 갱신 실패 (다음 실행 때 다시 시도): {e}")
+        return
+    st.session_state['lease_renewed'] = time.time()
+    lost, _ = drop_session_files({f['id'] for f in files} - held)
+    if lost:
+        st.warning(f"임대가 만료되어 다른 라벨러에게 넘어간 파일 {len(lost)}개를 목록에서 뺐습니다: "
+                   + ", ".join(f['name'] for f in lost))
+
+def release_leases(drive_files, done=False):
+    """임대 반납. 실패해도 ttl이 지나면 풀리므로 작업은 계속합니다."""
+    if not drive_files:
+        return
+    try:
+        get_lease_store().release(session_token(), [f['id'] for f in drive_files], done=done)
+    except Exception:
+        pass
+
+def move_file_to_done(drive_file, current_folder_id, done_folder_id):
+    """이동을 예약만 하고 바로 반환합니다. 실제 이동은 배치로 처리됩니다."""
+    try:
+        with session_metrics().span("move_enqueue"):
+            get_move_batcher().enqueue(drive_file, current_folder_id, done_folder_id, owner=session_token())
+        return True
+    except Exception as e:
+        st.error(f"파일 이동 실패: {e}")
+        return False
+
+def reconcile_failed_moves():
+    """최종 실패한 이동 파일을 로컬 목록에 되돌려 놓습니다."""
+    failed = get_move_batcher().take_failed(session_token())
+    if not failed:
+        return
+    # 배치 처리기가 임대를 보통 반납해 두었으므로 다시 잡고, 그사이 다른 세션이 가져간 파일은 그쪽에 맡깁니다
+    failed_ids = [item['file']['id'] for item in failed]
+    try:
+        claimed = set(get_lease_store().claim(session_token(), failed_ids, len(failed_ids)))
+    except Exception as e:
+        st.warning(f"작업 임대 실패: {e}")
+        claimed = set()
+    files = st.session_state.setdefault('drive_files', [])
+    known = {f['id'] for f in files}
+    for item in failed:
+        if item['file']['id'] in claimed and item['file']['id'] not in known:
+            files.append(item['file'])
+    names = ", ".join(item['file'].get('name', item['file']['id']) for item in failed)
+    st.error(f"파일 이동 실패 (권한을 확인하세요): {names} — 목록 끝에 다시 추가했습니다. ({failed[-1]['error']})")
+
+def saved_drive_file_ids():
+    """math_dataset에 저장된(또는 저장 대기열에 있는) 드라이브 파일 ID"""
+    ids = {
+        snap.get("drive_file_id")
+        for snap in get_db().collection("math_dataset").select(["drive_file_id"]).stream()
+    }
+    return (ids | get_save_queue().queued_drive_file_ids()) - {None}
+
+def move_all_saved_files(folder_id, done_folder_id, on_progress=None, timeout=60):
+    """
+    작업 폴더에 남아 있지만 이미 저장된 파일을 한꺼번에 완료 폴더로 옮깁니다 (오프라인 작업 후 정리용).
+    다른 세션이 임대해 작업 중인 파일과 이 세션이 지금 보고 있는 파일은 (영역을 더 자르는 중일 수 있어) 건너뜁니다.
+    반환: 이동이 확인된 파일 수 (최종 실패했거나 timeout까지 확정되지 않은 파일은 목록에 남음)
+    """
+    saved = saved_drive_file_ids()
+    batcher = get_move_batcher()
+    skip = batcher.pending_ids() | {st.session_state.get('current_file_id')}
+    targets = [f for f in list_drive_images(folder_id) if f['id'] in saved and f['id'] not in skip]
+    try:
+        busy = get_lease_store().held_by_others(session_token(), [f['id'] for f in targets])
+    except Exception as e:
+        st.error(f"작업 임대 확인 실패: {e}")
+        return 0
+    targets = [f for f in targets if f['id'] not in busy]
+    for f in targets:
+        batcher.enqueue(f, folder_id, done_folder_id, owner=session_token())
+    batcher.flush_all(on_progress=on_progress)
+    # 백그라운드 스레드가 보내는 중인 이동까지 확정을 기다린 뒤, 실제로 옮겨진 파일만 목록에서 뺍니다
+    # (실패한 파일은 reconcile_failed_moves가 오류를 보여줌)
+    moved_ids = batcher.wait_settled([f['id'] for f in targets], timeout=timeout)
+    drop_session_files(moved_ids)
+    st.session_state['folder_files'] = [f for f in st.session_state.get('folder_files', []) if f['id'] not in moved_ids]
+    return len(moved_ids)
+
+def preprocess_profile(name, base):
+    """secrets의 [preprocess_model] / [preprocess_storage] 섹션으로 전처리 설정을 덮어씁니다."""
+    return dict(base, **dict(st.secrets.get(name, {})))
+
+def format_payload(stats):
+    # bytes_before는 prepare(measure=True)일 때만 있습니다 (앱은 측정하지 않음)
+    after = f"{stats['bytes_after'] / 1024:.0f}KB"
+    if stats['bytes_before'] is not None:
+        after = f"{stats['bytes_before'] / 1024:.0f}KB → {after}"
+    return f"{after} ({stats['format']}, {stats['content']}, {stats['size']})"
+
+@st.cache_resource
+def get_save_queue():
+    """Write-behind 저장 대기열 (모든 세션 공유, 백그라운드 스레드가 Storage/Firestore로 flush)"""
+    from firebase_admin import firestore
+
+    return SaveQueue(
+        SAVE_QUEUE_PATH, get_db(), get_bucket(), server_timestamp=firestore.SERVER_TIMESTAMP,
+        metrics=background_metrics,
+    ).start()
+
+
+@st.cache_resource
+def get_extraction_cache():
+    """
+    AI 분석 결과 캐시 (모든 세션 공유).
+    EXTRACTION_CACHE_TOLERANCE: dHash 해밍 거리 허용치 (0 = 완전히 같은 crop만 재사용)
+    """
+    return ExtractionCache(
+        EXTRACTION_CACHE_PATH,
+        max_bytes=int(st.secrets.get("EXTRACTION_CACHE_MB", 64)) * 1024 * 1024,
+        tolerance=int(st.secrets.get("EXTRACTION_CACHE_TOLERANCE", 0)),
+    )
+
+@st.cache_resource
+def get_extraction_engine():
+    """
+    모델 설정 + 프롬프트 렌더링을 한 번만 수행한 추출 엔진 (모든 세션 공유).
+    GEMINI_SCHEMA = true면 OPTIONS로 만든 응답 스키마를 보내 분류 값을 목록 안으로 제한합니다.
+    GEMINI_RECORD_PATH: 모델 원본 응답을 남길 JSONL 경로 (파서 벤치마크용, 선택)
+    """
+    options = dict(structured=bool(st.secrets.get("GEMINI_SCHEMA", False)),
+                   record_path=st.secrets.get("GEMINI_RECORD_PATH"))
+    if use_fake_backends():
+        return extraction.ExtractionEngine(get_fake_backends()["model"], **options)
+    return extraction.ExtractionEngine.from_api_key(
+        st.secrets["GEMINI_API_KEY"],
+        timeout=float(st.secrets.get("GEMINI_TIMEOUT", 60)),
+        max_retries=int(st.secrets.get("GEMINI_MAX_RETRIES", 2)),
+        **options,
+    )
+
+def extract_gemini(image, force=False, on_partial=None):
+    """
+    이미지를 분석하여 텍스트, 도형 설명 및 카테고리 분류를 수행합니다.
+    (프롬프트/파싱 로직은 extraction.py 참고)
+    같은 crop + 같은 프롬프트 버전 + 같은 모델의 결과는 캐시에서 바로 반환합니다. force=True면 캐시를 건너뜁니다.
+    on_partial을 주면 스트리밍으로 호출하여 응답 조각마다 지금까지 도착한 필드를 넘겨줍니다. (GEMINI_STREAM = false로 끌 수 있음)
+    """
+    if "GEMINI_API_KEY" not in st.secrets and not use_fake_backends():
+        return {"error": "API Key Missing in Secrets"}
+
+    try:
+        with session_metrics().span("extract") as tags:
+            engine = get_extraction_engine()
+            cache = get_extraction_cache()
+            if not force:
+                cached = cache.get(image, engine.prompt_version, engine.model_name)
+                if cached is not None:
+                    tags["cache"] = "hit"
+                    return cached
+
+            # 축소/흑백화/포맷 선택 후 전송 (캐시 키는 원본 crop 기준)
+            prepared = preprocess.prepare(image, preprocess_profile("preprocess_model", preprocess.MODEL_PROFILE))
+            st.session_state['model_payload'] = prepared.stats()
+            if on_partial is not None and st.secrets.get("GEMINI_STREAM", True):
+                started = time.perf_counter()
+                first_text = []
+
+                def forward(fields):
+                    if not first_text and fields.get('problem_text'):
+                        first_text.append(time.perf_counter() - started)
+                        session_metrics().record("extract_first_text", first_text[0])
+                    on_partial(fields)
+
+                result = engine.extract_stream(prepared.as_part(), forward)
+                tags["stream"] = True
+            else:
+                result = engine.extract(prepared.as_part())
+            tags["cache"] = "miss"
+            tags["error"] = "error" in result
+            cache.put(image, engine.prompt_version, engine.model_name, result)
+            return result
+    except Exception as e:
+        return {
+            "error": f"Logic Failed: {str(e)}", 
+            "problem_text": "", 
+            "diagram_code": "",
+            "raw_text_debug": "Error before parsing"
+        }
+
+def extract_gemini_batch(images, force=False):
+    """
+    한 페이지에서 자른 여러 문제를 모델 요청 한 번으로 분석합니다. (images 순서대로 결과 리스트)
+    캐시에 있는 영역은 빼고 나머지만 보냅니다. 캐시 키는 배치 프롬프트 버전 기준입니다.
+    """
+    if "GEMINI_API_KEY" not in st.secrets and not use_fake_backends():
+        return [{"error": "API Key Missing in Secrets"} for _ in images]
+
+    try:
+        with session_metrics().span("extract_batch", regions=len(images)) as tags:
+            engine = get_extraction_engine()
+            cache = get_extraction_cache()
+            results = [None] * len(images)
+            if not force:
+                results = [cache.get(image, engine.batch_prompt_version, engine.model_name) for image in images]
+            missing = [i for i, result in enumerate(results) if result is None]
+            tags["cache_hits"] = len(images) - len(missing)
+            if missing:
+                profile = preprocess_profile("preprocess_model", preprocess.MODEL_PROFILE)
+                parts = [preprocess.prepare(images[i], profile).as_part() for i in missing]
+                for i, result in zip(missing, engine.extract_batch(parts)):
+                    results[i] = result
+                    cache.put(images[i], engine.batch_prompt_version, engine.model_name, result)
+            tags["error"] = any("error" in result for result in results)
+            return results
+    except Exception as e:
+        return [{
+            "error": f"Logic Failed: {str(e)}", 
+            "problem_text": "", 
+            "diagram_code": "",
+            "raw_text_debug": "Error before parsing"
+        } for _ in images]
+
+@st.cache_resource(show_spinner="중복 색인 불러오는 중...")
+def get_duplicate_index():
+    """
+    저장된 문제 crop의 dHash 색인 (모든 세션 공유, 저장할 때마다 추가).
+    DUPLICATE_TOLERANCE: 중복으로 볼 해밍 거리 (기본 7)
+    """
+    return DuplicateIndex.from_firestore(get_db(), tolerance=int(st.secrets.get("DUPLICATE_TOLERANCE", DEFAULT_TOLERANCE)))
+
+def find_duplicates(image):
+    try:
+        return get_duplicate_index().lookup(image)
+    except Exception:
+        return []
+
+def prior_labels(doc_id):
+    """중복으로 찾은 문서의 라벨. 이 서버에서 방금 저장한 문서는 아직 Firestore에 없을 수 있어 색인에서 먼저 찾습니다."""
+    labels = get_duplicate_index().labels.get(doc_id)
+    if labels is None:
+        snap = get_db().collection("math_dataset").document(doc_id).get()
+        labels = labels_from_doc(snap.to_dict()) if snap.exists else None
+    return labels
+
+@st.cache_resource
+def get_diagram_renderer():
+    """Matplotlib 미리보기 전용 워커 프로세스 풀 (모든 세션 공유)"""
+    return DiagramRenderer(
+        workers=int(st.secrets.get("DIAGRAM_WORKERS", 2)),
+        timeout=float(st.secrets.get("DIAGRAM_TIMEOUT", 10)),
+        memory_mb=int(st.secrets.get("DIAGRAM_MEMORY_MB", 1024)),
+    )
+
+@st.cache_resource
+def get_draft_store():
+    """batch_label.py 사전 분석 결과 저장소 (DRAFTS_PATH가 있으면 로컬 JSONL, 없으면 Firestore)"""
+    if st.secrets.get("DRAFTS_PATH"):
+        return JsonlDraftStore(st.secrets["DRAFTS_PATH"])
+    return FirestoreDraftStore(get_db())
+
+def lookup_draft(store, drive_file):
+    """
+    사용할 수 있는 사전 분석 결과 또는 None. (Streamlit 호출 없음 → 프리페치 스레드에서 사용)
+    드라이브 파일이 분석 이후 수정되었다면(버전 불일치) 사용하지 않습니다.
+    """
+    try:
+        record = store.get(drive_file['id'])
+    except Exception:
+        return None
+    return record if usable(record, drive_file) else None
+
+def get_draft(drive_file):
+    """현재 파일의 사전 분석 결과. 보통은 프리페처가 이미지와 함께 받아 세션에 넣어 둡니다."""
+    cached = st.session_state.get('draft_cache')
+    if cached and cached[0] == drive_file['id']:
+        return cached[1]
+    record = lookup_draft(get_draft_store(), drive_file)
+    st.session_state['draft_cache'] = (drive_file['id'], record)
+    return record
+
+def render_move_and_next(current_file, idx):
+    """완료 폴더로 이동 예약 + 다음 파일 (단일/여러 문제 검증 화면 공용)"""
+    # 저장을 안 했으면 경고를 띄워주기 위해 help 메시지 추가
+    btn_label = "✅ 완료 및 다음 파일 (Move & Next)"
+    if not st.session_state.get('is_saved', False):
+        btn_label += " [⚠️미저장 상태]"
+
+    job = get_save_queue().status(st.session_state['save_job_id']) if 'save_job_id' in st.session_state else None
+    if job and job['state'] != 'done':
+        st.caption(f"☁️ 업로드 상태: {job['state']}" + (f" ({job['error']})" if job['error'] else ""))
+
+    if st.button(btn_label, type="primary", width="stretch"):
+        # 안전장치: 저장을 안 했는데 이동하려고 하면 경고
+        if not st.session_state.get('is_saved', False):
+            st.warning("⚠️ 데이터를 아직 저장하지 않았습니다! 먼저 '데이터 저장'을 눌러주세요.")
+            st.stop()
+
+        if done_folder_id:
+            with st.spinner("파일 정리 중..."):
+                success = move_file_to_done(current_file, folder_id, done_folder_id)
+                if success:
+                    st.toast("🚀 파일 이동 예약! 다음 문제로 넘어갑니다.")
+                    # 임대는 배치 처리기가 이동을 확인한 뒤 완료로 반납합니다 (get_move_batcher)
+                    st.session_state['folder_files'] = [
+                        f for f in st.session_state.get('folder_files', []) if f['id'] != current_file['id']
+                    ]
+                    # 이미지가 뜬 뒤 완료까지 걸린 시간 = 문제 하나의 처리 시간 (시간당 처리량의 기준)
+                    if 'problem_started' in st.session_state:
+                        # 한 페이지에서 여러 문제를 저장했으면 문제 수로 나눠 문제마다 기록합니다
+                        problems = st.session_state.pop('saved_problems', 1)
+                        elapsed = time.time() - st.session_state.pop('problem_started')
+                        for _ in range(problems):
+                            session_metrics().record("problem_total", elapsed / problems)
+                    # 로컬 리스트는 바로 갱신 (실패하면 reconcile_failed_moves()가 되돌림)
+                    st.session_state['drive_files'].pop(idx)
+                    # 상태 초기화
+                    st.session_state.pop('crop_box', None)
+                    st.session_state.pop('extracted', None)
+                    st.session_state.pop('regions', None)
+                    st.session_state.pop('batch', None)
+                    st.session_state.pop('is_saved', None) # 저장 플래그 초기화
+                    st.session_state.pop('save_job_id', None)
+
+                    st.rerun()
+                else:
+                    st.error("파일 이동 실패 (권한을 확인하세요)")
+        else:
+            st.error("완료 폴더(Done Folder ID)가 설정되지 않았습니다.")
+
+def get_index_or_default(options_list, value, default_index=0):
+    """AI가 예측한 값이 리스트에 있으면 그 인덱스를 반환, 없으면 0 반환"""
+    try:
+        return options_list.index(value)
+    except ValueError:
+        return default_index
+
+# ==========================================
+# 3. 메인 UI 레이아웃
+# ==========================================
+st.title("✂️ Smart Math Labeler (AI Classification)")
+
+with st.sidebar:
+    st.header("⚙️ 설정")
+    
+    default_folder = st.secrets.get("DEFAULT_FOLDER_ID", "fake-src" if use_fake_backends() else "")
+    done_folder_default = st.secrets.get("DONE_FOLDER_ID", "fake-done" if use_fake_backends() else "")
+    
+    folder_id = st.text_input("작업 폴더 ID (Source)", value=default_folder)
+    done_folder_id = st.text_input("완료 폴더 ID (Done)", value=done_folder_default)
+    prefetch_depth = st.number_input(
+        "미리 불러올 이미지 수", min_value=0, max_value=10,
+        value=int(st.secrets.get("PREFETCH_DEPTH", 3))
+    )
+    
+    if st.button("📂 드라이브 불러오기", type="primary"):
+        if folder_id and folder_id == st.session_state.get('drive_folder_id') and 'drive_sync_version' in st.session_state:
+            # 같은 폴더를 다시 누르면 변경분만 반영하고 보던 위치는 유지합니다
+            with st.spinner("변경된 파일 확인 중..."):
+                sync_folder_changes(force=True)
+                claim_files()
+                st.success(f"{len(st.session_state['folder_files'])}개 이미지 (이 세션 임대 {len(st.session_state['drive_files'])}개)")
+        elif folder_id:
+            with st.spinner("파일 스캔 중..."):
+                # 첫 페이지만 먼저 받아 바로 작업을 시작하고, 나머지는 화면 렌더링 후 이어서 불러옵니다.
+                # (이전에 받은 목록이 있으면 변경분만 받습니다. open_folder 참고)
+                release_leases(st.session_state.get('drive_files'))
+                st.session_state['drive_files'] = []
+                st.session_state['folder_files'] = []
+                st.session_state['drive_folder_id'] = folder_id
+                st.session_state['idx'] = 0
+                st.session_state.pop('lease_retry_at', None)
+                st.session_state.pop('crop_box', None)
+                st.session_state.pop('extracted', None)
+                open_folder(folder_id)
+                claim_files()
+                st.success(f"{len(st.session_state['folder_files'])}개 이미지 발견! (이 세션 임대 {len(st.session_state['drive_files'])}개)")
+        else:
+            st.warning("폴더 ID를 입력하세요.")
+
+    if st.button("📦 저장된 파일 모두 이동", help="작업 폴더에 남아 있는 이미 저장된 파일을 한 번에 완료 폴더로 옮깁니다."):
+        if folder_id and done_folder_id:
+            with st.spinner("저장된 파일 정리 중..."):
+                progress = st.empty()
+                count = move_all_saved_files(
+                    folder_id, done_folder_id,
+                    on_progress=lambda n: progress.caption(f"🚚 {n}개 이동 완료..."),
+                )
+                st.success(f"{count}개 파일 이동 처리!")
+        else:
+            st.warning("작업 폴더와 완료 폴더 ID를 모두 입력하세요.")
+
+    # 남은 페이지를 불러오는 동안 진행 상황을 표시할 자리
+    listing_status = st.empty()
+
+    st.markdown("---")
+    
+    c_prev, c_next = st.columns(2)
+    with c_prev:
+        if st.button("◀ 이전"):
+            if st.session_state.get('idx', 0) > 0:
+                st.session_state['idx'] -= 1
+                st.session_state.pop('crop_box', None)
+                st.session_state.pop('extracted', None)
+                st.rerun()
+    with c_next:
+        if st.button("다음 ▶"):
+            files = st.session_state.get('drive_files', [])
+            if files and st.session_state['idx'] < len(files) - 1:
+                st.session_state['idx'] += 1
+                st.session_state.pop('crop_box', None)
+                st.session_state.pop('extracted', None)
+                st.rerun()
+
+    st.markdown("---")
+    # 캐시 통계는 이미지 로딩이 끝난 뒤(스크립트 마지막)에 채웁니다
+    cache_status = st.empty()
+    queue_status = st.empty()
+    metrics_panel = st.container()
+    retry_slot = st.empty()
+
+# 사이드바가 먼저 그려진 뒤 클라이언트를 만듭니다 (콜드 스타트 체감 시간 단축)
+if not get_db() or not get_drive_service():
+    st.error("❌ 치명적 오류: 인증 키를 찾을 수 없거나 올바르지 않습니다.")
+    st.info("💡 인증 키 없이 화면/흐름만 확인하려면 .streamlit/secrets.toml에 `FAKE_BACKENDS = true`를 넣고 실행하세요.")
+    st.stop()
+drive_creds = get_drive_credentials()  # 프리페치 스레드가 스레드 전용 서비스를 만들 때 사용
+
+# ==========================================
+# 4. 작업 공간
+# ==========================================
+reconcile_failed_moves()
+sync_folder_changes()
+if st.session_state.get('folder_files'):
+    # 다른 라벨러와 겹치지 않도록 임대받은 파일만 작업합니다
+    renew_leases()
+    claim_files()
+
+if 'drive_files' in st.session_state and st.session_state['drive_files']:
+    files = st.session_state['drive_files']
+    idx = st.session_state['idx']
+    
+    if idx >= len(files):
+        st.session_state['idx'] = 0
+        st.rerun()
+        
+    current_file = files[idx]
+    st.subheader(f"🖼️ [{idx+1}/{len(files)}] {current_file['name']}")
+    
+    needs_load = 'current_file_id' not in st.session_state or st.session_state['current_file_id'] != current_file['id']
+
+    # 현재 파일 + 다음 N개를 백그라운드에서 받아둡니다 (이전으로 이동하면 창 밖 작업은 취소)
+    prefetcher = get_prefetcher(prefetch_depth)
+    prefetcher.schedule(files, idx, include_current=needs_load)
+
+    if needs_load:
+        with st.spinner("이미지 로딩 중..."), session_metrics().span("image_wait") as tags:
+            prefetched = prefetcher.take(current_file['id'])
+            tags["prefetched"] = prefetched is not None
+            if prefetched is None:
+                page = download_image_from_drive(current_file)  # 사전 분석 결과는 get_draft가 조회
+            else:
+                page, draft = prefetched
+                st.session_state['draft_cache'] = (current_file['id'], draft)
+            if page:
+                st.session_state['page'] = page
+                st.session_state['current_file_id'] = current_file['id']
+                st.session_state['problem_started'] = time.time()
+                st.session_state.pop('crop_box', None)
+                st.session_state.pop('extracted', None)
+                st.session_state.pop('regions', None)
+                st.session_state.pop('batch', None)
+    
+    if 'page' in st.session_state:
+        from streamlit_cropper import st_cropper
+
+        page = st.session_state['page']
+        st.info("💡 문제 영역을 드래그하세요.")
+        # cropper에는 축소본만 넘기고 영역 좌표를 받습니다 (전체 해상도 crop은 분석/저장 시점에)
+        proxy_box = st_cropper(
+            page.proxy,
+            realtime_update=True,
+            box_color='#FF0000',
+            aspect_ratio=None,
+            return_type='box'
+        )
+        crop_box = page.full_box(proxy_box)
+        preview_img = page.proxy_crop(proxy_box)
+        
+        col_view, col_action = st.columns([1, 1])
+        with col_view:
+            st.image(preview_img, width="stretch")
+        with col_action:
+            draft = get_draft(current_file)
+            if draft and st.button("⚡ 사전 분석 결과 사용", help="batch_label.py로 미리 분석해 둔 결과를 바로 불러옵니다."):
+                st.session_state['crop_box'] = crop_box
+                st.session_state['extracted'] = draft['draft']
+                st.success("사전 분석 결과를 불러왔습니다.")
+
+            # 이미 저장된 문제와 비슷하면 모델 호출 전에 알려주고 이전 라벨 재사용을 제안합니다
+            # dHash는 9x8로 줄여 비교하므로 축소본 crop으로도 충분합니다
+            duplicates = find_duplicates(preview_img)
+            if duplicates:
+                best = duplicates[0]
+                same_file = " · 같은 파일" if best['drive_file_id'] == current_file['id'] else ""
+                st.warning(
+                    f"🔁 이미 저장된 문제와 비슷합니다: {best['name'] or best['doc_id']}"
+                    f" (거리 {best['distance']}{same_file}, 후보 {len(duplicates)}개)"
+                )
+                if st.button("♻️ 이전 라벨 재사용", help="비슷한 문제에 저장된 라벨을 불러옵니다. 모델을 호출하지 않습니다."):
+                    labels = prior_labels(best['doc_id'])
+                    if labels:
+                        st.session_state['crop_box'] = crop_box
+                        st.session_state['extracted'] = labels
+                        st.success("이전 라벨을 불러왔습니다.")
+                    else:
+                        st.error("이전 문서를 찾을 수 없습니다.")
+
+            force_rerun = st.checkbox("🔄 캐시 무시하고 다시 분석", help="같은 crop의 이전 분석 결과를 쓰지 않고 모델을 새로 호출합니다.")
+            if st.button("✨ AI 분석 및 자동 분류", type="primary"):
+                with st.spinner("Gemini가 문제를 풀고 분류 중입니다..."):
+                    st.session_state['crop_box'] = crop_box
+                    cropped_img = page.crop(crop_box)
+
+                    # 스트리밍 중간 결과: problem_text가 도착하는 대로 먼저 보여줍니다
+                    live = st.empty()
+                    last_draw = [0.0]
+
+                    def show_partial(fields):
+                        now = time.perf_counter()
+                        if now - last_draw[0] < 0.15:
+                            return  # 조각마다 다시 그리면 화면 전송이 더 느려집니다
+                        last_draw[0] = now
+                        with live.container(border=True):
+                            pending = [k for k in extraction.RESPONSE_FIELDS if k not in fields]
+                            st.caption("⏳ 생성 중: " + (", ".join(pending) or "마무리"))
+                            if fields.get('problem_text'):
+                                st.markdown(fields['problem_text'])
+
+                    extracted_data = extract_gemini(cropped_img, force=force_rerun, on_partial=show_partial)
+                    live.empty()
+                    
+                    # [디버깅 3] 화면에 디버그용 확장 패널 추가
+                    with st.expander("🕵️‍♂️ AI 응답 데이터 뜯어보기 (Debug)", expanded=True):
+                        st.json(extracted_data) # JSON 구조를 예쁘게 보여줌
+                        
+                        # 만약 에러가 나서 raw_text_debug가 있다면 원본 텍스트 출력
+                        if "raw_text_debug" in extracted_data:
+                            st.warning("⚠️ 파싱 실패한 원본 텍스트:")
+                            st.code(extracted_data["raw_text_debug"], language="text")
+
+                    if "error" in extracted_data:
+                        st.error(extracted_data['error'])
+                    else:
+                        st.session_state['extracted'] = extracted_data
+                        st.session_state.pop('batch', None)
+                        st.success("분석 완료!")
+                    payload = st.session_state.pop('model_payload', None)
+                    if payload:
+                        st.caption(f"📦 모델 전송: {format_payload(payload)}")
+
+            # 한 페이지에 문제가 여러 개면 영역을 모아 두었다가 모델 요청 한 번으로 분석합니다
+            st.markdown("---")
+            regions = st.session_state.setdefault('regions', [])
+            if st.button("➕ 이 영역 추가 (여러 문제 한 번에 분석)", key="add_region"):
+                regions.append({"box": crop_box, "preview": preview_img})
+            if regions:
+                st.caption(f"📑 모은 영역 {len(regions)}개")
+                st.image([region['preview'] for region in regions], width=80)
+                c_run, c_clear = st.columns(2)
+                if c_run.button(f"✨ {len(regions)}문제 한 번에 분석", type="primary", key="analyze_regions"):
+                    with st.spinner(f"Gemini가 {len(regions)}문제를 한 번에 분석 중입니다..."):
+                        images = page.crop_many([region['box'] for region in regions])
+                        results = extract_gemini_batch(images, force=force_rerun)
+                    st.session_state['batch'] = [dict(region, extracted=result) for region, result in zip(regions, results)]
+                    st.session_state.pop('extracted', None)
+                    failed = sum("error" in result for result in results)
+                    if failed:
+                        st.error(f"{len(results)}문제 중 {failed}문제 분석 실패 (탭에서 확인하세요)")
+                    else:
+                        st.success(f"{len(results)}문제 분석 완료!")
+                if c_clear.button("🗑️ 비우기", key="clear_regions"):
+                    st.session_state.pop('regions', None)
+                    st.session_state.pop('batch', None)
+                    st.rerun()
+
+    st.divider()
+
+    # ... (이전 코드: st.cropper 등) ...
+
+    if 'extracted' in st.session_state:
+        item = st.session_state['extracted']
+        
+        # 기본값 로드 (수정 중인 데이터가 날아가지 않게 session state 활용)
+        default_prob = item.get('problem_text', "")
+        default_code = item.get('diagram_code', "")
+        
+        st.divider()
+        st.subheader("📝 데이터 검증 및 저장")
+
+        # 1. 메타데이터 선택 (즉시 반영)
+        c1, c2, c3, c4 = st.columns(4)
+        subject = c1.selectbox("과목", OPTIONS['subject'], index=get_index_or_default(OPTIONS['subject'], item.get("subject")))
+        grade = c2.selectbox("학년", OPTIONS['grade'], index=0)
+        source = c3.selectbox("출처", OPTIONS['source_org'], index=0)
+        unit = c4.selectbox("단원", OPTIONS['unit_major'], index=get_index_or_default(OPTIONS['unit_major'], item.get("unit_major")))
+        
+        c5, c6, c7 = st.columns(3)
+        diff = c5.selectbox("난이도", OPTIONS['difficulty'], index=get_index_or_default(OPTIONS['difficulty'], item.get("difficulty")))
+        q_type = c6.selectbox("유형", OPTIONS['question_type'], index=get_index_or_default(OPTIONS['question_type'], item.get("question_type")))
+        concept = c7.selectbox("핵심 개념", OPTIONS['concepts'], index=get_index_or_default(OPTIONS['concepts'], item.get("concept")))
+
+        st.markdown("---")
+
+        # 2. 실시간 편집 & 미리보기
+        col_edit, col_preview = st.columns(2)
+        
+        with col_edit:
+            st.markdown("#### ✏️ 편집기")
+            prob_text = st.text_area("문제 (LaTeX)", value=default_prob, height=300, key="prob_input")
+            st.caption("도형 Python 코드")
+            diag_code = st.text_area("Matplotlib Code", value=default_code, height=200, key="code_input")
+            diag_desc = st.text_area("도형 설명 (텍스트)", value=item.get('diagram_desc', ""), height=100)
+
+        with col_preview:
+            st.markdown("#### 👁️ 미리보기")
+            if prob_text:
+                st.info("수식 렌더링 확인")
+                st.markdown(prob_text)
+            else:
+                st.warning("텍스트가 없습니다.")
+            
+            if diag_code and "plt" in diag_code:
+                st.markdown("---")
+                st.info("📊 그래프 렌더링 확인")
+                # 별도 프로세스에서 렌더링 (시간/메모리 제한, 같은 코드는 캐시에서 바로 표시)
+                with session_metrics().span("diagram_render") as tags:
+                    result = get_diagram_renderer().render(diag_code)
+                    tags["cache"] = "hit" if result.cached else "miss"
+                if result.ok:
+                    st.image(result.png, width="stretch")
+                    st.caption("⚡ 캐시" if result.cached else f"⏱️ {result.elapsed * 1000:.0f}ms")
+                elif result.error.startswith("코드는 실행되었으나"):
+                    st.warning(result.error)
+                else:
+                    st.error(f"그래프 오류: {result.error}")
+
+        st.markdown("---")
+        
+        # ==========================================
+        # 3. 버튼 분리 (핵심 변경 사항)
+        # ==========================================
+        col_btn_save, col_btn_move = st.columns([1, 1])
+
+        # [버튼 1] 데이터 저장만 수행 (이동 X, 리프레시 X)
+        with col_btn_save:
+            if st.button("💾 데이터 저장 (DB Save)", type="secondary", width="stretch"):
+                if 'crop_box' not in st.session_state:
+                    st.error("이미지 세션 만료")
+                else:
+                    try:
+                        with st.spinner("저장 대기열에 기록 중..."), session_metrics().span("save_enqueue"):
+                            # 1. 이미지 인코딩 + 문서 구성
+                            job = labeling.build_save_job(
+                                current_file, page.crop(st.session_state['crop_box']),
+                                meta={
+                                    "subject": subject, "grade": grade, "source": source,
+                                    "unit": unit, "difficulty": diff, "question_type": q_type,
+                                    "concept": concept
+                                },
+                                content={
+                                    "problem": prob_text, 
+                                    "diagram_desc": diag_desc,
+                                    "diagram_code": diag_code
+                                },
+                                profile=preprocess_profile("preprocess_storage", preprocess.STORAGE_PROFILE),
+                            )
+                            
+                            # 2. 대기열에 기록 (업로드 → Firestore 배치 기록은 백그라운드에서 진행)
+                            job_id, doc_id = job.enqueue(get_save_queue())
+                            get_duplicate_index().add(
+                                job.phash, doc_id, current_file['id'], current_file['name'], labels=labels_from_doc(job.doc)
+                            )
+                            
+                            # 대기열이 로컬 디스크에 기록을 확인(ack)하면 저장된 것으로 봅니다
+                            st.session_state['is_saved'] = True
+                            st.session_state['save_job_id'] = job_id
+                            st.session_state.pop('saved_problems', None)
+                            st.toast("✅ 데이터가 저장 대기열에 기록되었습니다!", icon="💾")
+                            st.success("저장 완료. 업로드는 백그라운드에서 진행됩니다. 더 수정하거나 '완료 처리'를 눌러 넘어가세요.")
+                            st.caption(f"📦 업로드: {format_payload(job.prepared.stats())}")
+                            
+                    except Exception as e:
+                        st.error(f"저장 실패: {e}")
+
+        # [버튼 2] 파일 이동 및 다음 사진 (저장 로직 없음)
+        with col_btn_move:
+            render_move_and_next(current_file, idx)
+
+    elif 'batch' in st.session_state:
+        # 한 페이지 여러 문제: 문제마다 탭에서 검증하고, 저장은 한 번에
+        batch = st.session_state['batch']
+        st.divider()
+        st.subheader(f"📝 데이터 검증 및 저장 ({len(batch)}문제)")
+        c1, c2 = st.columns(2)
+        grade = c1.selectbox("학년", OPTIONS['grade'], index=0, key="batch_grade")
+        source = c2.selectbox("출처", OPTIONS['source_org'], index=0, key="batch_source")
+
+        entries = []
+        tab_labels = [f"문제 {i + 1}" + (" ⚠️" if "error" in entry['extracted'] else "") for i, entry in enumerate(batch)]
+        for i, tab in enumerate(st.tabs(tab_labels)):
+            item = batch[i]['extracted']
+            with tab:
+                if "error" in item:
+                    st.error(item['error'])
+                col_img, col_meta = st.columns([1, 2])
+                col_img.image(batch[i]['preview'], width="stretch")
+                with col_meta:
+                    m1, m2, m3 = st.columns(3)
+                    subject = m1.selectbox("과목", OPTIONS['subject'], index=get_index_or_default(OPTIONS['subject'], item.get("subject")), key=f"batch{i}_subject")
+                    unit = m2.selectbox("단원", OPTIONS['unit_major'], index=get_index_or_default(OPTIONS['unit_major'], item.get("unit_major")), key=f"batch{i}_unit")
+                    diff = m3.selectbox("난이도", OPTIONS['difficulty'], index=get_index_or_default(OPTIONS['difficulty'], item.get("difficulty")), key=f"batch{i}_diff")
+                    m4, m5 = st.columns(2)
+                    q_type = m4.selectbox("유형", OPTIONS['question_type'], index=get_index_or_default(OPTIONS['question_type'], item.get("question_type")), key=f"batch{i}_type")
+                    concept = m5.selectbox("핵심 개념", OPTIONS['concepts'], index=get_index_or_default(OPTIONS['concepts'], item.get("concept")), key=f"batch{i}_concept")
+                    include = st.checkbox("이 문제 저장", value="error" not in item, key=f"batch{i}_include")
+
+                col_edit, col_preview = st.columns(2)
+                with col_edit:
+                    prob_text = st.text_area("문제 (LaTeX)", value=item.get('problem_text', ""), height=200, key=f"batch{i}_prob")
+                    diag_code = st.text_area("Matplotlib Code", value=item.get('diagram_code', ""), height=150, key=f"batch{i}_code")
+                    diag_desc = st.text_area("도형 설명 (텍스트)", value=item.get('diagram_desc', ""), height=80, key=f"batch{i}_desc")
+                with col_preview:
+                    if prob_text:
+                        st.markdown(prob_text)
+                    if diag_code and "plt" in diag_code:
+                        with session_metrics().span("diagram_render") as tags:
+                            result = get_diagram_renderer().render(diag_code)
+                            tags["cache"] = "hit" if result.cached else "miss"
+                        if result.ok:
+                            st.image(result.png, width="stretch")
+                        else:
+                            st.warning(f"그래프: {result.error}")
+
+            if include:
+                entries.append((i, {
+                    "subject": subject, "grade": grade, "source": source,
+                    "unit": unit, "difficulty": diff, "question_type": q_type,
+                    "concept": concept
+                }, {
+                    "problem": prob_text,
+                    "diagram_desc": diag_desc,
+                    "diagram_code": diag_code
+                }))
+
+        st.markdown("---")
+        col_btn_save, col_btn_move = st.columns([1, 1])
+        with col_btn_save:
+            if st.button(f"💾 {len(entries)}문제 한 번에 저장 (DB Save)", type="secondary", width="stretch", disabled=not entries):
+                try:
+                    with st.spinner("저장 대기열에 기록 중..."), session_metrics().span("save_enqueue", problems=len(entries)):
+                        images = page.crop_many([batch[i]['box'] for i, _, _ in entries])
+                        jobs = [
+                            labeling.build_save_job(
+                                current_file, image, meta=meta, content=content,
+                                profile=preprocess_profile("preprocess_storage", preprocess.STORAGE_PROFILE),
+                                region=i,
+                            )
+                            for image, (i, meta, content) in zip(images, entries)
+                        ]
+                        # 한 트랜잭션으로 대기열에 기록 → 백그라운드에서 WriteBatch 한 번으로 Firestore에 기록
+                        ids = labeling.enqueue_jobs(get_save_queue(), jobs)
+                        for job, (job_id, doc_id) in zip(jobs, ids):
+                            get_duplicate_index().add(
+                                job.phash, doc_id, current_file['id'], current_file['name'], labels=labels_from_doc(job.doc)
+                            )
+                        st.session_state['is_saved'] = True
+                        st.session_state['save_job_id'] = ids[-1][0]
+                        st.session_state['saved_problems'] = len(jobs)
+                        st.toast(f"✅ {len(jobs)}문제가 저장 대기열에 기록되었습니다!", icon="💾")
+                        st.success("저장 완료. 업로드는 백그라운드에서 진행됩니다.")
+                except Exception as e:
+                    st.error(f"저장 실패: {e}")
+        with col_btn_move:
+            render_move_and_next(current_file, idx)
+
+elif st.session_state.get('folder_files'):
+    st.info("🔒 남은 파일은 모두 다른 라벨러가 작업 중입니다. 임대가 반납되거나 만료되면 다음 실행 때 받아옵니다.")
+else:
+    st.info("👈 드라이브 연결 필요")
+
+# ==========================================
+# 5. 남은 드라이브 목록 이어서 불러오기
+# ==========================================
+# 작업 공간이 먼저 그려진 뒤 실행되므로, 첫 이미지는 목록 스캔이 끝나기 전에 바로 보입니다.
+if st.session_state.get('drive_page_token'):
+    load_drive_pages(
+        st.session_state['drive_folder_id'],
+        page_token=st.session_state['drive_page_token'],
+        on_page=lambda n: listing_status.caption(f"⏳ 목록 불러오는 중... {n}개"),
+    )
+    listing_status.caption(f"📂 총 {len(st.session_state.get('folder_files', []))}개 이미지")
+
+# ==========================================
+# 6. 사이드바 상태 표시
+# ==========================================
+cache_stats = image_cache.stats()
+ai_stats = get_extraction_cache().stats()
+render_stats = get_diagram_renderer().stats()
+duplicate_index = get_duplicate_index()
+status_lines = [
+    f"🗄️ 이미지 캐시: 적중 {cache_stats['hits']} / 미스 {cache_stats['misses']} / "
+    f"제거 {cache_stats['evictions']} · {cache_stats['entries']}개, {cache_stats['bytes'] / 1024 / 1024:.1f}MB",
+    f"🧠 분석 캐시: 적중 {ai_stats['hits']} (유사 {ai_stats['near_hits']}) / 미스 {ai_stats['misses']} · {ai_stats['entries']}개",
+    f"🔁 중복 색인: {len(duplicate_index)}개" + (f" (phash 없음 {duplicate_index.unindexed}개)" if duplicate_index.unindexed else ""),
+]
+if st.session_state.get('folder_files'):
+    status_lines.append(
+        f"🔒 작업 임대: 이 세션 {len(st.session_state.get('drive_files', []))}개 / 폴더 {len(st.session_state['folder_files'])}개"
+    )
+if render_stats['p50_ms'] is not None:
+    status_lines.append(
+        f"📊 도형 렌더: 캐시 적중 {render_stats['hits']} / 실행 {render_stats['misses']}"
+        f" (p50 {render_stats['p50_ms']:.0f}ms, 시간 초과 {render_stats['timeouts']})"
+    )
+cache_status.caption("  \n".join(status_lines))
+queue_stats = get_save_queue().stats()
+if queue_stats['failed'] and retry_slot.button("🔁 실패한 저장 다시 시도"):
+    get_save_queue().retry_failed()
+    st.rerun()
+move_stats = get_move_batcher().stats()
+queue_status.caption(
+    f"💾 저장 대기열: 대기 {queue_stats['pending']} / 실패 {queue_stats['failed']} / 완료 {queue_stats['done']}  \n"
+    f"🚚 파일 이동: 대기 {move_stats['pending']} / 완료 {move_stats['moved']} (배치 {move_stats['batches']}회)"
+)
+if queue_stats['failed']:
+    queue_status.error(f"💾 저장 실패 {queue_stats['failed']}건 (대기 {queue_stats['pending']}): {queue_stats['last_error']}")
+
+STAGE_LABELS = {
+    "problem_total": "문제당 전체",
+    "image_wait": "이미지 대기",
+    "extract": "AI 분석",
+    "extract_first_text": "AI 첫 문제 텍스트",
+    "extract_batch": "AI 분석 (여러 문제)",
+    "diagram_render": "도형 렌더",
+    "save_enqueue": "저장 (대기열)",
+    "move_enqueue": "이동 (예약)",
+    "drive_changes": "드라이브 변경 확인",
+    "drive_download": "드라이브 다운로드 ⚙️",
+    "storage_upload": "Storage 업로드 ⚙️",
+    "firestore_batch": "Firestore 기록 ⚙️",
+    "drive_move_batch": "드라이브 이동 배치 ⚙️",
+}
+recorders = {"session": session_metrics(), "background": background_metrics}
+stage_rows = [
+    {
+        "단계": STAGE_LABELS.get(stage, stage), "건수": row['count'],
+        "p50 (ms)": round(row['p50_ms']), "p95 (ms)": round(row['p95_ms']), "최대 (ms)": round(row['max_ms']),
+        "시간당": round(row['per_hour']),
+    }
+    for recorder in recorders.values()
+    for stage, row in recorder.summary().items()
+]
+with metrics_panel:
+    with st.expander("⏱️ 단계별 지연 시간", expanded=False):
+        if stage_rows:
+            st.dataframe(stage_rows, hide_index=True, width="stretch")
+            st.caption("⚙️ = 백그라운드 작업 (모든 세션 합계). '문제당 전체'의 시간당 값이 이 세션의 처리량입니다.")
+            c_json, c_csv = st.columns(2)
+            c_json.download_button("JSON", metrics.export_json(recorders), "latency.json", "application/json")
+            c_csv.download_button("CSV", metrics.export_csv(recorders), "latency.csv", "text/csv")
+        else:
+            st.caption("아직 측정된 단계가 없습니다.")
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
@@ -0,0 +1,138 @@
+"""
+헤드리스 일괄 사전 라벨링 (Streamlit 없이 실행).
+
+드라이브 폴더의 모든 이미지를 Gemini로 미리 분석하여 draft 저장소에 쌓아둡니다.
+라벨러는 화면에서 '⚡ 사전 분석 결과 사용'으로 즉시 불러올 수 있습니다.
+
+사용 예:
+    GEMINI_API_KEY=... python batch_label.py --folder <폴더ID> --workers 4 --rpm 60
+    GEMINI_API_KEY=... python batch_label.py --folder <폴더ID> --out drafts/drafts.jsonl
+"""
+import argparse
+import io
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import drive_io
+import extraction
+import preprocess
+from drafts import FirestoreDraftStore, JsonlDraftStore, make_record, usable
+
+KEY_FILE = "serviceAccountKey.json"
+BUCKET_NAME = "math-problem-collector.firebasestorage.app"
+
+
+def run_batch(files, load_image, engine, store, workers=4, skip_done=True, on_result=None):
+    """
+    files의 각 파일에 대해 load_image(file) -> engine.extract -> store.put(record)를 병렬 수행합니다.
+    동시에 처리 중인 작업은 workers * 2개로 제한하므로 files는 지연 제너레이터여도 됩니다.
+    모델 예외는 엔진이 지수 백오프로 재시도하고, JSON 파싱 실패는 재시도 없이 에러로 기록합니다.
+    """
+    done = store.done_records() if skip_done else {}
+    summary = {"ok": 0, "failed": 0, "skipped": 0}
+
+    def work(drive_file):
+        try:
+            result = engine.extract(load_image(drive_file))
+            error = result.get("error") if isinstance(result, dict) else None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+        record = make_record(drive_file, result, engine.model_name, error=error)
+        store.put(record)
+        return record
+
+    def collect(futures):
+        for future in futures:
+            record = future.result()
+            summary["failed" if record["error"] else "ok"] += 1
+            if on_result:
+                on_result(record)
+
+    pending = set()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-label") as pool:
+        for drive_file in files:
+            # 분석한 뒤 드라이브에서 바뀐 파일은 다시 분석합니다
+            if usable(done.get(drive_file["id"]), drive_file):
+                summary["skipped"] += 1
+                continue
+            pending.add(pool.submit(work, drive_file))
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(wait(pending).done)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="드라이브 폴더 일괄 Gemini 사전 분석")
+    parser.add_argument("--folder", required=True, help="작업 폴더 ID (Source)")
+    parser.add_argument("--out", help="로컬 JSONL 저장 경로 (생략 시 Firestore 스테이징 컬렉션)")
+    parser.add_argument("--key-file", default=KEY_FILE, help="서비스 계정 키 파일")
+    parser.add_argument("--workers", type=int, default=4, help="동시 요청 수")
+    parser.add_argument("--rpm", type=float, default=60, help="분당 최대 모델 요청 수 (0 = 제한 없음)")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=0, help="처리할 최대 파일 수 (0 = 전체)")
+    parser.add_argument("--no-skip", action="store_true", help="이미 분석된 파일도 다시 분석")
+    parser.add_argument("--schema", action="store_true", help="응답 스키마로 분류 값을 OPTIONS 목록 안으로 제한")
+    parser.add_argument("--record", help="모델 원본 응답을 남길 JSONL 경로 (benchmarks/bench_parse.py 말뭉치)")
+    args = parser.parse_args(argv)
+
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        print("❌ GEMINI_API_KEY 환경 변수가 필요합니다.", file=sys.stderr)
+        return 1
+
+    from google.oauth2 import service_account
+    from googleapiclient.discovery import build
+    from PIL import Image
+
+    creds = service_account.Credentials.from_service_account_file(
+        args.key_file, scopes=['https://www.googleapis.com/auth/drive']
+    )
+    drive_service = build('drive', 'v3', credentials=creds)
+
+    if args.out:
+        store = JsonlDraftStore(args.out)
+    else:
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(credentials.Certificate(args.key_file), {'storageBucket': BUCKET_NAME})
+        store = FirestoreDraftStore(firestore.client())
+
+    def load_image(drive_file):
+        service = drive_io.thread_service(lambda: build('drive', 'v3', credentials=creds))
+        img = Image.open(io.BytesIO(drive_io.download_bytes(service, drive_file["id"])))
+        img.load()
+        # 화면의 '✨ AI 분석'과 같은 전처리를 거쳐 전송합니다
+        return preprocess.prepare(img, preprocess.MODEL_PROFILE).as_part()
+
+    files = drive_io.iter_drive_images(drive_service, args.folder)
+    if args.limit:
+        files = itertools.islice(files, args.limit)
+
+    started = time.time()
+
+    def report(record):
+        mark = "❌" if record["error"] else "✅"
+        print(f"{mark} {record['name']} {record['error'] or ''}", flush=True)
+
+    engine = extraction.ExtractionEngine.from_api_key(
+        api_key, limiter=extraction.RateLimiter(args.rpm), max_retries=args.max_retries,
+        structured=args.schema, record_path=args.record,
+    )
+    summary = run_batch(
+        files, load_image, engine, store,
+        workers=args.workers, skip_done=not args.no_skip, on_result=report,
+    )
+    elapsed = time.time() - started
+    print(f"완료: 성공 {summary['ok']} / 실패 {summary['failed']} / 건너뜀 {summary['skipped']} ({elapsed:.1f}s)")
+    return 0 if not summary["failed"] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+작업 폴더 목록 갱신 비용: 전체 다시 나열 vs 변경 피드 (가짜 드라이브, 인증 키 불필요).
+
+폴더에 이미지 --sizes개가 있는 상태에서 라벨링 도중 새 스캔 --added개가 들어오고 --moved개가 완료 폴더로 옮겨졌을 때
+- 기존: '📂 드라이브 불러오기'처럼 폴더 전체를 페이지(1000개)마다 다시 나열
+- 현재: drive_sync.FolderSync가 잡아 둔 토큰 이후의 변경만 받아 반영
+호출 한 번마다 --latency초 (목록/변경 페이지 왕복)를 기다립니다.
+
+실행:
+    python -m benchmarks.bench_drive_sync --sizes 1000 10000 50000 --added 5 --moved 20
+"""
+import argparse
+import time
+
+import drive_io
+from drive_sync import FolderSync
+from fakes import FakeDriveService
+
+SRC, DONE = "bench-src", "bench-done"
+
+
+def measure(size, args):
+    drive = FakeDriveService.with_images(SRC, size)
+    sync = FolderSync(SRC)
+    sync.reset(list(drive_io.iter_drive_images(drive, SRC)), drive_io.start_page_token(drive))
+
+    for i in range(args.added):
+        drive.add_file(SRC, {"id": f"new_{i:04d}", "name": f"new_{i:04d}.jpg", "mimeType": "image/jpeg"})
+    for i in range(args.moved):
+        drive.move(f"file_{i:06d}", DONE, SRC)
+    drive.list_latency = args.latency
+
+    calls = drive.list_calls
+    started = time.perf_counter()
+    listed = list(drive_io.iter_drive_images(drive, SRC))
+    full = {"seconds": time.perf_counter() - started, "calls": drive.list_calls - calls}
+
+    started = time.perf_counter()
+    changed = sync.poll(drive)
+    delta = {"seconds": time.perf_counter() - started, "calls": drive.changes_calls}
+
+    files, _ = sync.snapshot()
+    assert {f["id"] for f in files} == {f["id"] for f in listed}, "변경 피드 반영 결과가 전체 목록과 다릅니다"
+    return full, delta, changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--added", type=int, default=5)
+    parser.add_argument("--moved", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.15, help="목록/변경 페이지 한 번의 왕복(초)")
+    args = parser.parse_args(argv)
+
+    print(f"[새 파일 {args.added}개 + 이동 {args.moved}개 후 목록 갱신, 호출당 {args.latency * 1000:.0f}ms]")
+    print(f"  {'폴더 크기':>9}{'전체 호출':>9}{'전체 ms':>9}{'변경 호출':>9}{'변경 ms':>9}{'반영':>6}")
+    for size in args.sizes:
+        full, delta, changed = measure(size, args)
+        print(f"  {size:>9}{full['calls']:>9}{full['seconds'] * 1000:>9.0f}"
+              f"{delta['calls']:>9}{delta['seconds'] * 1000:>9.0f}{changed:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+중복 색인 조회 지연 측정 (무작위 64비트 해시, 인증 키 불필요).
+
+실행:
+    python -m benchmarks.bench_duplicates --entries 100000 --tolerance 7
+"""
+import argparse
+import random
+import time
+
+from duplicate_index import DuplicateIndex
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--tolerance", type=int, nargs="+", default=[3, 7, 11])
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    keys = [rng.getrandbits(64) for _ in range(args.entries)]
+    index = DuplicateIndex()
+    started = time.perf_counter()
+    for i, key in enumerate(keys):
+        index.add(key, f"doc{i}")
+    print(f"[색인 {args.entries}건 구축: {time.perf_counter() - started:.2f}s]")
+
+    for tolerance in args.tolerance:
+        # 절반은 기존 해시에서 비트 몇 개만 바꾼 '재스캔', 절반은 새 문제
+        queries = []
+        for i in range(args.queries):
+            key = keys[rng.randrange(len(keys))] if i % 2 == 0 else rng.getrandbits(64)
+            for bit in rng.sample(range(64), min(tolerance, 3) if i % 2 == 0 else 0):
+                key ^= 1 << bit
+            queries.append(key)
+        timings = []
+        found = 0
+        for key in queries:
+            started = time.perf_counter()
+            found += bool(index.matches(key, tolerance))
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(f"  tolerance {tolerance:>2}: p50 {timings[len(timings) // 2] * 1e3:.3f}ms / "
+              f"p95 {timings[int(len(timings) * 0.95)] * 1e3:.3f}ms / 적중 {found}/{len(queries)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+라벨링 루프 종단 간(end-to-end) 벤치마크 (가짜 드라이브/Firestore/Storage/Gemini, 인증 키 불필요).
+
+목록 → 다운로드 → crop → AI 분석 → 저장 → 완료 폴더 이동을 --problems번 반복하며
+처리량, 단계별 지연(p50/p95), 문제당 메모리를 측정합니다. 라벨러의 편집 시간은 --think초로 흉내 냅니다.
+- legacy: 기존 app_deploy.py 방식 (순차 다운로드, 매번 모델 호출, 동기 업로드 + add + 이동)
+- current: 현재 방식 (임대, 프리페치 + 디스크 캐시 + 축소본, 분석 캐시, 전처리, 스트리밍 분석, 저장 대기열, 이동 배치)
+
+성능 변경 전후를 비교하려면 결과를 저장해 두고 --compare로 비교합니다:
+    python -m benchmarks.bench_e2e --out baseline.json
+    python -m benchmarks.bench_e2e --compare baseline.json
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from PIL import Image
+
+import drive_io
+import extraction
+import labeling
+import preprocess
+from extraction_cache import ExtractionCache
+from fakes import FakeBucket, FakeDriveService, FakeFirestore, FakeGenerativeModel
+from image_cache import DiskImageCache
+from leases import MemoryLeaseStore
+from metrics import SpanRecorder
+from move_queue import MoveBatcher
+from prefetch import ImagePrefetcher
+from save_queue import SaveQueue
+
+SRC, DONE = "bench-src", "bench-done"
+PAGE_SIZE = (1654, 2339)  # A4 200dpi
+LEASE_BATCH = 5  # app_deploy.LEASE_BATCH와 같게
+OWNER = "bench-session"
+META = {"subject": "수학I", "grade": "고1", "source": "교육청", "unit": "기타",
+        "difficulty": "중", "question_type": "계산형", "concept": "기타"}
+
+
+class Backends:
+    def __init__(self, args):
+        self.drive = FakeDriveService.with_images(SRC, args.problems, page_size=PAGE_SIZE)
+        self.drive.list_latency = args.list_latency
+        self.drive.download_latency = args.download_latency
+        self.drive.latency = args.move_latency
+        self.db = FakeFirestore(latency=args.db_latency)
+        self.bucket = FakeBucket(latency=args.upload_latency)
+        self.model = FakeGenerativeModel(latency=args.model_latency)
+        # 합성 페이지는 미리 만들어 두어 인코딩 시간이 측정에 섞이지 않게 합니다
+        for f in self.drive.folders[SRC]:
+            self.drive.content(f["id"])
+
+
+def crop(image):
+    """문제 하나 크기의 영역 (페이지 위쪽 1/3)"""
+    w, h = image.size
+    return image.crop((w // 12, h // 30, w * 11 // 12, h // 3))
+
+
+def crop_box(page):
+    """crop과 같은 영역을 cropper처럼 축소본 좌표 {left, top, width, height}로"""
+    w, h = page.proxy.size
+    return {"left": w // 12, "top": h // 30, "width": w * 10 // 12, "height": h // 3 - h // 30}
+
+
+def labels_to_content(result):
+    return {"problem": result.get("problem_text", ""), "diagram_desc": result.get("diagram_desc", ""),
+            "diagram_code": result.get("diagram_code", "")}
+
+
+def run_legacy(backends, args, recorder):
+    """기존 app_deploy.py 흐름 그대로 (모든 단계가 화면 스레드에서 순차 실행)"""
+    service = backends.drive
+    with recorder.span("list"):
+        files = list(drive_io.iter_drive_images(service, SRC))
+    for drive_file in files[:args.problems]:
+        started = time.perf_counter()
+        with recorder.span("image_wait"):
+            image = Image.open(io.BytesIO(service.files().get_media(fileId=drive_file["id"]).execute()))
+            image.load()
+        with recorder.span("crop"):
+            cropped = crop(image)
+        with recorder.span("extract"):
+            # 매 호출마다 모델 생성 + 프롬프트 구성, 원본 crop 그대로 전송
+            model = FakeGenerativeModel(latency=backends.model.latency)
+            result = extraction.parse_response(
+                model.generate_content([extraction.build_prompt(extraction.OPTIONS), cropped]).text
+            )
+        time.sleep(args.think)
+        with recorder.span("save"):
+            buf = io.BytesIO()
+            cropped.convert("RGB").save(buf, format="JPEG")
+            blob = backends.bucket.blob(f"cropped_problems/{drive_file['id']}.jpg")
+            blob.upload_from_string(buf.getvalue(), content_type="image/jpeg")
+            blob.make_public()
+            if backends.db.latency:
+                time.sleep(backends.db.latency)
+            backends.db.collection("math_dataset").add({"drive_file_id": drive_file["id"], "image_url": blob.public_url,
+                                                         "content": labels_to_content(result), "meta": META})
+        with recorder.span("move"):
+            if backends.drive.latency:
+                time.sleep(backends.drive.latency)
+            service.files().update(fileId=drive_file["id"], addParents=DONE, removeParents=SRC).execute()
+            time.sleep(0.5 if args.legacy_sleep else 0)  # 기존 코드의 이동 후 time.sleep(0.5)
+        recorder.record("problem_total", time.perf_counter() - started)
+
+
+def run_current(backends, args, recorder, background, workdir):
+    """app_deploy.py와 같은 도우미로 실행 (임대, 축소본 + 바이트 보관, 스트리밍 분석, 저장 대기열, 이동 배치)"""
+    def service_factory():
+        return backends.drive  # 가짜 서비스는 스레드 간 공유해도 안전합니다
+
+    image_cache = DiskImageCache(os.path.join(workdir, "images"), max_bytes=1024 * 1024 * 1024)
+    prefetcher = ImagePrefetcher(
+        lambda f: labeling.fetch_page(f, image_cache, service_factory, metrics=background),
+        depth=args.prefetch, key=lambda f: f["id"],
+    )
+    engine = extraction.ExtractionEngine(backends.model)
+    cache = ExtractionCache(os.path.join(workdir, "extraction.sqlite3"))
+    save_queue = SaveQueue(os.path.join(workdir, "save_queue.sqlite3"), backends.db, backends.bucket,
+                           metrics=background).start()
+    # 임대 저장소는 Firestore 트랜잭션이므로 db 지연을 그대로 씁니다
+    lease_store = MemoryLeaseStore(latency=args.db_latency)
+    movers = MoveBatcher(service_factory, metrics=background, flush_interval=0.5,
+                         on_settled=lambda owner, ids, moved: lease_store.release(owner, ids, done=moved)).start()
+
+    with recorder.span("list"):
+        listed = list(drive_io.iter_drive_images(backends.drive, SRC))[:args.problems]
+
+    files = []  # 이 세션이 임대한 작업 목록 (app_deploy.claim_files처럼 LEASE_BATCH개 앞까지 채움)
+    try:
+        for idx in range(args.problems):
+            need = LEASE_BATCH - (len(files) - idx)
+            if need > 0:
+                held = {f["id"] for f in files}
+                candidates = [f for f in listed if f["id"] not in held]
+                if candidates:
+                    with recorder.span("lease_claim"):
+                        claimed = set(lease_store.claim(OWNER, [f["id"] for f in candidates], need))
+                    files.extend(f for f in candidates if f["id"] in claimed)
+            if idx >= len(files):
+                break
+            drive_file = files[idx]
+            started = time.perf_counter()
+            with recorder.span("image_wait"):
+                prefetcher.schedule(files, idx)
+                page = prefetcher.take(drive_file["id"])
+                if page is None:
+                    page = labeling.fetch_page(drive_file, image_cache, service_factory)
+            with recorder.span("crop"):
+                cropped = page.crop(page.full_box(crop_box(page)))
+            with recorder.span("extract") as tags:
+                result = cache.get(cropped, engine.prompt_version, engine.model_name)
+                tags["cache"] = "hit" if result is not None else "miss"
+                if result is None:
+                    prepared = preprocess.prepare(cropped, preprocess.MODEL_PROFILE)
+                    extract_started = time.perf_counter()
+                    first_text = []
+
+                    def on_partial(fields):
+                        if not first_text and fields.get("problem_text"):
+                            first_text.append(time.perf_counter() - extract_started)
+                            recorder.record("extract_first_text", first_text[0])
+
+                    result = engine.extract_stream(prepared.as_part(), on_partial)
+                    cache.put(cropped, engine.prompt_version, engine.model_name, result)
+            time.sleep(args.think)
+            with recorder.span("save"):
+                job = labeling.build_save_job(drive_file, cropped, META, labels_to_content(result))
+                job.enqueue(save_queue)
+            with recorder.span("move"):
+                movers.enqueue(drive_file, SRC, DONE, owner=OWNER)
+            recorder.record("problem_total", time.perf_counter() - started)
+        with recorder.span("drain"):
+            save_queue.drain()
+            movers.flush_all()
+    finally:
+        save_queue.stop()
+        movers.stop()
+        prefetcher.shutdown()
+
+
+def max_rss_mb():
+    """프로세스 최대 RSS (PIL 이미지 버퍼처럼 tracemalloc에 잡히지 않는 C 메모리 포함). Windows는 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def measure(mode, args):
+    backends = Backends(args)
+    recorder, background = SpanRecorder(), SpanRecorder()
+    rss_before = max_rss_mb()
+    tracemalloc.start()
+    baseline_memory = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as workdir:
+        if mode == "legacy":
+            run_legacy(backends, args, recorder)
+        else:
+            run_current(backends, args, recorder, background, workdir)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = max_rss_mb()
+
+    saved = len(backends.db.collection("math_dataset").docs)
+    moved = len(backends.drive.folders.get(DONE, []))
+    stages = {stage: dict(row, source="foreground") for stage, row in recorder.summary().items()}
+    stages.update({stage: dict(row, source="background") for stage, row in background.summary().items()})
+    return {
+        "mode": mode,
+        "problems": args.problems,
+        "saved": saved,
+        "moved": moved,
+        "elapsed_s": elapsed,
+        "problems_per_hour": args.problems / elapsed * 3600,
+        "memory_peak_mb": (peak - baseline_memory) / 1e6,
+        "memory_per_problem_kb": (current - baseline_memory) / 1e3 / args.problems,
+        # 최대 RSS는 줄지 않으므로 먼저 실행한 모드보다 더 쓴 만큼만 늘어납니다
+        "rss_growth_mb": rss_after - rss_before if rss_before is not None else None,
+        "stages": stages,
+    }
+
+
+def print_result(result, baseline=None):
+    print(f"\n[{result['mode']}] {result['problems']}문제 {result['elapsed_s']:.2f}s → "
+          f"{result['problems_per_hour']:.0f}문제/시간 (저장 {result['saved']}, 이동 {result['moved']})")
+    print(f"  메모리: Python 힙 최대 {result['memory_peak_mb']:.1f}MB, 문제당 잔류 {result['memory_per_problem_kb']:.1f}KB"
+          + (f", 최대 RSS 증가 {result['rss_growth_mb']:.1f}MB" if result.get('rss_growth_mb') is not None else ""))
+    print(f"  {'단계':<18}{'건수':>6}{'p50 ms':>10}{'p95 ms':>10}" + ("   기준 대비 p50" if baseline else ""))
+    for stage, row in result["stages"].items():
+        mark = " ⚙️" if row["source"] == "background" else ""
+        line = f"  {stage + mark:<18}{row['count']:>6}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+        base = baseline["stages"].get(stage) if baseline else None
+        if base and base["p50_ms"]:
+            line += f"   {row['p50_ms'] / base['p50_ms']:.2f}x"
+        print(line)
+    if baseline:
+        print(f"  처리량 기준 대비: {result['problems_per_hour'] / baseline['problems_per_hour']:.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["legacy", "current", "both"], default="both")
+    parser.add_argument("--problems", type=int, default=20)
+    parser.add_argument("--think", type=float, default=0.0, help="문제당 라벨러 편집 시간(초)")
+    parser.add_argument("--prefetch", type=int, default=3)
+    parser.add_argument("--model-latency", type=float, default=0.5)
+    parser.add_argument("--download-latency", type=float, default=0.15)
+    parser.add_argument("--list-latency", type=float, default=0.2)
+    parser.add_argument("--upload-latency", type=float, default=0.15)
+    parser.add_argument("--db-latency", type=float, default=0.08)
+    parser.add_argument("--move-latency", type=float, default=0.1)
+    parser.add_argument("--legacy-sleep", action="store_true", help="기존 코드의 이동 후 0.5초 대기까지 포함")
+    parser.add_argument("--out", help="결과 JSON 저장 경로")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON")
+    args = parser.parse_args(argv)
+
+    baselines = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baselines = {r["mode"]: r for r in json.load(f)}
+
+    modes = ["legacy", "current"] if args.mode == "both" else [args.mode]
+    results = []
+    for mode in modes:
+        result = measure(mode, args)
+        print_result(result, baselines.get(mode) or (results[0] if results and not baselines else None))
+        results.append(result)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+추출 엔진 호출 오버헤드 / 병렬 처리량 측정 (가짜 모델 사용, 인증 키 불필요).
+
+실행:
+    python -m benchmarks.bench_engine --calls 2000 --latency 0.05 --concurrency 8 --regions 4
+"""
+import argparse
+import time
+
+import extraction
+from fakes import FakeGenerativeModel
+
+
+def per_call_legacy(image, calls):
+    """기존 extract_gemini 방식: 매 호출마다 모델 생성 + OPTIONS 직렬화 + 프롬프트 포맷팅"""
+    started = time.perf_counter()
+    for _ in range(calls):
+        model = FakeGenerativeModel()
+        prompt = extraction.build_prompt(extraction.OPTIONS)
+        extraction.parse_response(model.generate_content([prompt, image]).text)
+    return (time.perf_counter() - started) / calls
+
+
+def per_call_engine(image, calls):
+    engine = extraction.ExtractionEngine(FakeGenerativeModel(), max_retries=0)
+    started = time.perf_counter()
+    for _ in range(calls):
+        engine.extract(image)
+    return (time.perf_counter() - started) / calls
+
+
+def genai_model_construction(calls):
+    """실제 genai.GenerativeModel 생성 비용 (네트워크 없음). 패키지가 없으면 None"""
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        return None
+    started = time.perf_counter()
+    for _ in range(calls):
+        genai.configure(api_key="bench-key")
+        genai.GenerativeModel(extraction.MODEL_NAME, generation_config=extraction.GENERATION_CONFIG)
+    return (time.perf_counter() - started) / calls
+
+
+def throughput(count, latency, concurrency):
+    engine = extraction.ExtractionEngine(FakeGenerativeModel(latency=latency), max_concurrency=concurrency)
+    images = [f"image-{i}" for i in range(count)]
+
+    started = time.perf_counter()
+    for image in images:
+        engine.extract(image)
+    sequential = time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = engine.extract_many_sync(images)
+    concurrent = time.perf_counter() - started
+    assert all("error" not in r for r in results)
+    return sequential, concurrent
+
+
+def page_batch(regions, latency, pages):
+    """한 페이지 regions문제: 문제마다 extract vs extract_batch 한 번 (요청 수, 소요 시간)"""
+    model = FakeGenerativeModel(latency=latency)
+    engine = extraction.ExtractionEngine(model)
+    images = [f"region-{i}" for i in range(regions)]
+
+    started = time.perf_counter()
+    for _ in range(pages):
+        for image in images:
+            engine.extract(image)
+    per_region = time.perf_counter() - started, model.calls
+
+    model.calls = 0
+    started = time.perf_counter()
+    for _ in range(pages):
+        results = engine.extract_batch(images)
+        assert len(results) == regions and all("error" not in r for r in results)
+    batched = time.perf_counter() - started, model.calls
+    return per_region, batched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000, help="오버헤드 측정 반복 횟수")
+    parser.add_argument("--latency", type=float, default=0.05, help="가짜 모델 응답 지연(초)")
+    parser.add_argument("--count", type=int, default=64, help="처리량 측정 이미지 수")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--regions", type=int, default=4, help="페이지당 문제 수 (extract_batch 비교)")
+    parser.add_argument("--pages", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    image = "dummy-image"
+    legacy = per_call_legacy(image, args.calls)
+    engine = per_call_engine(image, args.calls)
+    print("[호출당 오버헤드 (모델 지연 0)]")
+    print(f"  기존 방식 : {legacy * 1e6:8.1f} µs")
+    print(f"  엔진 재사용: {engine * 1e6:8.1f} µs  ({legacy / engine:.1f}x)")
+    construction = genai_model_construction(min(args.calls, 200))
+    if construction is not None:
+        print(f"  (참고) genai.configure + GenerativeModel 생성: {construction * 1e6:.1f} µs/회 — 기존 방식에 추가로 발생")
+
+    sequential, concurrent = throughput(args.count, args.latency, args.concurrency)
+    print(f"\n[처리량: {args.count}개, 지연 {args.latency * 1000:.0f}ms]")
+    print(f"  순차 extract     : {sequential:6.2f}s ({args.count / sequential:6.1f}/s)")
+    print(f"  extract_many(x{args.concurrency}) : {concurrent:6.2f}s ({args.count / concurrent:6.1f}/s)")
+
+    (single_s, single_calls), (batch_s, batch_calls) = page_batch(args.regions, args.latency, args.pages)
+    print(f"\n[페이지 {args.pages}장 x {args.regions}문제, 지연 {args.latency * 1000:.0f}ms + 추가 문제당 30%]")
+    print(f"  문제마다 extract : {single_s:6.2f}s, 요청 {single_calls}회")
+    print(f"  extract_batch    : {batch_s:6.2f}s, 요청 {batch_calls}회  ({single_s / batch_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
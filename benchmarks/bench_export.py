@@ -0,0 +1,121 @@
+"""
+math_dataset 내보내기 처리량 / 재개 / 증분 측정 (가짜 Firestore·Storage 사용, 인증 키 불필요).
+
+1. --docs개 문서 전체 내보내기 (docs/s, MB/s, 샤드 수)
+2. 중간에 끊은 뒤 재개 → 문서가 빠짐없이, 중복 없이 기록되는지 확인
+3. 문서 추가 후 --incremental 내보내기
+4. 이미지 함께 받기: 다운로드 동시성 1 vs --image-workers
+
+실행:
+    python -m benchmarks.bench_export --docs 100000 --shard-mb 16
+"""
+import argparse
+import glob
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import export_dataset
+from fakes import FakeBucket, FakeFirestore
+
+BASE_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class _Interrupt(Exception):
+    pass
+
+
+def populate(db, start, count, bucket=None):
+    docs = db.collection(export_dataset.COLLECTION).docs
+    for i in range(start, start + count):
+        path = f"cropped_problems/{i:08d}.png"
+        docs[f"doc{i:08d}"] = {
+            "drive_file_id": f"file{i:08d}",
+            "original_filename": f"scan_{i:06d}.png",
+            "storage_path": path,
+            "image_url": f"https://storage.fake/fake-bucket/{path}",
+            "problem_text": f"다음 식의 값을 구하시오. $x^2 + {i}x + 1 = 0$" * 3,
+            "subject": "수학 I", "unit": "지수함수와 로그함수", "difficulty": "중",
+            "created_at": BASE_TIME + timedelta(seconds=i),
+        }
+        if bucket is not None:
+            bucket.objects[path] = (b"\x89PNG" + b"\0" * 2048, "image/png")
+    db.collection(export_dataset.COLLECTION).version += 1
+
+
+def read_ids(out_dir):
+    ids = []
+    for path in sorted(glob.glob(os.path.join(out_dir, "shard-*.jsonl"))):
+        with open(path, encoding="utf-8") as f:
+            ids.extend(json.loads(line)["id"] for line in f)
+    return ids
+
+
+def report(label, summary):
+    elapsed = summary["elapsed"] or 1e-9
+    print(f"  {label:<16}: {summary['exported']:>7}건 {elapsed:6.2f}s "
+          f"({summary['exported'] / elapsed:8.0f} docs/s, {summary['bytes'] / 1e6 / elapsed:6.1f} MB/s, "
+          f"샤드 {summary['shards']}개, 이미지 {summary['images']}장)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--shard-mb", type=float, default=16)
+    parser.add_argument("--latency", type=float, default=0.02, help="쿼리 / 이미지 다운로드 1회 지연(초)")
+    parser.add_argument("--image-docs", type=int, default=1000, help="이미지 측정에 쓸 문서 수")
+    parser.add_argument("--image-workers", type=int, default=8)
+    args = parser.parse_args(argv)
+    shard_bytes = int(args.shard_mb * 1024 * 1024)
+
+    db = FakeFirestore(latency=args.latency)
+    populate(db, 0, args.docs)
+    print(f"[문서 {args.docs}건, 페이지 {args.page_size}, 쿼리 지연 {args.latency * 1000:.0f}ms]")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full = export_dataset.export(db, os.path.join(tmp, "full"), shard_bytes=shard_bytes,
+                                     page_size=args.page_size)
+        report("전체", full)
+
+        # 중간 (약 40%)에 끊고 재개
+        out = os.path.join(tmp, "resume")
+        stop_at = int(args.docs * 0.4)
+
+        def interrupt(summary):
+            if summary["exported"] >= stop_at:
+                raise _Interrupt()
+
+        try:
+            export_dataset.export(db, out, shard_bytes=shard_bytes, page_size=args.page_size, on_page=interrupt)
+        except _Interrupt:
+            pass
+        resumed = export_dataset.export(db, out, shard_bytes=shard_bytes, page_size=args.page_size)
+        report("재개 (40% 이후)", resumed)
+        ids = read_ids(out)
+        print(f"    → 기록 {len(ids)}건, 중복 {len(ids) - len(set(ids))}건, 누락 {args.docs - len(set(ids))}건")
+
+        # 증분
+        added = max(1, args.docs // 100)
+        populate(db, args.docs, added)
+        incremental = export_dataset.export(db, out, shard_bytes=shard_bytes, page_size=args.page_size,
+                                            incremental=True)
+        report(f"증분 (+{added})", incremental)
+        ids = read_ids(out)
+        print(f"    → 기록 {len(ids)}건, 중복 {len(ids) - len(set(ids))}건")
+
+        # 이미지 함께 받기
+        print(f"\n[이미지 {args.image_docs}장, 다운로드 지연 {args.latency * 1000:.0f}ms]")
+        db = FakeFirestore()
+        bucket = FakeBucket(latency=args.latency)
+        populate(db, 0, args.image_docs, bucket)
+        for workers in (1, args.image_workers):
+            summary = export_dataset.export(db, os.path.join(tmp, f"images-{workers}"), bucket=bucket,
+                                            shard_bytes=shard_bytes, page_size=args.page_size,
+                                            image_workers=workers)
+            report(f"동시 다운로드 x{workers}", summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+여러 라벨러가 같은 작업 폴더를 나눠 쓰는 작업 임대 시뮬레이션 (인증 키 불필요).
+
+라벨러(스레드) --workers명이 같은 폴더에서 파일당 --label초씩 작업합니다.
+- 임대 없음 (기존): 모두 같은 폴더 목록을 받아 처음부터 처리. --refresh개마다 목록을 다시 불러와 완료된 파일만 빠짐
+- 임대: leases.MemoryLeaseStore에서 --batch개씩 임대받아 처리 (호출마다 --store-latency 대기 = Firestore 트랜잭션 왕복),
+  앱처럼 ttl/3마다 갱신하고, 파일을 끝낼 때마다 완료로 반납
+--crash를 주면 첫 라벨러가 임대를 잡은 채 멈추고, --ttl초 뒤 다른 라벨러가 그 파일을 가져가는지 확인합니다.
+
+실행:
+    python -m benchmarks.bench_leases --files 120 --workers 1 2 4 8
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+
+from leases import MemoryLeaseStore
+
+
+class Folder:
+    """작업 폴더: 완료 처리된 파일은 다음 목록 조회부터 빠집니다 (드라이브 이동과 같음)"""
+
+    def __init__(self, count):
+        self.files = [f"file_{i:06d}" for i in range(count)]
+        self.done = set()
+        self.labels = Counter()  # 파일별 라벨링 횟수
+        self._lock = threading.Lock()
+
+    def listing(self):
+        with self._lock:
+            return [f for f in self.files if f not in self.done]
+
+    def finish(self, file_id):
+        with self._lock:
+            self.labels[file_id] += 1
+            self.done.add(file_id)
+
+    def remaining(self):
+        with self._lock:
+            return len(self.files) - len(self.done)
+
+
+def worker_legacy(folder, args):
+    files, since_refresh = folder.listing(), 0
+    while files:
+        file_id = files.pop(0)
+        time.sleep(args.label)
+        folder.finish(file_id)
+        since_refresh += 1
+        if since_refresh >= args.refresh:
+            files, since_refresh = folder.listing(), 0
+
+
+def worker_leased(name, folder, store, args, crash=False):
+    while folder.remaining():
+        claimed = store.claim(name, folder.listing(), args.batch)
+        if crash:
+            return  # 임대를 잡은 채 세션이 사라짐 (브라우저 종료 등)
+        if not claimed:
+            time.sleep(args.label)  # 남은 파일은 모두 다른 라벨러가 작업 중
+            continue
+        renewed = time.monotonic()
+        for file_id in claimed:
+            if time.monotonic() - renewed > args.ttl / 3:
+                renewed = time.monotonic()
+                if file_id not in store.renew(name, [file_id]):
+                    continue  # 만료되어 다른 라벨러에게 넘어감
+            time.sleep(args.label)
+            folder.finish(file_id)
+            store.release(name, [file_id], done=True)
+
+
+def run(mode, workers, args):
+    folder = Folder(args.files)
+    store = MemoryLeaseStore(ttl=args.ttl, latency=args.store_latency)
+    threads = []
+    for i in range(workers):
+        if mode == "legacy":
+            target, targs = worker_legacy, (folder, args)
+        else:
+            target, targs = worker_leased, (f"worker-{i}", folder, store, args, args.crash and i == 0)
+        threads.append(threading.Thread(target=target, args=targs))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    labels = sum(folder.labels.values())
+    return {
+        "elapsed": elapsed,
+        "unique": len(folder.labels),
+        "duplicates": labels - len(folder.labels),
+        "per_hour": len(folder.labels) / elapsed * 3600,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=120)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--label", type=float, default=0.05, help="파일당 작업 시간(초)")
+    parser.add_argument("--batch", type=int, default=5, help="한 번에 임대받는 파일 수")
+    parser.add_argument("--ttl", type=float, default=1.0, help="임대 만료 시간(초)")
+    parser.add_argument("--store-latency", type=float, default=0.02)
+    parser.add_argument("--refresh", type=int, default=10, help="임대 없음: 목록을 다시 불러오는 간격(파일 수)")
+    parser.add_argument("--crash", action="store_true", help="첫 라벨러가 임대를 잡은 채 멈춤")
+    args = parser.parse_args(argv)
+
+    print(f"[{args.files}개 파일, 파일당 {args.label * 1000:.0f}ms, 임대 {args.batch}개씩 / ttl {args.ttl}s"
+          + (", 첫 라벨러 중단" if args.crash else "") + "]")
+    print(f"  {'방식':<8}{'라벨러':>6}{'소요 s':>9}{'완료':>6}{'중복':>6}{'시간당':>10}{'1명 대비':>9}")
+    for mode, label in (("legacy", "임대 없음"), ("leased", "임대")):
+        base = None
+        for workers in args.workers:
+            row = run(mode, workers, args)
+            base = base or row["per_hour"]
+            print(f"  {label:<8}{workers:>6}{row['elapsed']:>9.2f}{row['unique']:>6}{row['duplicates']:>6}"
+                  f"{row['per_hour']:>10.0f}{row['per_hour'] / base:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+모델 응답 파싱 비교: 기존(정규식 울타리 제거 → json.loads → 실패 시 백슬래시 치환 후 재시도) vs 현재(한 번에 읽는 관대한 디코더).
+
+말뭉치는 모델 원본 응답 JSONL ({"text": ..., "count": 문제 수}) 입니다.
+- 앱 secrets의 GEMINI_RECORD_PATH 또는 batch_label.py --record로 실제 응답을 모을 수 있습니다
+- --corpus가 없으면 실제로 보이는 형태를 섞은 합성 말뭉치를 만듭니다
+  (정상 / LaTeX 백슬래시 미이스케이프 / ```json 울타리 / 문자열 안 줄바꿈 / 리스트로 감싼 응답 / 중간에 끊긴 응답)
+
+측정: 응답당 파싱 시간, 실패율, 내용 손상 건수
+- 합성 말뭉치: 디코딩한 problem_text / diagram_desc / diagram_code를 원본 문자열과 비교
+  (\\frac → 폼피드 + "rac", \\theta → 탭 + "heta", diagram_code의 줄바꿈이 "\\n" 글자로 남는 경우 모두 포함)
+- 실제 응답(--corpus): 원본을 모르므로 $...$ 수식 안에 제어 문자(\\b \\f \\t \\n \\r)가 생긴 경우만 셉니다
+
+실행:
+    python -m benchmarks.bench_parse
+    python -m benchmarks.bench_parse --corpus responses.jsonl
+"""
+import argparse
+import json
+import random
+import re
+import statistics
+import time
+
+from extraction import parse_batch_response, parse_response
+from fakes import FAKE_RESULT
+
+LATEX = [
+    "$\\frac{1}{2}$", "$\\sqrt{x^2+1}$", "$\\alpha+\\beta$", "$\\lim_{x \\to 1} f(x)$", "$\\theta$",
+    "$\\left( a \\right)$", "$\\times$", "$\\int_0^1 x\\,dx$", "$\\binom{n}{k}$", "$\\overline{AB}$",
+    "$a \\neq b$", "$\\tan x$", "$\\nabla f$", "$x \\rightarrow \\infty$", "$\\rho$", "$\\text{m}$", "$\\nu$",
+]
+TEXT_FIELDS = ("problem_text", "diagram_desc", "diagram_code")
+MATH = re.compile(r"\$[^$]*\$")
+MANGLED = re.compile("[\x08\x0c\t\n\r]")  # LaTeX 명령의 \b \f \t \n \r이 제어 문자로 바뀐 흔적
+
+
+# ------------------------------------------
+# 기존 파서 (비교용으로 옮겨 둔 이전 extraction._loads_tolerant)
+# ------------------------------------------
+def legacy_loads(text):
+    clean_text = re.sub(r"```json|```", "", text).strip()
+    try:
+        return json.loads(clean_text)
+    except json.JSONDecodeError:
+        fixed_text = re.sub(r'\\(?!["\\/bfnrtu])', r'\\\\', clean_text)
+        try:
+            return json.loads(fixed_text)
+        except json.JSONDecodeError as e2:
+            return {"error": f"JSON Parsing Failed: {str(e2)}", "problem_text": "", "diagram_code": "",
+                    "raw_text_debug": clean_text}
+
+
+def legacy_parse(text, count=1):
+    parsed = legacy_loads(text)
+    if count > 1:
+        return parsed if isinstance(parsed, list) else [parsed]
+    if isinstance(parsed, list):
+        return parsed[0] if parsed else {"error": "Empty JSON list returned"}
+    return parsed
+
+
+def current_parse(text, count=1):
+    return parse_batch_response(text, count) if count > 1 else parse_response(text)
+
+
+# ------------------------------------------
+# 합성 말뭉치
+# ------------------------------------------
+def synthetic_corpus(size, seed=0):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        result = dict(FAKE_RESULT)
+        result["problem_text"] = " ".join(
+            ["다음 식의 값을 구하시오."] + rng.sample(LATEX, rng.randint(2, 6)) + ["① 1 ② 2 ③ 3"]
+        )
+        result["diagram_desc"] = "좌표평면 위의 " + rng.choice(LATEX) + " 그래프"
+        text = json.dumps(result, ensure_ascii=False, indent=rng.choice([None, 2]))
+        kind = rng.random()
+        if kind < 0.35:
+            # LaTeX 백슬래시를 이스케이프하지 않은 응답 (\frac, \theta 등이 그대로)
+            text = text.replace("\\\\", "\\")
+        elif kind < 0.45:
+            # 문자열 안에 실제 줄바꿈
+            text = re.sub(r"(?<!\\)\\n", "\n", text)
+        elif kind < 0.5:
+            text = text[: int(len(text) * rng.uniform(0.3, 0.9))]  # 중간에 끊김
+        if rng.random() < 0.3:
+            text = f"[{text}]"
+        if rng.random() < 0.4:
+            text = f"```json\n{text}\n```"
+        corpus.append({"text": text, "count": 1, "expected": {key: result[key] for key in TEXT_FIELDS}})
+    return corpus
+
+
+def load_corpus(paths):
+    corpus = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            corpus.extend(json.loads(line) for line in f if line.strip())
+    return corpus
+
+
+def damaged(item, expected):
+    """디코딩 결과가 원본과 다르면 True (원본이 없으면 수식 안의 제어 문자로 판단)"""
+    if expected:
+        return any(item.get(key) != value for key, value in expected.items())
+    text = str(item.get("problem_text", "")) + str(item.get("diagram_desc", ""))
+    return any(MANGLED.search(math) for math in MATH.findall(text))
+
+
+def run(parse, corpus, repeat):
+    samples, failures, mangled = [], 0, 0
+    for record in corpus:
+        text, count = record["text"], record.get("count", 1)
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = parse(text, count)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        samples.append(best)
+        items = result if isinstance(result, list) else [result]
+        if any(not isinstance(item, dict) or "error" in item for item in items):
+            failures += 1
+        elif any(damaged(item, record.get("expected")) for item in items):
+            mangled += 1
+    return {
+        "p50_us": statistics.median(samples) * 1e6,
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "failures": failures,
+        "mangled": mangled,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", nargs="*", help="원본 응답 JSONL (없으면 합성 말뭉치)")
+    parser.add_argument("--size", type=int, default=2000, help="합성 말뭉치 크기")
+    parser.add_argument("--repeat", type=int, default=3, help="응답마다 반복해 가장 빠른 값 사용")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.size)
+    source = ", ".join(args.corpus) if args.corpus else "합성"
+    print(f"[응답 {len(corpus)}개 ({source})]")
+    print(f"  {'방식':<6}{'p50 us':>9}{'평균 us':>9}{'실패':>7}{'실패율':>8}{'내용 손상':>11}")
+    for label, parse in (("기존", legacy_parse), ("현재", current_parse)):
+        row = run(parse, corpus, args.repeat)
+        print(f"  {label:<6}{row['p50_us']:>9.1f}{row['mean_us']:>9.1f}{row['failures']:>7}"
+              f"{row['failures'] / len(corpus):>8.1%}{row['mangled']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+전처리 단계의 전송 바이트 / 지연 감소 측정.
+
+--corpus 디렉토리의 이미지(스캔 crop 샘플)를 사용하고, 없으면 합성 샘플을 만들어 측정합니다.
+기준(baseline)은 기존 업로드 방식인 '원본 해상도 + 기본 품질 JPEG'입니다.
+
+실행:
+    python -m benchmarks.bench_preprocess --corpus samples/ --mbps 10
+"""
+import argparse
+import os
+import random
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+import preprocess
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff")
+
+
+def synthetic_corpus(count=12, seed=0):
+    """글자 위주 스캔 / 흑백 그래프 스캔 / 컬러 도형 crop을 흉내 낸 샘플"""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        kind = ("text", "gray", "color")[i % 3]
+        w, h = rng.choice([(2480, 1100), (1800, 900), (3000, 2000)])
+        img = Image.new("RGB", (w, h), (250, 250, 248))
+        draw = ImageDraw.Draw(img)
+        for line in range(h // 60):
+            y = 30 + line * 60
+            x = 40
+            while x < w - 200:
+                word = rng.randint(40, 180)
+                draw.rectangle((x, y, x + word, y + 22), fill=(20, 20, 20))
+                x += word + rng.randint(15, 40)
+        if kind != "text":
+            color = (30, 90, 200) if kind == "color" else (90, 90, 90)
+            cx, cy = w * 2 // 3, h // 2
+            for r in range(20, min(w, h) // 3, 6):
+                shade = tuple(min(255, c + r // 3) for c in color)
+                draw.ellipse((cx - r, cy - r, cx + r, cy + r), outline=shade, width=3)
+            img = img.filter(ImageFilter.GaussianBlur(1.2))
+        corpus.append((f"synthetic_{kind}_{i}", img))
+    return corpus
+
+
+def load_corpus(path):
+    corpus = []
+    for name in sorted(os.listdir(path)):
+        if name.lower().endswith(IMAGE_EXTS):
+            img = Image.open(os.path.join(path, name))
+            img.load()
+            corpus.append((name, img))
+    return corpus
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="샘플 이미지 디렉토리 (생략 시 합성 샘플)")
+    parser.add_argument("--mbps", type=float, default=10.0, help="업로드 대역폭 가정 (Mbit/s)")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    per_byte = 8 / (args.mbps * 1_000_000)
+
+    totals = {"baseline": 0, "model": 0, "storage": 0, "prep_ms": 0.0}
+    print(f"{'이미지':<24}{'분류':<7}{'baseline':>11}{'model':>11}{'storage':>11}{'전처리':>9}")
+    for name, img in corpus:
+        started = time.perf_counter()
+        model = preprocess.prepare(img, preprocess.MODEL_PROFILE, measure=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        storage = preprocess.prepare(img, preprocess.STORAGE_PROFILE)
+        totals["baseline"] += model.baseline_bytes
+        totals["model"] += len(model.data)
+        totals["storage"] += len(storage.data)
+        totals["prep_ms"] += elapsed
+        print(f"{name[:23]:<24}{model.content:<7}{model.baseline_bytes / 1024:>9.0f}KB"
+              f"{len(model.data) / 1024:>9.0f}KB{len(storage.data) / 1024:>9.0f}KB{elapsed:>7.0f}ms")
+
+    n = len(corpus) or 1
+    base = totals["baseline"]
+    print("\n[합계]")
+    for key, label in (("model", "모델 전송"), ("storage", "Storage 업로드")):
+        saved = 1 - totals[key] / base if base else 0
+        transfer_before = base * per_byte / n
+        transfer_after = totals[key] * per_byte / n
+        print(f"  {label:<14}: {base / 1024:8.0f}KB → {totals[key] / 1024:8.0f}KB ({saved:.0%} 감소)"
+              f" | 이미지당 전송 {transfer_before * 1000:6.0f}ms → {transfer_after * 1000:6.0f}ms @ {args.mbps:g}Mbps")
+    print(f"  전처리 비용     : 이미지당 평균 {totals['prep_ms'] / n:.0f}ms (baseline 측정용 JPEG 인코딩 포함)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+세션 페이지 이미지 메모리 / cropper rerun 시간 비교 (합성 A4 스캔, 인증 키 불필요).
+
+- 기존: 전체 해상도로 디코딩한 PIL 이미지를 세션에 보관하고 st_cropper에 그대로 전달 (crop 이미지 반환)
+- 현재: 압축 바이트 + 축소본(page_image.PageImage)만 보관, st_cropper에는 축소본 (영역 좌표 반환)
+  전체 해상도 crop은 분석/저장할 때만 바이트를 다시 디코딩해 만듭니다.
+
+rerun 시간은 st_cropper가 rerun마다 하는 일(원본 복사 → 700px 축소 → RGBA PNG base64 → crop)을 재현해 잽니다.
+세션 메모리는 새 프로세스에서 --sessions개 페이지를 보관하기 전후의 RSS 차이로 잽니다.
+
+실행:
+    python -m benchmarks.bench_proxy --sessions 8 --reruns 20
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+from benchmarks.bench_e2e import PAGE_SIZE, max_rss_mb
+from fakes import synthetic_scan
+from page_image import PROXY_SIZE, PageImage, decoded_bytes
+
+BOX = {"left": 60, "top": 40, "width": 380, "height": 200}  # 축소본 좌표 (문제 하나 크기)
+
+
+def scan_bytes(seed, gray=False):
+    """실제 스캔처럼 컬러 JPEG (--gray면 흑백 그대로)"""
+    data = synthetic_scan(seed, size=PAGE_SIZE)
+    if gray:
+        return data
+    buf = io.BytesIO()
+    Image.open(io.BytesIO(data)).convert("RGB").save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+def rss_mb():
+    """현재 RSS (Linux /proc). 없으면 최대 RSS로 대신합니다"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return max_rss_mb()
+
+
+def _cropper_canvas(img):
+    """streamlit_cropper._resize_img와 같은 700x700 맞춤 축소 + 프론트엔드 전송용 PNG base64"""
+    canvas = img
+    if canvas.height > PROXY_SIZE[1]:
+        ratio = PROXY_SIZE[1] / canvas.height
+        canvas = canvas.resize((int(canvas.width * ratio), int(canvas.height * ratio)))
+    if canvas.width > PROXY_SIZE[0]:
+        ratio = PROXY_SIZE[0] / canvas.width
+        canvas = canvas.resize((int(canvas.width * ratio), int(canvas.height * ratio)))
+    buf = io.BytesIO()
+    canvas.convert("RGBA").save(buf, format="PNG")
+    base64.b64encode(buf.getvalue())
+    return canvas
+
+
+def rerun_legacy(image):
+    orig = image.copy()
+    canvas = _cropper_canvas(image)
+    rw, rh = orig.width / canvas.width, orig.height / canvas.height
+    return orig.crop((int(BOX["left"] * rw), int(BOX["top"] * rh),
+                      int((BOX["left"] + BOX["width"]) * rw), int((BOX["top"] + BOX["height"]) * rh)))
+
+
+def rerun_current(page):
+    page.proxy.copy()
+    _cropper_canvas(page.proxy)
+    page.full_box(BOX)
+    return page.proxy_crop(BOX)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def load(mode, data):
+    if mode == "legacy":
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return image
+    return PageImage.from_bytes(data)
+
+
+def child(mode, paths):
+    """
+    새 프로세스에서 세션 수만큼 페이지를 보관하고 메모리를 출력합니다 (--child).
+    페이지는 부모가 파일로 만들어 두어, 합성할 때 쓴 메모리가 측정에 섞이지 않게 합니다.
+    """
+    pages = []
+    for path in paths:
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    before = rss_mb()
+    kept = [load(mode, data) for data in pages]
+    after = rss_mb()
+    estimated = sum(decoded_bytes(page) if mode == "legacy" else page.nbytes() for page in kept)
+    print(json.dumps({"rss_mb": after - before if before is not None else None, "estimated_mb": estimated / 1e6}))
+
+
+def memory(mode, paths):
+    cmd = [sys.executable, "-m", "benchmarks.bench_proxy", "--child", mode, *paths]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8, help="동시에 작업 중인 라벨러(세션) 수")
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--gray", action="store_true", help="흑백 스캔으로 측정")
+    parser.add_argument("--child", choices=["legacy", "current"], help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child, args.paths)
+        return
+
+    data = scan_bytes(0, args.gray)
+    image = load("legacy", data)
+    page = load("current", data)
+    print(f"[페이지 {PAGE_SIZE[0]}x{PAGE_SIZE[1]} {'흑백' if args.gray else '컬러'} JPEG {len(data) / 1024:.0f}KB"
+          f" → 축소본 {page.proxy.width}x{page.proxy.height}]")
+
+    print(f"\n[세션 {args.sessions}개 보관 메모리]")
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = []
+        for seed in range(args.sessions):
+            paths.append(os.path.join(workdir, f"page_{seed}.jpg"))
+            with open(paths[-1], "wb") as f:
+                f.write(scan_bytes(seed, args.gray))
+        rows = {mode: memory(mode, paths) for mode in ("legacy", "current")}
+    for mode, label in (("legacy", "기존 (전체 디코딩)"), ("current", "현재 (바이트+축소본)")):
+        row = rows[mode]
+        rss = f", RSS 증가 {row['rss_mb']:.1f}MB" if row["rss_mb"] is not None else ""
+        print(f"  {label:<20}: 세션당 {row['estimated_mb'] / args.sessions:6.2f}MB (픽셀+바이트 추정){rss}")
+
+    legacy_ms = timed(lambda: rerun_legacy(image), args.reruns)
+    current_ms = timed(lambda: rerun_current(page), args.reruns)
+    print(f"\n[cropper rerun 1회 (중앙값 {args.reruns}회)]")
+    print(f"  기존: {legacy_ms:7.1f} ms")
+    print(f"  현재: {current_ms:7.1f} ms  ({legacy_ms / current_ms:.1f}x)")
+
+    full_box = page.full_box(BOX)
+    print("\n[분석/저장 시점에만 드는 비용]")
+    print(f"  전체 해상도 디코딩 + crop: {timed(lambda: page.crop(full_box), args.reruns):7.1f} ms")
+    print(f"  페이지 로드 (기존 전체 디코딩)   : {timed(lambda: load('legacy', data), args.reruns):7.1f} ms")
+    print(f"  페이지 로드 (현재 축소 디코딩)   : {timed(lambda: load('current', data), args.reruns):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
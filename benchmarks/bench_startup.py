@@ -0,0 +1,124 @@
+"""
+app_deploy.py 콜드 스타트 import 시간 비교 (-X importtime 기반, 인증 키 불필요).
+
+Streamlit 서버는 어차피 streamlit을 import 해 두므로, 그 이후 스크립트 첫 실행에서 추가로 드는 시간만 잽니다.
+- 기존: 스크립트 맨 위에서 firebase_admin / googleapiclient / genai / matplotlib / streamlit_cropper를 모두 import
+- 현재: app_deploy.py의 모듈 최상위 import만 (무거운 모듈은 처음 쓰는 함수 안에서 import)
+
+실행:
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app_deploy.py")
+
+# 지연 로드 이전 app_deploy.py 최상위 import
+EAGER_IMPORTS = [
+    "firebase_admin",
+    "firebase_admin.credentials",
+    "firebase_admin.firestore",
+    "firebase_admin.storage",
+    "google.oauth2.service_account",
+    "googleapiclient.discovery",
+    "google.generativeai",
+    "matplotlib",
+    "matplotlib.pyplot",
+    "PIL.Image",
+    "streamlit_cropper",
+]
+
+
+def top_level_imports(path):
+    """모듈 최상위(함수 밖)의 import 대상 모듈 이름"""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    return [name for name in names if name != "streamlit"]
+
+
+def available(name):
+    code = f"import importlib.util, sys; sys.exit(0 if importlib.util.find_spec({name.split('.')[0]!r}) else 1)"
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT).returncode == 0
+
+
+def _script(modules):
+    lines = ["import time", "import streamlit", "started = time.perf_counter()"]
+    lines += [f"import {name}" for name in modules]
+    lines.append("print(time.perf_counter() - started)")
+    return "\n".join(lines)
+
+
+def wall_time(modules, repeat):
+    """새 프로세스에서 streamlit 이후 modules import에 걸린 시간 (초, 중앙값)"""
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _script(modules)], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip()))
+    return statistics.median(times)
+
+
+def importtime_top(modules, limit):
+    """-X importtime 출력에서 최상위 패키지별 누적 시간 상위 limit개 [(ms, 이름)]"""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", _script(modules)], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    seen_streamlit = False
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if name == "streamlit":
+            seen_streamlit = True  # 이 줄 이전은 서버가 이미 import 해 둔 모듈
+            continue
+        # 들여쓰기 없는 줄 = 스크립트가 직접 import 한 모듈 (누적 시간에 하위 모듈 포함)
+        if seen_streamlit and not line.split("|")[2].startswith("  "):
+            rows.append((int(cumulative) / 1000, name))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    eager = [name for name in EAGER_IMPORTS if available(name)]
+    missing = sorted(set(EAGER_IMPORTS) - set(eager))
+    lazy = top_level_imports(APP)
+
+    before = wall_time(eager + lazy, args.repeat)
+    after = wall_time(lazy, args.repeat)
+    print(f"[스크립트 첫 실행 import 시간, streamlit 제외, {args.repeat}회 중앙값]")
+    print(f"  기존 (전부 최상위 import): {before * 1000:8.1f} ms")
+    print(f"  현재 (지연 import)        : {after * 1000:8.1f} ms  ({before / after:.1f}x)")
+    if missing:
+        print(f"  (설치되지 않아 제외: {', '.join(missing)})")
+
+    for label, modules in (("기존", eager + lazy), ("현재", lazy)):
+        print(f"\n[{label}: -X importtime 누적 상위 {args.top}]")
+        for ms, name in importtime_top(modules, args.top):
+            print(f"  {ms:8.1f} ms  {name}")
+
+    print("\n이제 첫 사용 시점에 로드되는 모듈:")
+    print("  firebase_admin              → init_firebase() (사이드바 렌더링 이후)")
+    print("  google.oauth2 / googleapiclient → get_drive_credentials() / build_drive_service()")
+    print("  streamlit_cropper           → 첫 이미지 표시")
+    print("  google.generativeai         → 첫 AI 분석 (extraction.make_model)")
+    print("  matplotlib                  → 첫 도형 렌더 (별도 워커 프로세스)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+같은 crop을 여러 번 저장할 때의 Storage 업로드 / 객체 수 비교 (가짜 Firestore/Storage, 인증 키 불필요).
+
+문제 --problems개를 각각 --saves번 저장합니다 (라벨 수정 후 다시 저장하는 경우).
+- 기존: 경로가 파일명_타임스탬프라 저장할 때마다 새 객체 업로드 + make_public
+- 현재: 경로가 내용 해시라 처음 한 번만 업로드, 이후는 known_blobs 캐시/존재 확인으로 건너뜀
+(기존 경로도 현재 SaveQueue로 올리므로 존재 확인 호출은 양쪽 모두 포함됩니다)
+그다음 문제마다 마지막 문서만 남기고 지운 뒤 storage_gc로 참조 없는 객체를 정리합니다.
+
+실행:
+    python -m benchmarks.bench_storage --problems 20 --saves 3
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from PIL import Image
+
+import labeling
+from benchmarks.bench_e2e import META, PAGE_SIZE, crop
+from fakes import FakeBucket, FakeDriveService, FakeFirestore
+from save_queue import SaveQueue
+from storage_gc import collect_garbage
+
+SRC = "bench-src"
+
+
+def legacy_path(drive_file, job, save):
+    # 기존 build_save_job: {파일명}_{타임스탬프}.{확장자} (다시 저장하면 다른 초)
+    name = drive_file["name"].rsplit(".", 1)[0]
+    return f"{labeling.STORAGE_PREFIX}/{name}_{1700000000 + save}.{job.prepared.ext}"
+
+
+def run(mode, crops, args, workdir):
+    db = FakeFirestore()
+    bucket = FakeBucket(latency=args.upload_latency)
+    save_queue = SaveQueue(os.path.join(workdir, f"{mode}.sqlite3"), db, bucket)
+    doc_ids = {}
+    started = time.perf_counter()
+    try:
+        for save in range(args.saves):
+            for drive_file, image in crops:
+                job = labeling.build_save_job(drive_file, image, META, {"problem": f"v{save}"})
+                if mode == "legacy":
+                    job.doc["storage_path"] = job.storage_path = legacy_path(drive_file, job, save)
+                _, doc_id = job.enqueue(save_queue)
+                doc_ids.setdefault(drive_file["id"], []).append(doc_id)
+            save_queue.drain()
+        elapsed = time.perf_counter() - started
+    finally:
+        save_queue.stop()
+
+    stored = sum(len(data) for data, _ in bucket.objects.values())
+    # 문제마다 마지막 저장만 남기고 정리
+    for ids in doc_ids.values():
+        for doc_id in ids[:-1]:
+            db.collection("math_dataset").document(doc_id).delete()
+    gc = collect_garbage(db, bucket, min_age=0, delete=True)
+    return {
+        "elapsed": elapsed, "uploads": bucket.uploads, "exists_calls": bucket.exists_calls,
+        "objects": gc["objects"], "stored_mb": stored / 1e6, "deleted": gc["deleted"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--problems", type=int, default=20)
+    parser.add_argument("--saves", type=int, default=3, help="문제 하나를 저장하는 횟수")
+    parser.add_argument("--upload-latency", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    drive = FakeDriveService.with_images(SRC, args.problems, page_size=PAGE_SIZE)
+    crops = [(f, crop(Image.open(io.BytesIO(drive.content(f["id"]))))) for f in drive.folders[SRC]]
+
+    print(f"[문제 {args.problems}개 x 저장 {args.saves}번, 업로드 {args.upload_latency * 1000:.0f}ms]")
+    print(f"  {'방식':<6}{'flush s':>9}{'업로드':>7}{'존재확인':>9}{'객체':>6}{'저장 MB':>9}{'GC 삭제':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode, label in (("legacy", "기존"), ("current", "현재")):
+            row = run(mode, crops, args, workdir)
+            print(f"  {label:<6}{row['elapsed']:>9.2f}{row['uploads']:>7}{row['exists_calls']:>9}{row['objects']:>6}"
+                  f"{row['stored_mb']:>9.2f}{row['deleted']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+격리된 Matplotlib 도형 렌더러.
+
+미리보기의 diagram_code를 Streamlit 프로세스에서 exec 하지 않고 별도 워커 프로세스에서 실행합니다.
+- 워커는 `python -m diagram_render`로 띄우는 별도 인터프리터입니다 (multiprocessing spawn/forkserver는 워커가
+  __main__인 앱 스크립트를 다시 실행하므로 쓰지 않음). 127.0.0.1 소켓 + authkey로 접속해 Connection으로 주고받습니다.
+- 워커는 필요할 때 띄우고 재사용 (matplotlib import 비용은 한 번만, 앱 시작 시간에는 포함되지 않음)
+- 렌더마다 제한 시간(timeout) 초과 시 워커를 강제 종료하고 다음 렌더 때 새로 띄움 → 무한 루프 코드가 앱을 멈추지 못함
+- 모든 워커가 timeout 넘게 바쁘면 기다리지 않고 "렌더러 사용 중" 오류를 돌려줌
+- 워커마다 메모리 상한(RLIMIT_AS, POSIX 전용)
+- 코드 해시 기준 LRU 캐시 → 코드가 바뀌지 않으면 다시 실행하지 않음
+결과는 PNG 바이트이며, pyplot 전역 상태는 워커 안에만 남습니다.
+"""
+import hashlib
+import json
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.connection import Client, Connection, answer_challenge, deliver_challenge
+
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_MEMORY_MB = 1024
+DEFAULT_DPI = 150
+
+
+class RenderResult:
+    def __init__(self, png=None, error=None, elapsed=0.0, cached=False):
+        self.png = png
+        self.error = error
+        self.elapsed = elapsed
+        self.cached = cached
+
+    @property
+    def ok(self):
+        return self.png is not None
+
+
+# ==========================================
+# 워커 프로세스
+# ==========================================
+def _limit_memory(memory_mb):
+    if not memory_mb:
+        return
+    try:
+        import resource
+
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        # Windows 등 RLIMIT을 지원하지 않는 환경에서는 timeout만 적용됩니다
+        pass
+
+
+def _render(plt, code, dpi):
+    import io
+
+    plt.close("all")
+    local_vars = {}
+    # plt.show() 주석 처리 (백엔드 간섭 방지)
+    safe_code = code.replace("plt.show()", "# plt.show()")
+    exec(safe_code, {"__name__": "__diagram__", "plt": plt}, local_vars)
+
+    # 'fig' 변수가 없어도 현재 활성화된 그림(Figure)을 찾아냅니다
+    target_fig = local_vars.get("fig")
+    if target_fig is None and plt.get_fignums():
+        target_fig = plt.gcf()
+    if target_fig is None or not hasattr(target_fig, "savefig"):
+        return None, "코드는 실행되었으나 그려진 그래프(Figure)를 찾을 수 없습니다."
+
+    buf = io.BytesIO()
+    target_fig.savefig(buf, format="png", bbox_inches="tight", dpi=dpi)
+    plt.close("all")
+    return buf.getvalue(), None
+
+
+def _worker_main(conn, memory_mb):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    _limit_memory(memory_mb)
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        code, dpi = message
+        try:
+            png, error = _render(plt, code, dpi)
+        except MemoryError:
+            png, error = None, "메모리 한도 초과"
+        except BaseException as e:  # SystemExit 등도 워커 밖으로 새지 않도록
+            png, error = None, f"{type(e).__name__}: {e}"
+            plt.close("all")
+        conn.send((png, error))
+
+
+class _Worker:
+    def __init__(self, memory_mb, timeout):
+        """워커를 띄우고 접속을 기다립니다. timeout 안에 접속하지 못하면 OSError"""
+        authkey = os.urandom(32)
+        with socket.create_server(("127.0.0.1", 0)) as server:
+            server.settimeout(timeout)
+            self.process = subprocess.Popen(
+                [sys.executable, "-m", "diagram_render"], stdin=subprocess.PIPE,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            )
+            try:
+                # 접속 정보는 명령줄 대신 stdin으로 넘깁니다 (authkey가 프로세스 목록에 보이지 않도록)
+                hello = {"port": server.getsockname()[1], "authkey": authkey.hex(), "memory_mb": memory_mb}
+                self.process.stdin.write(json.dumps(hello).encode("utf-8") + b"\n")
+                self.process.stdin.close()
+                sock, _ = server.accept()
+                sock.setblocking(True)
+                self.conn = Connection(sock.detach())
+                # Client(authkey=...)와 같은 순서의 상호 인증 (Listener.accept와 동일)
+                deliver_challenge(self.conn, authkey)
+                answer_challenge(self.conn, authkey)
+            except BaseException:
+                self.process.kill()
+                self.process.wait()
+                raise
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.wait(1)
+        finally:
+            self.conn.close()
+
+
+# ==========================================
+# 렌더러 (프로세스 풀 + LRU 캐시)
+# ==========================================
+class DiagramRenderer:
+    def __init__(self, workers=2, timeout=DEFAULT_TIMEOUT, memory_mb=DEFAULT_MEMORY_MB,
+                 cache_size=128, dpi=DEFAULT_DPI):
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.dpi = dpi
+        self.cache_size = cache_size
+        # None은 아직 워커가 없는 자리: 꺼낸 렌더가 새 워커를 띄웁니다
+        self._idle = queue.Queue()
+        for _ in range(workers):
+            self._idle.put(None)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+        self.render_times = []
+        self.workers = workers
+
+    @staticmethod
+    def cache_key(code, dpi):
+        return hashlib.sha256(f"{dpi}:{code}".encode("utf-8")).hexdigest()
+
+    def render(self, code):
+        key = self.cache_key(code, self.dpi)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                png, error = self._cache[key]
+                return RenderResult(png, error, cached=True)
+            self.misses += 1
+
+        started = time.perf_counter()
+        png, error, cacheable = self._run(code)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.render_times.append(elapsed)
+            del self.render_times[:-200]
+            if cacheable:
+                self._cache[key] = (png, error)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return RenderResult(png, error, elapsed)
+
+    def _run(self, code):
+        """(png, error, 캐시 가능 여부). 시간 초과/워커 사망은 일시적일 수 있으므로 캐시하지 않습니다."""
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            return None, f"렌더러 사용 중 (워커 {self.workers}개가 모두 {self.timeout:g}초 넘게 작업 중)", False
+        healthy = False
+        try:
+            if worker is None:
+                worker = _Worker(self.memory_mb, self.timeout)
+            worker.conn.send((code, self.dpi))
+            if not worker.conn.poll(self.timeout):
+                with self._lock:
+                    self.timeouts += 1
+                return None, f"렌더링 시간 초과 ({self.timeout:g}초)", False
+            png, error = worker.conn.recv()
+            healthy = True
+            return png, error, True
+        except (EOFError, OSError):
+            # 메모리 한도 등으로 워커가 죽었거나 새 워커를 띄우지 못한 경우
+            return None, "렌더링 프로세스가 비정상 종료되었습니다 (메모리 한도 초과 가능)", False
+        finally:
+            if healthy:
+                self._idle.put(worker)
+            else:
+                # 죽었거나 멈춘 워커는 풀에 돌려놓지 않고, 빈 자리로 반납해 다음 렌더가 새로 띄우게 합니다
+                if worker is not None:
+                    worker.kill()
+                self._idle.put(None)
+
+    def stats(self):
+        with self._lock:
+            last = self.render_times[-1] if self.render_times else None
+            times = sorted(self.render_times)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "timeouts": self.timeouts,
+            "cached": len(self._cache),
+            "last_ms": last * 1000 if last is not None else None,
+            "p50_ms": times[len(times) // 2] * 1000 if times else None,
+        }
+
+    def close(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if worker is None:
+                continue
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.kill()
+
+
+# ==========================================
+# 워커 진입점: python -m diagram_render (접속 정보는 stdin 한 줄)
+# ==========================================
+if __name__ == "__main__":
+    hello = json.loads(sys.stdin.readline())
+    _worker_main(Client(("127.0.0.1", hello["port"]), authkey=bytes.fromhex(hello["authkey"])), hello["memory_mb"])
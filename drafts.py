@@ -0,0 +1,82 @@
+"""
+사전 분석(draft) 결과 저장소.
+
+batch_label.py가 미리 돌려둔 Gemini 추출 결과를 보관하고,
+app_deploy.py는 라벨링 화면에서 모델을 다시 부르지 않고 바로 불러옵니다.
+- JsonlDraftStore: 로컬 JSONL 큐 (한 줄 = 파일 하나, 같은 파일은 마지막 줄이 우선)
+- FirestoreDraftStore: Firestore 스테이징 컬렉션 (문서 ID = 드라이브 파일 ID)
+"""
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from image_cache import file_version
+
+DRAFT_COLLECTION = "math_dataset_drafts"
+
+
+def make_record(drive_file, draft, model_name, error=None):
+    return {
+        "drive_file_id": drive_file["id"],
+        "name": drive_file.get("name", ""),
+        "version": file_version(drive_file),
+        "model": model_name,
+        "draft": draft,
+        "error": error,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def usable(record, drive_file):
+    """에러 없이 끝났고, 분석한 뒤로 드라이브 파일이 바뀌지 않은 결과인지 (어느 쪽이든 버전을 모르면 사용)"""
+    if not record or record.get("error"):
+        return False
+    version = file_version(drive_file)
+    return not version or record.get("version") in (None, version)
+
+
+class JsonlDraftStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        record = json.loads(line)
+                        self._records[record["drive_file_id"]] = record
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def put(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._records[record["drive_file_id"]] = record
+
+    def get(self, file_id):
+        return self._records.get(file_id)
+
+    def done_records(self):
+        """에러 없이 끝난 파일 ID → 기록. 재실행 시 usable()로 버전까지 같은 파일만 건너뜁니다"""
+        return {fid: r for fid, r in self._records.items() if not r.get("error")}
+
+
+class FirestoreDraftStore:
+    def __init__(self, db, collection=DRAFT_COLLECTION):
+        self.collection = db.collection(collection)
+
+    def put(self, record):
+        self.collection.document(record["drive_file_id"]).set(record)
+
+    def get(self, file_id):
+        snap = self.collection.document(file_id).get()
+        return snap.to_dict() if snap.exists else None
+
+    def done_records(self):
+        records = {snap.id: snap.to_dict() or {} for snap in self.collection.select(["error", "version"]).stream()}
+        return {fid: r for fid, r in records.items() if not r.get("error")}
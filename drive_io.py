@@ -0,0 +1,129 @@
+"""
+구글 드라이브 입출력 헬퍼.
+
+Streamlit에 의존하지 않도록 분리한 모듈입니다.
+모든 함수는 `drive_service`(googleapiclient 리소스 또는 동일한 인터페이스의 가짜 객체)를
+인자로 받으며, 오류는 호출 측(app_deploy.py)에서 처리하도록 그대로 전달합니다.
+"""
+import threading
+
+# 실제로 사용하는 필드만 요청하여 응답 크기를 줄입니다. (checksum/modifiedTime은 디스크 캐시 키)
+LIST_FIELDS = "nextPageToken, files(id, name, md5Checksum, modifiedTime)"
+# Drive API가 허용하는 최대 페이지 크기
+LIST_PAGE_SIZE = 1000
+
+
+def image_query(folder_id):
+    return f"'{folder_id}' in parents and (mimeType contains 'image/') and trashed = false"
+
+
+def iter_drive_image_pages(drive_service, folder_id, page_token=None, page_size=LIST_PAGE_SIZE):
+    """
+    폴더의 이미지 목록을 페이지 단위로 순회하는 제너레이터.
+    nextPageToken을 끝까지 따라가며 (files, next_page_token) 튜플을 yield 합니다.
+    마지막 페이지의 next_page_token은 None 입니다.
+    """
+    query = image_query(folder_id)
+    while True:
+        params = {"q": query, "fields": LIST_FIELDS, "pageSize": page_size}
+        if page_token:
+            params["pageToken"] = page_token
+        results = drive_service.files().list(**params).execute()
+        page_token = results.get("nextPageToken")
+        yield results.get("files", []), page_token
+        if not page_token:
+            return
+
+
+def iter_drive_images(drive_service, folder_id, page_size=LIST_PAGE_SIZE):
+    """파일 단위로 펼친 버전. 페이지가 도착하는 즉시 파일을 하나씩 내보냅니다."""
+    for files, _ in iter_drive_image_pages(drive_service, folder_id, page_size=page_size):
+        yield from files
+
+
+# 변경 피드: 폴더 소속(parents)과 휴지통 여부로 작업 폴더에 들어오고 나간 파일을 가려냅니다
+CHANGE_FIELDS = (
+    "nextPageToken, newStartPageToken, "
+    "changes(fileId, removed, file(id, name, md5Checksum, modifiedTime, mimeType, parents, trashed))"
+)
+
+
+def start_page_token(drive_service):
+    """지금 이후의 변경만 받기 위한 변경 피드 시작 토큰. 폴더 목록을 받기 전에 잡아 두어야 그 사이 변경을 놓치지 않습니다."""
+    return drive_service.changes().getStartPageToken().execute()["startPageToken"]
+
+
+def http_status(error):
+    """googleapiclient HttpError의 HTTP 상태 코드. 그 밖의 예외는 None"""
+    return getattr(getattr(error, "resp", None), "status", None)
+
+
+def iter_changes(drive_service, page_token, page_size=LIST_PAGE_SIZE):
+    """
+    page_token 이후의 변경(드라이브 전체)을 페이지 단위로 순회하는 제너레이터.
+    (changes, new_start_page_token) 튜플을 yield 하며, new_start_page_token은 마지막 페이지에만 있습니다.
+    """
+    while True:
+        results = drive_service.changes().list(
+            pageToken=page_token, fields=CHANGE_FIELDS, pageSize=page_size, includeRemoved=True, spaces="drive",
+        ).execute()
+        yield results.get("changes", []), results.get("newStartPageToken")
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return
+
+
+# Drive 배치 요청 한 번에 넣을 수 있는 최대 호출 수
+BATCH_LIMIT = 100
+
+
+def batch_move(drive_service, moves):
+    """
+    여러 파일 이동을 Drive 배치 HTTP 요청 하나로 보냅니다.
+    moves: [(file_id, current_folder_id, done_folder_id), ...] (최대 BATCH_LIMIT개)
+    반환: {file_id: None(성공) 또는 예외}
+    """
+    results = {}
+
+    def callback(request_id, response, exception):
+        results[request_id] = exception
+
+    batch = drive_service.new_batch_http_request(callback=callback)
+    for file_id, current_folder_id, done_folder_id in moves:
+        batch.add(
+            drive_service.files().update(
+                fileId=file_id,
+                addParents=done_folder_id,
+                removeParents=current_folder_id,
+                fields='id',
+            ),
+            request_id=file_id,
+        )
+    batch.execute()
+    # 콜백이 오지 않은 요청은 실패로 처리합니다
+    for file_id, _, _ in moves:
+        results.setdefault(file_id, RuntimeError("배치 응답 누락"))
+    return results
+
+
+def download_bytes(drive_service, file_id):
+    """
+    파일 원본 바이트를 받아옵니다.
+    get_media 요청의 execute()는 본문 바이트를 그대로 반환합니다.
+    (스캔 이미지는 MediaIoBaseDownload 기본 청크 크기(100MB)보다 훨씬 작아 어차피 한 번의 요청입니다.)
+    """
+    return drive_service.files().get_media(fileId=file_id).execute()
+
+
+_local = threading.local()
+
+
+def thread_service(factory):
+    """
+    스레드마다 별도의 드라이브 서비스를 만들어 재사용합니다.
+    googleapiclient의 httplib2 연결은 스레드 간 공유가 안전하지 않기 때문입니다.
+    """
+    service = getattr(_local, "drive_service", None)
+    if service is None:
+        service = _local.drive_service = factory()
+    return service
@@ -0,0 +1,183 @@
+"""
+작업 폴더 목록의 증분 동기화 (드라이브 변경 피드).
+
+폴더 전체를 다시 나열하지 않고, 처음 목록을 받기 직전에 잡아 둔 변경 피드 토큰 이후의 변경만 받아 반영합니다.
+목록 비용은 폴더 크기가 아니라 그동안 바뀐 파일 수에 비례합니다.
+- FolderSync: 한 폴더의 파일 목록 + 토큰 + 최근 변경 기록. 모든 세션이 공유합니다 (스레드 안전)
+  path를 주면 JSON 파일에 저장해 두어 앱을 다시 띄워도 전체 목록을 다시 받지 않습니다.
+- 세션은 자기가 반영한 version을 들고 있다가 changes_since(version)으로 그 뒤의 추가/삭제만 받아 병합합니다.
+변경 피드는 드라이브 전체 단위라 다른 폴더의 변경도 오지만, 이 폴더에 들어오거나 나간 이미지 파일만 남깁니다.
+"""
+import json
+import os
+import threading
+import time
+
+import drive_io
+from metrics import maybe_span
+
+FILE_KEYS = ("id", "name", "md5Checksum", "modifiedTime")  # drive_io.LIST_FIELDS와 같은 필드
+LOG_LIMIT = 5000  # 세션 병합용으로 보관하는 최근 변경 수
+# 인증/권한/할당량 오류는 토큰 문제가 아니므로 목록을 다시 받지 않습니다
+NOT_TOKEN_ERRORS = (401, 403, 429)
+
+
+def _entry(file):
+    return {key: file[key] for key in FILE_KEYS if key in file}
+
+
+def token_rejected(error):
+    """변경 피드가 토큰을 거절했는지 (만료되었거나 잘못된 토큰 → 4xx)"""
+    status = drive_io.http_status(error)
+    return status is not None and 400 <= status < 500 and status not in NOT_TOKEN_ERRORS
+
+
+class FolderSync:
+    def __init__(self, folder_id, path=None, log_limit=LOG_LIMIT):
+        self.folder_id = folder_id
+        self.path = path
+        self.log_limit = log_limit
+        self.token = None     # 다음에 받을 변경 피드 위치 (None = 아직 전체 목록이 없음)
+        self.version = 0      # 변경을 반영할 때마다 1씩 증가
+        self.polled = 0.0
+        self._files = {}      # 파일 ID → 파일 (목록 순서 유지)
+        self._log = []        # [(version, file_id, 파일 또는 None(빠짐))]
+        self._log_start = 0   # 이 version 이후의 변경만 _log에 남아 있음
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    @property
+    def ready(self):
+        return self.token is not None
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("folder_id") != self.folder_id:
+            return
+        self.token = state["token"]
+        self.version = self._log_start = state.get("version", 0)
+        self._files = {f["id"]: f for f in state["files"]}
+
+    def _save(self):
+        if not self.path:
+            return
+        state = {"folder_id": self.folder_id, "token": self.token, "version": self.version,
+                 "files": list(self._files.values())}
+        # 임시 파일에 쓴 뒤 교체하므로 저장 도중 끊겨도 이전 스냅숏이 남습니다
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def reset(self, files, token):
+        """
+        전체 목록으로 새로 시작합니다. token: 그 목록을 받기 전에 잡은 start_page_token
+        반환: 새 version
+        """
+        with self._lock:
+            self._files = {f["id"]: _entry(f) for f in files}
+            self.token = token
+            self.version += 1
+            self._log = []
+            self._log_start = self.version
+            self._save()
+            return self.version
+
+    def snapshot(self):
+        """(파일 목록, version)"""
+        with self._lock:
+            return list(self._files.values()), self.version
+
+    def apply(self, changes, token):
+        """변경 피드 응답을 반영하고 token까지 진행합니다. 반환: 이 폴더에서 바뀐 파일 수"""
+        changed = 0
+        with self._lock:
+            for change in changes:
+                file_id = change.get("fileId")
+                file = change.get("file") or {}
+                inside = (
+                    not change.get("removed") and not file.get("trashed")
+                    and self.folder_id in file.get("parents", [])
+                    and file.get("mimeType", "").startswith("image/")
+                )
+                if inside:
+                    entry = _entry(file)
+                    if self._files.get(file_id) == entry:
+                        continue
+                    self._files[file_id] = entry
+                elif file_id in self._files:
+                    entry = None
+                    del self._files[file_id]
+                else:
+                    continue
+                self.version += 1
+                self._log.append((self.version, file_id, entry))
+                changed += 1
+            if len(self._log) > self.log_limit:
+                dropped = len(self._log) - self.log_limit
+                self._log_start = self._log[dropped - 1][0]
+                del self._log[:dropped]
+            if changed or token != self.token:
+                self.token = token
+                self._save()
+        return changed
+
+    def poll(self, drive_service, min_interval=0.0, metrics=None):
+        """
+        마지막 확인 후 min_interval초가 지났으면 변경 피드를 받아 반영합니다 (세션 여러 개가 불러도 한 번만).
+        실패한 시도도 시각을 남기므로 드라이브 오류 중에도 min_interval마다 한 번만 다시 묻습니다.
+        토큰이 거절되면(4xx) resync로 새 토큰을 잡고 전체 목록을 다시 받습니다.
+        반환: 바뀐 파일 수, 건너뛰었으면 None
+        """
+        with self._poll_lock:
+            if not self.ready or time.time() - self.polled < min_interval:
+                return None
+            try:
+                with maybe_span(metrics, "drive_changes") as tags:
+                    token, changes = self.token, []
+                    try:
+                        for page, new_token in drive_io.iter_changes(drive_service, token):
+                            changes.extend(page)
+                            token = new_token or token
+                    except Exception as e:
+                        if not token_rejected(e):
+                            raise
+                        tags["resync"] = True
+                        return self.resync(drive_service)
+                    tags["changes"] = len(changes)
+                    return self.apply(changes, token)
+            finally:
+                self.polled = time.time()
+
+    def resync(self, drive_service):
+        """
+        새 start_page_token을 잡은 뒤 전체 목록을 다시 받아 처음부터 시작합니다.
+        이전 version을 든 세션은 changes_since가 None을 받아 snapshot()과 비교합니다. 반환: 바뀐 파일 수
+        """
+        token = drive_io.start_page_token(drive_service)
+        files = [_entry(f) for f in drive_io.iter_drive_images(drive_service, self.folder_id)]
+        with self._lock:
+            before = self._files
+        changed = len(before.keys() - {f["id"] for f in files}) + sum(1 for f in files if before.get(f["id"]) != f)
+        self.reset(files, token)
+        return changed
+
+    def changes_since(self, version):
+        """
+        version 이후의 변경을 파일별로 합친 (추가/수정된 파일 목록, 빠진 파일 ID 집합, 현재 version).
+        기록이 잘려 알 수 없으면 None (snapshot()과 비교해야 함)
+        """
+        with self._lock:
+            if version < self._log_start:
+                return None
+            latest = {}
+            for logged, file_id, entry in reversed(self._log):
+                if logged <= version:
+                    break
+                latest.setdefault(file_id, entry)
+            upserts = [entry for entry in reversed(list(latest.values())) if entry is not None]
+            removed = {file_id for file_id, entry in latest.items() if entry is None}
+            return upserts, removed, self.version
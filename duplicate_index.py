@@ -0,0 +1,201 @@
+"""
+저장된 문제 crop의 지각 해시(dHash) 중복 색인.
+
+같은 시험 문제가 여러 스캔 원본에 반복해서 나오므로, 저장할 때마다 crop의 64비트 dHash를
+math_dataset 문서(phash 필드)에 함께 기록하고 메모리의 해밍 거리 색인에 넣어 둡니다.
+라벨링 화면은 '✨ AI 분석' 전에 해밍 거리 tolerance 이내의 이전 문제를 찾아 라벨 재사용을 제안합니다.
+
+phash가 없는 예전 문서는 한 번 백필하면 됩니다:
+    python duplicate_index.py --backfill
+"""
+import argparse
+import itertools
+import sys
+import threading
+
+from perceptual import HASH_BITS, dhash, from_signed64, to_signed64
+
+COLLECTION = "math_dataset"
+DEFAULT_TOLERANCE = 7  # 조각(4개)마다 거리 1 이하만 찾으면 되는 최대값 → 10만 건에서도 0.1ms대
+
+
+def _flip_masks(bits, radius):
+    """bits비트 정수에서 radius개 이하의 비트를 뒤집는 XOR 마스크 전부"""
+    masks = [0]
+    for count in range(1, radius + 1):
+        masks.extend(sum(1 << b for b in combo) for combo in itertools.combinations(range(bits), count))
+    return masks
+
+
+class HammingIndex:
+    """
+    다중 색인 해싱(multi-index hashing)으로 해밍 거리 radius 이내의 해시를 찾습니다.
+    64비트를 chunks개 조각으로 나누면, 거리가 radius 이하인 두 해시는 (비둘기집 원리로)
+    적어도 한 조각에서 거리가 radius // chunks 이하입니다. 그 조각 값 주변만 버킷으로 찾아 후보를 모으고
+    후보에 대해서만 전체 거리를 계산합니다.
+    (BK-tree는 radius 8, 10만 건에서 전체의 상당 부분을 방문해 수십 ms가 걸려 이 방식을 씁니다.)
+    """
+
+    def __init__(self, bits=HASH_BITS, chunks=4):
+        self.chunk_bits = bits // chunks
+        self.chunks = chunks
+        self._mask = (1 << self.chunk_bits) - 1
+        self._buckets = [{} for _ in range(chunks)]
+        self._keys = []
+        self._values = []
+        self._flips = {}
+
+    @property
+    def size(self):
+        return len(self._keys)
+
+    def add(self, key, value):
+        slot = len(self._keys)
+        self._keys.append(key)
+        self._values.append(value)
+        for i, buckets in enumerate(self._buckets):
+            buckets.setdefault((key >> (i * self.chunk_bits)) & self._mask, []).append(slot)
+
+    def search(self, key, radius):
+        """[(거리, 값)] (거리 오름차순)"""
+        flips = self._flips.get(radius // self.chunks)
+        if flips is None:
+            flips = self._flips[radius // self.chunks] = _flip_masks(self.chunk_bits, radius // self.chunks)
+        candidates = set()
+        for i, buckets in enumerate(self._buckets):
+            part = (key >> (i * self.chunk_bits)) & self._mask
+            for flip in flips:
+                slots = buckets.get(part ^ flip)
+                if slots:
+                    candidates.update(slots)
+        keys = self._keys
+        found = []
+        for slot in candidates:
+            distance = (keys[slot] ^ key).bit_count()
+            if distance <= radius:
+                found.append((distance, self._values[slot]))
+        found.sort(key=lambda item: item[0])
+        return found
+
+
+class DuplicateIndex:
+    """
+    값은 (doc_id, drive_file_id, original_filename) 입니다.
+    labels: 이 프로세스에서 저장한 문서의 라벨 (아직 Firestore에 기록되지 않았을 수 있으므로 따로 보관)
+    """
+
+    def __init__(self, tolerance=DEFAULT_TOLERANCE):
+        self.tolerance = tolerance
+        self.unindexed = 0
+        self.labels = {}
+        self._index = HammingIndex()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._index.size
+
+    def add(self, phash, doc_id, drive_file_id=None, name=None, labels=None):
+        with self._lock:
+            self._index.add(phash, (doc_id, drive_file_id, name))
+            if labels is not None:
+                self.labels[doc_id] = labels
+
+    def add_snapshot(self, snap):
+        value = snap.get("phash")
+        if value is None:
+            self.unindexed += 1
+            return False
+        self.add(from_signed64(value), snap.id, snap.get("drive_file_id"), snap.get("original_filename"))
+        return True
+
+    def matches(self, phash, tolerance=None):
+        """[{"distance", "doc_id", "drive_file_id", "name"}] (가까운 순)"""
+        with self._lock:
+            found = self._index.search(phash, self.tolerance if tolerance is None else tolerance)
+        return [
+            {"distance": distance, "doc_id": doc_id, "drive_file_id": drive_file_id, "name": name}
+            for distance, (doc_id, drive_file_id, name) in found
+        ]
+
+    def lookup(self, image, tolerance=None):
+        return self.matches(dhash(image), tolerance)
+
+    @classmethod
+    def from_firestore(cls, db, tolerance=DEFAULT_TOLERANCE, collection=COLLECTION):
+        index = cls(tolerance)
+        fields = ["phash", "drive_file_id", "original_filename"]
+        for snap in db.collection(collection).select(fields).stream():
+            index.add_snapshot(snap)
+        return index
+
+
+def labels_from_doc(doc):
+    """math_dataset 문서를 화면의 분석 결과(extracted) 형식으로 되돌립니다."""
+    meta = doc.get("meta", {})
+    content = doc.get("content", {})
+    return {
+        "problem_text": content.get("problem", ""),
+        "diagram_code": content.get("diagram_code", ""),
+        "diagram_desc": content.get("diagram_desc", ""),
+        "subject": meta.get("subject"),
+        "unit_major": meta.get("unit"),
+        "difficulty": meta.get("difficulty"),
+        "question_type": meta.get("question_type"),
+        "concept": meta.get("concept"),
+    }
+
+
+# ==========================================
+# 예전 문서 백필
+# ==========================================
+def backfill(db, bucket, collection=COLLECTION, on_progress=None):
+    """phash가 없는 문서의 이미지를 내려받아 해시를 계산하고 문서에 기록합니다. 반환: 갱신한 문서 수"""
+    import io
+
+    from PIL import Image
+
+    from export_dataset import storage_path_of
+
+    updated = 0
+    for snap in db.collection(collection).stream():
+        doc = snap.to_dict()
+        if doc.get("phash") is not None:
+            continue
+        path = storage_path_of(doc, getattr(bucket, "name", None))
+        if not path:
+            continue
+        try:
+            image = Image.open(io.BytesIO(bucket.blob(path).download_as_bytes()))
+            snap.reference.update({"phash": to_signed64(dhash(image))})
+            updated += 1
+        except Exception as e:
+            print(f"⚠️ {snap.id}: {e}", file=sys.stderr)
+        if on_progress:
+            on_progress(updated)
+    return updated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="math_dataset 중복 색인 도구")
+    parser.add_argument("--key-file", default="serviceAccountKey.json", help="서비스 계정 키 파일")
+    parser.add_argument("--backfill", action="store_true", help="phash가 없는 문서에 해시 기록")
+    args = parser.parse_args(argv)
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore, storage
+
+    from export_dataset import BUCKET_NAME
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(args.key_file), {'storageBucket': BUCKET_NAME})
+    db = firestore.client()
+    if args.backfill:
+        count = backfill(db, storage.bucket(), on_progress=lambda n: print(f"… {n}건", end="\r", flush=True))
+        print(f"백필 완료: {count}건")
+    index = DuplicateIndex.from_firestore(db)
+    print(f"색인: {len(index)}건 (phash 없음 {index.unindexed}건)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
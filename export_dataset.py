@@ -0,0 +1,287 @@
+"""
+math_dataset 컬렉션 내보내기 (학습용, 재개 가능한 JSONL 샤드).
+
+컬렉션 전체를 메모리에 올리지 않고 created_at + 문서 ID 순서로 page_size개씩 쿼리 커서로 넘기며
+shard-00000.jsonl, shard-00001.jsonl ... 에 이어 씁니다 (샤드 하나는 shard_mb를 넘지 않음).
+- --images: 각 문서의 이미지를 images/<문서ID>.<확장자>로 스레드 풀에서 병렬 다운로드
+- 페이지마다 checkpoint.json을 갱신하므로 중간에 끊겨도 같은 명령으로 이어서 내보냅니다
+- --incremental: 지난 내보내기 이후 created_at이 더 큰 문서만 새 샤드에 추가
+
+created_at이 없는 문서는 정렬 쿼리에서 제외됩니다 (앱은 저장 시 항상 SERVER_TIMESTAMP를 넣습니다).
+
+사용 예:
+    python export_dataset.py --out export/ --images
+    python export_dataset.py --out export/ --incremental
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from urllib.parse import unquote, urlparse
+
+KEY_FILE = "serviceAccountKey.json"
+BUCKET_NAME = "math-problem-collector.firebasestorage.app"
+COLLECTION = "math_dataset"
+CHECKPOINT_FILE = "checkpoint.json"
+IMAGE_DIR = "images"
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return str(value)
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def storage_path_of(doc, bucket_name=None):
+    """문서의 Storage 경로. 예전 문서는 storage_path가 없으므로 image_url에서 복원합니다."""
+    if doc.get("storage_path"):
+        return doc["storage_path"]
+    url = doc.get("image_url")
+    if not url:
+        return None
+    path = unquote(urlparse(url).path).lstrip("/")
+    if bucket_name and path.startswith(bucket_name + "/"):
+        return path[len(bucket_name) + 1:]
+    # https://storage.googleapis.com/<버킷>/<경로>
+    return path.split("/", 1)[1] if "/" in path else path
+
+
+# ==========================================
+# 체크포인트 / 샤드
+# ==========================================
+class Checkpoint:
+    """
+    last_doc_id / last_created_at: 마지막으로 완전히 기록된 페이지의 마지막 문서 (쿼리 커서)
+    shard_index / shard_bytes: 그 시점의 샤드 번호와 크기 (재개 시 이 크기로 잘라 중복 줄을 지움)
+    since: 이번 실행의 created_at 하한 (증분), high_water: 완료된 실행까지의 created_at 최댓값
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {
+            "since": None, "last_doc_id": None, "last_created_at": None,
+            "shard_index": 0, "shard_bytes": 0, "exported": 0,
+            "high_water": None, "done": False,
+        }
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.state.update(json.load(f))
+
+    def __getitem__(self, key):
+        return self.state[key]
+
+    def update(self, **changes):
+        self.state.update(changes)
+        # 임시 파일에 쓴 뒤 교체하므로 저장 도중 끊겨도 이전 체크포인트가 남습니다
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+class ShardWriter:
+    def __init__(self, out_dir, max_bytes, index=0, size=0):
+        self.out_dir = out_dir
+        self.max_bytes = max_bytes
+        self.index = index
+        self.size = size
+        self.shards_written = 0
+        path = self.path(index)
+        self._file = open(path, "r+b" if os.path.exists(path) else "wb")
+        # 체크포인트 이후에 쓰였던 (다시 내보낼) 줄을 잘라냅니다
+        self._file.truncate(size)
+        self._file.seek(size)
+
+    def path(self, index):
+        return os.path.join(self.out_dir, f"shard-{index:05d}.jsonl")
+
+    def write(self, line):
+        if self.size and self.size + len(line) > self.max_bytes:
+            self.rotate()
+        self._file.write(line)
+        self.size += len(line)
+
+    def rotate(self):
+        self._file.close()
+        self.index += 1
+        self.size = 0
+        self.shards_written += 1
+        self._file = open(self.path(self.index), "wb")
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+# ==========================================
+# 내보내기
+# ==========================================
+def _download(bucket, storage_path, target):
+    if os.path.exists(target):
+        return 0
+    data = bucket.blob(storage_path).download_as_bytes()
+    tmp = target + ".part"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, target)
+    return len(data)
+
+
+def export(db, out_dir, bucket=None, collection=COLLECTION, shard_bytes=256 * 1024 * 1024,
+           page_size=500, incremental=False, image_workers=8, on_page=None):
+    """
+    db: firestore.Client 호환 객체 (where/order_by/start_after/limit/stream)
+    bucket: 주면 이미지도 함께 내려받습니다 (storage.Bucket 호환)
+    on_page(summary): 페이지마다 호출 (진행 표시용)
+    반환: {"exported", "bytes", "images", "image_bytes", "shards", "elapsed"} (이번 실행분)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(out_dir, CHECKPOINT_FILE))
+    summary = {"exported": 0, "bytes": 0, "images": 0, "image_bytes": 0, "shards": 0, "elapsed": 0.0}
+
+    if checkpoint["done"]:
+        if not incremental:
+            return summary
+        # 지난 실행 이후 문서만 새 샤드에 이어 씁니다
+        checkpoint.update(
+            since=checkpoint["high_water"], last_doc_id=None, last_created_at=None, done=False,
+            shard_index=checkpoint["shard_index"] + (1 if checkpoint["shard_bytes"] else 0), shard_bytes=0,
+        )
+
+    image_dir = os.path.join(out_dir, IMAGE_DIR)
+    if bucket is not None:
+        os.makedirs(image_dir, exist_ok=True)
+    bucket_name = getattr(bucket, "name", None)
+
+    col = db.collection(collection)
+    base = col.order_by("created_at").order_by("__name__")
+    since = _parse_time(checkpoint["since"])
+    if since is not None:
+        base = col.where("created_at", ">", since).order_by("created_at").order_by("__name__")
+
+    cursor = None
+    if checkpoint["last_doc_id"]:
+        cursor = col.document(checkpoint["last_doc_id"]).get()
+        if not cursor.exists:
+            # 마지막 문서가 삭제되었으면 시각만으로 이어갑니다 (같은 시각의 문서는 건너뛸 수 있음)
+            cursor = {"created_at": _parse_time(checkpoint["last_created_at"])}
+
+    writer = ShardWriter(out_dir, shard_bytes, checkpoint["shard_index"], checkpoint["shard_bytes"])
+    pool = ThreadPoolExecutor(max_workers=image_workers, thread_name_prefix="export-image") if bucket else None
+    high_water = _parse_time(checkpoint["high_water"])
+    started = time.perf_counter()
+    try:
+        while True:
+            query = base.start_after(cursor) if cursor is not None else base
+            page = list(query.limit(page_size).stream())
+            if not page:
+                break
+
+            downloads = []
+            for snap in page:
+                doc = snap.to_dict()
+                record = {"id": snap.id, **doc}
+                if pool is not None:
+                    path = storage_path_of(doc, bucket_name)
+                    if path:
+                        ext = os.path.splitext(path)[1] or ".jpg"
+                        record["image_file"] = f"{IMAGE_DIR}/{snap.id}{ext}"
+                        downloads.append(pool.submit(_download, bucket, path, os.path.join(out_dir, record["image_file"])))
+                line = (json.dumps(record, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8")
+                writer.write(line)
+                summary["bytes"] += len(line)
+
+            # 페이지의 이미지가 모두 받아진 뒤에만 체크포인트를 전진시킵니다
+            for future in downloads:
+                size = future.result()
+                if size:
+                    summary["images"] += 1
+                    summary["image_bytes"] += size
+            writer.sync()
+
+            last = page[-1]
+            last_created = last.get("created_at")
+            if last_created is not None and (high_water is None or last_created > high_water):
+                high_water = last_created
+            summary["exported"] += len(page)
+            checkpoint.update(
+                last_doc_id=last.id,
+                last_created_at=_json_default(last_created) if last_created is not None else None,
+                shard_index=writer.index, shard_bytes=writer.size,
+                exported=checkpoint["exported"] + len(page),
+                high_water=_json_default(high_water) if high_water is not None else None,
+            )
+            cursor = last
+            if on_page:
+                on_page(summary)
+            if len(page) < page_size:
+                break
+        checkpoint.update(done=True)
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown(wait=True)
+        summary["shards"] = writer.shards_written + (1 if summary["bytes"] else 0)
+        summary["elapsed"] = time.perf_counter() - started
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="math_dataset 컬렉션을 JSONL 샤드로 내보내기")
+    parser.add_argument("--out", required=True, help="내보낼 디렉터리 (체크포인트 포함)")
+    parser.add_argument("--key-file", default=KEY_FILE, help="서비스 계정 키 파일")
+    parser.add_argument("--collection", default=COLLECTION)
+    parser.add_argument("--shard-mb", type=float, default=256, help="샤드 하나의 최대 크기 (MB)")
+    parser.add_argument("--page-size", type=int, default=500, help="쿼리 한 번에 읽을 문서 수")
+    parser.add_argument("--images", action="store_true", help="이미지도 함께 내려받기")
+    parser.add_argument("--image-workers", type=int, default=8, help="이미지 동시 다운로드 수")
+    parser.add_argument("--incremental", action="store_true", help="지난 내보내기 이후 문서만 추가")
+    parser.add_argument("--restart", action="store_true", help="체크포인트와 기존 샤드를 지우고 처음부터")
+    args = parser.parse_args(argv)
+
+    if args.restart and os.path.isdir(args.out):
+        shutil.rmtree(args.out)
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore, storage
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(args.key_file), {'storageBucket': BUCKET_NAME})
+
+    def report(summary):
+        print(f"… {summary['exported']}건 ({summary['bytes'] / 1e6:.1f}MB, 이미지 {summary['images']}장)", flush=True)
+
+    try:
+        summary = export(
+            firestore.client(), args.out,
+            bucket=storage.bucket() if args.images else None,
+            collection=args.collection, shard_bytes=int(args.shard_mb * 1024 * 1024),
+            page_size=args.page_size, incremental=args.incremental,
+            image_workers=args.image_workers, on_page=report,
+        )
+    except KeyboardInterrupt:
+        print("⏸️ 중단됨. 같은 명령으로 다시 실행하면 이어서 내보냅니다.", file=sys.stderr)
+        return 130
+    rate = summary["exported"] / summary["elapsed"] if summary["elapsed"] else 0
+    print(f"완료: {summary['exported']}건 / 샤드 {summary['shards']}개 / 이미지 {summary['images']}장 "
+          f"({summary['elapsed']:.1f}s, {rate:.0f} docs/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,421 @@
+"""
+Gemini 추출 로직 (Streamlit 비의존).
+
+app_deploy.py의 '✨ AI 분석' 버튼과 batch_label.py(헤드리스 일괄 사전 라벨링)가 함께 사용합니다.
+model 인자는 genai.GenerativeModel 또는 generate_content()를 가진 대체 객체면 됩니다.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+
+from json_stream import IncrementalJsonParser, loads_tolerant
+
+MODEL_NAME = "gemini-2.0-flash"
+GENERATION_CONFIG = {
+    "temperature": 0.1, 
+    "response_mime_type": "application/json"
+}
+
+# 분류 옵션 정의
+OPTIONS = {
+    "subject": ["수학II", "수학I", "미적분", "확률과통계", "기하", "공통수학", "중등수학"],
+    "grade": ["고2", "고1", "고3", "N수", "중등"],
+    "unit_major": [
+        "함수의 극한과 연속", "미분법", "적분법", 
+        "지수함수와 로그함수", "삼각함수", "수열",
+        "순열과 조합", "확률", "통계",
+        "이차곡선", "평면벡터", "공간도형과 공간좌표",
+        "다항식", "방정식과 부등식", "행렬", "집합과 명제", "함수", "기타"
+    ],
+    "difficulty": ["상", "최상(Killer)", "중", "하", "최하"],
+    "question_type": ["추론형", "계산형", "이해형", "문제해결형", "합답형"],
+    "source_org": ["평가원", "교육청", "사관학교/경찰대", "EBS", "내신", "기타"],
+    "concepts": ["샌드위치 정리", "절댓값 함수", "미분계수의 정의", "평균값 정리", "롤의 정리", "사이값 정리", "극대/극소", "변곡점", "정적분 정의", "부분적분", "치환적분", "도함수 활용", "삼수선의 정리", "기타"] 
+}
+
+# 응답 스키마의 필드 (프롬프트에 적힌 순서 = 스트리밍으로 도착하는 순서)
+RESPONSE_FIELDS = [
+    "problem_text", "diagram_desc", "diagram_code",
+    "subject", "unit_major", "question_type", "concept", "difficulty",
+]
+# 분류 필드 → OPTIONS 키 (구조화 출력 모드에서 enum으로 제한)
+ENUM_FIELDS = {
+    "subject": "subject", "unit_major": "unit_major", "question_type": "question_type",
+    "concept": "concepts", "difficulty": "difficulty",
+}
+
+
+def response_schema(options_dict, batch=False):
+    """
+    OPTIONS로 만든 응답 스키마 (generation_config의 response_schema).
+    분류 필드는 enum이라 모델이 목록 밖의 값을 돌려주지 않습니다. batch=True면 같은 객체의 배열.
+    (이 SDK 버전은 필드 순서를 지정할 수 없어 스트리밍 시 problem_text가 먼저 온다는 보장이 없습니다)
+    """
+    properties = {}
+    for field in RESPONSE_FIELDS:
+        key = ENUM_FIELDS.get(field)
+        if key in options_dict:
+            properties[field] = {"type": "string", "format": "enum", "enum": list(options_dict[key])}
+        else:
+            properties[field] = {"type": "string"}
+    schema = {"type": "object", "properties": properties, "required": list(RESPONSE_FIELDS)}
+    return {"type": "array", "items": schema} if batch else schema
+
+
+def build_prompt(options_dict):
+    options_str = json.dumps(options_dict, ensure_ascii=False, indent=2)
+
+    prompt = f"""
+    당신은 한국의 수학 교육 전문가이자 Python Matplotlib 코딩 전문가입니다.
+    제공된 수학 문제 이미지를 분석하여 다음 작업을 수행하고 JSON으로 반환하세요.
+
+    [작업 1: 텍스트 및 수식 추출]
+    - 문제의 모든 텍스트를 한국어 그대로 추출하세요.
+    - 수식은 LaTeX 포맷($...$)을 사용하세요.
+    - 보기가 있다면 보기까지 모두 포함하세요.
+
+    [작업 2: 도형 설명 (diagram_desc)]
+    - 시각장애인을 위해 그래프나 도형의 생김새를 한국어로 상세히 묘사하세요.
+
+    [작업 3: Python Matplotlib 코드 생성 (diagram_code)]
+    - **매우 중요:** 이 필드는 절대로 비워둘 수 없습니다. ("" 금지)
+    - 문제에 그래프, 도형, 함수식이 조금이라도 보인다면 그것을 그리는 코드를 작성하세요.
+    - 그림이 없는 단순 계산 문제라면, 빈 좌표평면(x축, y축)이라도 그리는 코드를 반드시 넣으세요.
+    - 코드는 `import matplotlib.pyplot as plt`와 `fig, ax = plt.subplots()`를 포함해야 합니다.
+    - plt.show()는 절대 사용하지 마세요.
+    - **핵심:** LaTeX 수식이 포함된 라벨은 반드시 **Raw String**을 사용해야 합니다.
+      (예: label=r'$y=\\frac{{1}}{{2}}x$')
+    - 줄바꿈은 `\\n`으로 이스케이프 처리하세요.
+
+    [작업 4: 자동 분류]
+    - 아래 리스트에서 가장 적절한 값을 선택하세요:
+    {options_str}
+
+    [응답 스키마 (JSON)]
+    {{
+        "problem_text": "...",
+        "diagram_desc": "...",
+        "diagram_code": "...",
+        "subject": "...",
+        "unit_major": "...",
+        "question_type": "...",
+        "concept": "...",
+        "difficulty": "..."
+    }}
+    """
+    return prompt
+
+
+def build_batch_prompt(options_dict):
+    """한 페이지에서 자른 여러 문제 이미지를 한 번에 분석하는 프롬프트 (결과는 이미지 순서대로 JSON 배열)"""
+    return build_prompt(options_dict) + """
+    [여러 문제 한 번에 분석]
+    - 이 요청에는 문제 이미지가 여러 장, 순서대로 첨부되어 있습니다. 각 이미지는 서로 다른 문제 하나입니다.
+    - 이미지마다 위 스키마의 JSON 객체를 하나씩 만들어, 첨부된 순서 그대로 JSON 배열([...])로 반환하세요.
+    - 배열 길이는 첨부된 이미지 수와 같아야 합니다. 읽을 수 없는 이미지도 빈 문자열로 채운 객체를 넣으세요.
+    """
+
+
+def prompt_version(prompt, schema=None):
+    """
+    프롬프트 + 생성 설정(+ 응답 스키마)의 짧은 해시. 프롬프트 문구나 OPTIONS가 바뀌면 값이 달라지므로
+    추출 결과 캐시가 예전 버전 결과를 재사용하지 않습니다.
+    """
+    raw = prompt + json.dumps(GENERATION_CONFIG, sort_keys=True)
+    if schema is not None:
+        raw += json.dumps(schema, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def make_model(api_key, model_name=MODEL_NAME):
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name, generation_config=GENERATION_CONFIG)
+
+
+def _loads_tolerant(text):
+    """
+    마크다운 울타리 무시 + LaTeX 백슬래시 복구를 한 번의 디코딩으로 처리합니다 (json_stream.loads_tolerant).
+    실패하면 오류 dict
+    """
+    try:
+        return loads_tolerant(text)
+    except ValueError as e:
+        return {
+            "error": f"JSON Parsing Failed: {str(e)}",
+            "problem_text": "",
+            "diagram_code": "",
+            "raw_text_debug": text.strip()
+        }
+
+
+def parse_response(text):
+    """
+    모델 응답 텍스트를 dict로 변환합니다.
+    [기능 개선]
+    1. LaTeX 백슬래시(\\) 파싱 오류 자동 수정
+    2. JSON이 리스트([])로 반환될 경우 자동 언패킹
+    """
+    parsed_data = _loads_tolerant(text)
+
+    # 3. [핵심 수정] 리스트([])로 감싸져서 왔을 경우 껍질 벗기기
+    if isinstance(parsed_data, list):
+        if len(parsed_data) > 0:
+            parsed_data = parsed_data[0] # 첫 번째 요소만 추출
+        else:
+            return {"error": "Empty JSON list returned"}
+    
+    return parsed_data
+
+
+def parse_batch_response(text, count):
+    """
+    여러 문제 응답(JSON 배열)을 이미지 순서대로 count개의 dict 리스트로 변환합니다.
+    객체 하나만 오면 첫 문제의 결과로 보고, 빠진 문제는 오류 dict로 채웁니다.
+    """
+    parsed_data = _loads_tolerant(text)
+    if isinstance(parsed_data, dict):
+        if "error" in parsed_data and "raw_text_debug" in parsed_data:
+            return [dict(parsed_data) for _ in range(count)]  # 응답 전체 파싱 실패
+        parsed_data = [parsed_data]
+
+    results = []
+    for i in range(count):
+        item = parsed_data[i] if i < len(parsed_data) else None
+        if isinstance(item, list) and item:
+            item = item[0]
+        if isinstance(item, dict):
+            results.append(item)
+        else:
+            results.append({
+                "error": f"응답에 {i + 1}번째 문제 결과가 없습니다 ({len(parsed_data)}개 반환)",
+                "problem_text": "",
+                "diagram_code": "",
+            })
+    return results
+
+
+# ==========================================
+# 호출 속도 제한 및 재시도
+# ==========================================
+class RateLimiter:
+    """분당 요청 수(rpm)를 넘지 않도록 호출 간격을 벌려주는 스레드 안전 리미터"""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """다음 호출 슬롯을 예약하고, 그때까지 기다려야 하는 시간(초)을 반환합니다."""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        return slot - now
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0):
+    """attempt번째 재시도 전 대기 시간 (지수 증가 + 50~100% 지터)"""
+    delay = min(max_delay, base_delay * (2 ** attempt))
+    return delay * (0.5 + random.random() / 2)
+
+
+def call_with_backoff(fn, max_retries=5, base_delay=1.0, max_delay=60.0, limiter=None, sleep=time.sleep):
+    """
+    fn()을 호출하고 예외가 나면 지수 백오프(+지터)로 재시도합니다.
+    마지막 시도까지 실패하면 예외를 그대로 올립니다.
+    """
+    for attempt in range(max_retries + 1):
+        if limiter:
+            limiter.wait()
+        try:
+            return fn()
+        except Exception:
+            if attempt == max_retries:
+                raise
+            sleep(backoff_delay(attempt, base_delay, max_delay))
+
+
+# ==========================================
+# 재사용 가능한 추출 엔진
+# ==========================================
+class ExtractionEngine:
+    """
+    한 번 만들어두고 계속 재사용하는 추출 엔진.
+    genai.configure / GenerativeModel 생성 / OPTIONS 직렬화 / 프롬프트 포맷팅을 생성 시 한 번만 수행합니다.
+    - extract(image): 동기 호출 (재시도 포함)
+    - extract_stream(image, on_partial): 스트리밍 호출. 응답 조각마다 지금까지 도착한 필드로 on_partial 호출
+    - extract_batch(images): 한 페이지의 여러 문제를 요청 한 번으로 분석 (이미지 순서대로 결과 리스트)
+    - extract_many(images): asyncio 병렬 호출 (동시 실행 수 제한, 요청별 타임아웃, 재시도)
+    실패한 항목은 예외 대신 {"error": ...} dict로 돌려줍니다.
+    structured=True면 OPTIONS로 만든 응답 스키마(response_schema)를 요청마다 함께 보내 분류 필드를 enum으로 제한합니다.
+    record_path를 주면 모델 원본 응답을 JSONL로 남깁니다 (파서 벤치마크용 말뭉치, benchmarks/bench_parse.py)
+    """
+
+    def __init__(self, model, options_dict=None, model_name=MODEL_NAME, max_concurrency=4,
+                 timeout=60.0, max_retries=3, base_delay=1.0, limiter=None, structured=False, record_path=None):
+        options_dict = options_dict or OPTIONS
+        self.model = model
+        self.model_name = model_name
+        self.structured = structured
+        self.schema = response_schema(options_dict) if structured else None
+        self.batch_schema = response_schema(options_dict, batch=True) if structured else None
+        self.prompt = build_prompt(options_dict)
+        self.prompt_version = prompt_version(self.prompt, self.schema)
+        self.batch_prompt = build_batch_prompt(options_dict)
+        self.batch_prompt_version = prompt_version(self.batch_prompt, self.batch_schema)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.limiter = limiter
+        self.record_path = record_path
+        self._record_lock = threading.Lock()
+
+    @classmethod
+    def from_api_key(cls, api_key, model_name=MODEL_NAME, **kwargs):
+        return cls(make_model(api_key, model_name), model_name=model_name, **kwargs)
+
+    def _request_options(self):
+        return {"timeout": self.timeout} if self.timeout else None
+
+    def _call_kwargs(self, batch=False):
+        """generate_content 인자 (모델 생성 시의 GENERATION_CONFIG에 응답 스키마만 더해 보냅니다)"""
+        kwargs = {"request_options": self._request_options()}
+        if self.structured:
+            kwargs["generation_config"] = {"response_schema": self.batch_schema if batch else self.schema}
+        return kwargs
+
+    def _record(self, text, count=1):
+        if not self.record_path:
+            return
+        line = json.dumps({"text": text, "count": count, "structured": self.structured}, ensure_ascii=False)
+        with self._record_lock, open(self.record_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def extract_raw(self, image):
+        """재시도 없이 한 번 호출합니다. 예외는 그대로 전달됩니다."""
+        response = self.model.generate_content([self.prompt, image], **self._call_kwargs())
+        self._record(response.text)
+        return parse_response(response.text)
+
+    def extract(self, image):
+        try:
+            return call_with_backoff(
+                lambda: self.extract_raw(image),
+                max_retries=self.max_retries, base_delay=self.base_delay, limiter=self.limiter,
+            )
+        except Exception as e:
+            return _failure(e)
+
+    def extract_stream_raw(self, image, on_partial=None):
+        """
+        재시도 없이 stream=True로 한 번 호출합니다. 예외는 그대로 전달됩니다.
+        on_partial(fields): 조각이 도착할 때마다 지금까지의 필드 dict (작성 중인 문자열 필드는 도착한 부분까지)
+        """
+        parser = IncrementalJsonParser()
+        chunks = self.model.generate_content([self.prompt, image], stream=True, **self._call_kwargs())
+        for chunk in chunks:
+            try:
+                text = chunk.text
+            except ValueError:
+                continue  # 텍스트 없는 조각 (finish_reason만 담긴 마지막 조각 등)
+            fields = parser.feed(text)
+            if on_partial is not None:
+                on_partial(fields)
+        self._record(parser.text)
+        if parser.done and parser.error is None:
+            return parser.result
+        # 점진 파서가 끝까지 읽지 못한 응답은 기존 파서로 한 번 더 (오류 dict 형식도 동일하게)
+        return parse_response(parser.text)
+
+    def extract_stream(self, image, on_partial=None):
+        """재시도하면 on_partial은 새 응답의 처음부터 다시 호출됩니다."""
+        try:
+            return call_with_backoff(
+                lambda: self.extract_stream_raw(image, on_partial),
+                max_retries=self.max_retries, base_delay=self.base_delay, limiter=self.limiter,
+            )
+        except Exception as e:
+            return _failure(e)
+
+    def extract_batch_raw(self, images):
+        """재시도 없이 이미지 여러 장을 한 요청으로 보냅니다. 예외는 그대로 전달됩니다."""
+        response = self.model.generate_content([self.batch_prompt, *images], **self._call_kwargs(batch=True))
+        self._record(response.text, len(images))
+        return parse_batch_response(response.text, len(images))
+
+    def extract_batch(self, images):
+        images = list(images)
+        if not images:
+            return []
+        try:
+            return call_with_backoff(
+                lambda: self.extract_batch_raw(images),
+                max_retries=self.max_retries, base_delay=self.base_delay, limiter=self.limiter,
+            )
+        except Exception as e:
+            return [_failure(e) for _ in images]
+
+    async def _generate_async(self, image):
+        contents = [self.prompt, image]
+        if hasattr(self.model, "generate_content_async"):
+            call = self.model.generate_content_async(contents, **self._call_kwargs())
+        else:
+            call = asyncio.to_thread(self.model.generate_content, contents, **self._call_kwargs())
+        return await asyncio.wait_for(call, timeout=self.timeout or None)
+
+    async def extract_async(self, image, semaphore=None):
+        semaphore = semaphore or asyncio.Semaphore(self.max_concurrency)
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with semaphore:
+                    if self.limiter:
+                        await self.limiter.wait_async()
+                    response = await self._generate_async(image)
+                self._record(response.text)
+                return parse_response(response.text)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    return _failure(e)
+                # 대기하는 동안에는 세마포어를 반납하여 다른 요청이 진행되도록 합니다
+                await asyncio.sleep(backoff_delay(attempt, self.base_delay))
+
+    async def extract_many(self, images):
+        """입력 순서대로 결과 리스트를 반환합니다."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.gather(*(self.extract_async(image, semaphore) for image in images))
+
+    def extract_many_sync(self, images):
+        """이벤트 루프 밖(Streamlit 스크립트, CLI)에서 extract_many를 실행합니다."""
+        return asyncio.run(self.extract_many(images))
+
+
+def _failure(e):
+    if isinstance(e, asyncio.TimeoutError):
+        message = "Timeout"
+    else:
+        message = str(e) or type(e).__name__
+    return {
+        "error": f"Logic Failed: {message}", 
+        "problem_text": "", 
+        "diagram_code": "",
+        "raw_text_debug": "Error before parsing"
+    }
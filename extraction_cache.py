@@ -0,0 +1,117 @@
+"""
+Gemini 추출 결과 메모이제이션 (SQLite 영구 저장).
+
+키 = crop 픽셀 해시 + 프롬프트 버전 + 모델 이름.
+살짝 다시 자르거나, 분석을 다시 누르거나, '◀ 이전'으로 돌아온 경우 모델을 다시 부르지 않습니다.
+tolerance > 0 이면 정확히 일치하지 않아도 dHash 해밍 거리가 tolerance 이하이고
+크기가 비슷한 crop의 결과를 재사용합니다.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from perceptual import dhash, from_signed64, hamming, pixel_digest, to_signed64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    key TEXT PRIMARY KEY,
+    phash INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    prompt_version TEXT NOT NULL,
+    model TEXT NOT NULL,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_extractions_scope ON extractions (prompt_version, model);
+CREATE INDEX IF NOT EXISTS idx_extractions_lru ON extractions (last_used);
+"""
+
+
+class ExtractionCache:
+    """
+    결과 JSON 크기 합계가 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 지웁니다.
+    에러가 포함된 결과는 저장하지 않습니다.
+    """
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, tolerance=0, size_ratio=0.05):
+        self.max_bytes = max_bytes
+        self.tolerance = tolerance
+        self.size_ratio = size_ratio
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def _key(self, digest, prompt_version, model_name):
+        return f"{model_name}:{prompt_version}:{digest}"
+
+    def get(self, image, prompt_version, model_name):
+        key = self._key(pixel_digest(image), prompt_version, model_name)
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.hits += 1
+            elif self.tolerance:
+                key, row = self._nearest(image, prompt_version, model_name)
+                if row is not None:
+                    self.near_hits += 1
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE extractions SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return json.loads(row[0])
+
+    def _nearest(self, image, prompt_version, model_name):
+        target = dhash(image)
+        width, height = image.size
+        best = (None, None, self.tolerance + 1)
+        rows = self._conn.execute(
+            "SELECT key, phash, width, height, result FROM extractions WHERE prompt_version = ? AND model = ?",
+            (prompt_version, model_name),
+        )
+        for key, phash, w, h, result in rows:
+            if abs(w - width) > width * self.size_ratio or abs(h - height) > height * self.size_ratio:
+                continue
+            distance = hamming(target, from_signed64(phash))
+            if distance < best[2]:
+                best = (key, (result,), distance)
+        return best[0], best[1]
+
+    def put(self, image, prompt_version, model_name, result):
+        if not isinstance(result, dict) or "error" in result:
+            return
+        payload = json.dumps(result, ensure_ascii=False)
+        key = self._key(pixel_digest(image), prompt_version, model_name)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, to_signed64(dhash(image)), image.size[0], image.size[1],
+                 prompt_version, model_name, payload, len(payload.encode("utf-8")), time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM extractions ORDER BY last_used").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM extractions WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions"
+            ).fetchone()
+        return {"hits": self.hits, "near_hits": self.near_hits, "misses": self.misses,
+                "entries": count, "bytes": total}
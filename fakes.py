@@ -0,0 +1,601 @@
+"""
+로컬 가짜(Fake) 클라이언트 모음.
+
+인증 키 없이 드라이브 / Firestore / Storage 연동 로직과 Gemini 호출을 실행/측정하기 위한 인-프로세스 대체품입니다.
+googleapiclient의 `service.files().list(...).execute()` 호출 형태를 그대로 흉내 냅니다.
+"""
+import asyncio
+import bisect
+import itertools
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class FakeHttpError(RuntimeError):
+    """googleapiclient.errors.HttpError처럼 resp.status를 가진 예외"""
+
+    def __init__(self, status, message):
+        super().__init__(f"{status} {message} (fake)")
+        self.resp = SimpleNamespace(status=status)
+
+
+class FakeDriveFiles:
+    def __init__(self, store):
+        self._store = store
+
+    def list(self, q="", fields=None, pageSize=100, pageToken=None, **_):
+        def run():
+            self._store.list_calls += 1
+            if self._store.list_latency:
+                time.sleep(self._store.list_latency)
+            files = self._store.query(q)
+            start = int(pageToken) if pageToken else 0
+            end = start + pageSize
+            resp = {"files": [dict(f) for f in files[start:end]]}
+            if end < len(files):
+                resp["nextPageToken"] = str(end)
+            return resp
+        return _Request(run)
+
+    def update(self, fileId, addParents=None, removeParents=None, **_):
+        def run():
+            self._store.update_calls += 1
+            return self._store.move(fileId, addParents, removeParents)
+        return _Request(run)
+
+    def get_media(self, fileId, **_):
+        def run():
+            self._store.download_calls += 1
+            if self._store.download_latency:
+                time.sleep(self._store.download_latency)
+            return self._store.content(fileId)
+        return _Request(run)
+
+
+class FakeDriveChanges:
+    """service.changes() 대체품. 토큰 = 변경 기록의 위치"""
+
+    def __init__(self, store):
+        self._store = store
+
+    def getStartPageToken(self, **_):
+        return _Request(lambda: {"startPageToken": str(len(self._store.change_log))})
+
+    def list(self, pageToken, fields=None, pageSize=100, **_):
+        def run():
+            self._store.changes_calls += 1
+            if self._store.list_latency:
+                time.sleep(self._store.list_latency)
+            start = int(pageToken)
+            if start < self._store.change_floor:
+                raise FakeHttpError(400, f"Invalid Value: pageToken {pageToken}")
+            end = min(start + pageSize, len(self._store.change_log))
+            resp = {"changes": [dict(c) for c in self._store.change_log[start:end]]}
+            if end < len(self._store.change_log):
+                resp["nextPageToken"] = str(end)
+            else:
+                resp["newStartPageToken"] = str(end)
+            return resp
+        return _Request(run)
+
+
+class FakeBatchRequest:
+    """service.new_batch_http_request() 대체품. execute() 한 번 = HTTP 왕복 한 번"""
+
+    def __init__(self, store, callback=None):
+        self._store = store
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._requests.append((request, callback or self._callback, request_id or str(len(self._requests))))
+
+    def execute(self):
+        self._store.batch_calls += 1
+        if self._store.latency:
+            time.sleep(self._store.latency)
+        for request, callback, request_id in self._requests:
+            try:
+                response, exception = request._fn(), None
+            except Exception as e:
+                response, exception = None, e
+            if callback:
+                callback(request_id, response, exception)
+
+
+class FakeDriveService:
+    """
+    폴더 -> 파일 목록을 메모리에 보관하는 가짜 Drive v3 서비스.
+    예) FakeDriveService.with_images("src", 10_000)
+    latency는 배치 요청 1회, list_latency / download_latency는 목록 페이지 / 다운로드 1회의 지연(초)입니다.
+    """
+
+    def __init__(self):
+        self.folders = {}
+        self.blobs = {}
+        self.page_size = None
+        self.list_latency = 0.0
+        self.download_latency = 0.0
+        self._lock = threading.Lock()
+        self.list_calls = 0
+        self.download_calls = 0
+        self.update_calls = 0
+        self.batch_calls = 0
+        self.changes_calls = 0
+        self.latency = 0.0
+        self.fail_ids = set()
+        self.change_log = []  # changes().list가 돌려줄 변경 (파일 추가/이동/삭제 시 기록)
+        self.change_floor = 0  # 이보다 앞선 변경 피드 토큰은 400으로 거절 (만료된 토큰 흉내)
+
+    @classmethod
+    def with_images(cls, folder_id, count, page_size=None):
+        """page_size=(가로, 세로)를 주면 파일마다 다른 합성 스캔 JPEG을 (처음 받을 때) 만들어 돌려줍니다."""
+        service = cls()
+        service.page_size = page_size
+        service.folders[folder_id] = [
+            {"id": f"file_{i:06d}", "name": f"scan_{i:06d}.jpg", "mimeType": "image/jpeg"}
+            for i in range(count)
+        ]
+        return service
+
+    def query(self, q):
+        # "'<folder>' in parents and ..." 형태의 쿼리에서 폴더 ID만 해석합니다.
+        folder_id = q.split("'")[1] if "'" in q else ""
+        return [
+            {"id": f["id"], "name": f["name"]}
+            for f in self.folders.get(folder_id, [])
+            if f.get("mimeType", "").startswith("image/")
+        ]
+
+    def _record(self, file, parents=None):
+        change = {"fileId": file["id"], "removed": parents is None}
+        if parents is not None:
+            change["file"] = dict(file, parents=list(parents), trashed=False)
+        self.change_log.append(change)
+
+    def add_file(self, folder_id, file):
+        """라벨링 도중 새 스캔이 폴더에 들어온 경우"""
+        with self._lock:
+            self.folders.setdefault(folder_id, []).append(file)
+            self._record(file, [folder_id])
+
+    def delete_file(self, file_id):
+        with self._lock:
+            for files in self.folders.values():
+                for i, f in enumerate(files):
+                    if f["id"] == file_id:
+                        self._record(files.pop(i))
+                        return
+
+    def move(self, file_id, add_parent, remove_parent):
+        if file_id in self.fail_ids:
+            raise RuntimeError(f"403 insufficientFilePermissions (fake): {file_id}")
+        source = self.folders.get(remove_parent, [])
+        for i, f in enumerate(source):
+            if f["id"] == file_id:
+                file = source.pop(i)
+                self.folders.setdefault(add_parent, []).append(file)
+                self._record(file, [add_parent])
+                return {"id": file_id}
+        raise RuntimeError(f"404 File not found (fake): {file_id}")
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatchRequest(self, callback)
+
+    def content(self, file_id):
+        # 따로 등록한 바이트가 없으면 파일 ID로 만든 더미 바이트를 돌려줍니다.
+        if file_id in self.blobs:
+            return self.blobs[file_id]
+        if self.page_size:
+            data = synthetic_scan(file_id, self.page_size)
+            with self._lock:
+                return self.blobs.setdefault(file_id, data)
+        return f"fake-image:{file_id}".encode()
+
+    def files(self):
+        return FakeDriveFiles(self)
+
+    def changes(self):
+        return FakeDriveChanges(self)
+
+
+def synthetic_scan(seed, size=(1654, 2339)):
+    """문제 몇 개와 도형 하나가 있는 흑백 스캔 페이지 JPEG (seed마다 내용이 다름)"""
+    import io
+    import random
+
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    width, height = size
+    image = Image.new("L", size, 250)
+    draw = ImageDraw.Draw(image)
+    y = height // 20
+    for problem in range(3):
+        for line in range(rng.randint(3, 6)):
+            x = width // 12
+            while x < width * 0.9:
+                word = rng.randint(width // 60, width // 12)
+                draw.rectangle((x, y, x + word, y + height // 120), fill=rng.randint(10, 60))
+                x += word + width // 80
+            y += height // 40
+        cx, cy, r = width // 2, y + height // 10, height // 14
+        draw.ellipse((cx - r, cy - r, cx + r, cy + r), outline=20, width=3)
+        draw.line((cx - r * 2, cy, cx + r * 2, cy), fill=20, width=2)
+        y += height // 4
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+# ==========================================
+# Firestore / Storage
+# ==========================================
+class FakeSnapshot:
+    def __init__(self, doc_id, data, reference=None):
+        self.id = doc_id
+        self._data = data
+        self.reference = reference
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return self._data.get(field) if self._data else None
+
+
+class FakeDocumentRef:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self.id = doc_id
+
+    def set(self, data, merge=False):
+        with self._collection.store.lock:
+            self._collection.store.writes += 1
+            self._collection.version += 1
+            docs = self._collection.docs
+            docs[self.id] = dict(docs.get(self.id, {}), **data) if merge else dict(data)
+
+    def update(self, data):
+        self.set(data, merge=True)
+
+    def get(self, **_):
+        return FakeSnapshot(self.id, self._collection.docs.get(self.id), self)
+
+    def delete(self):
+        with self._collection.store.lock:
+            self._collection.version += 1
+            self._collection.docs.pop(self.id, None)
+
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    "in": lambda a, b: a in b,
+}
+
+
+class FakeQuery:
+    """where / order_by / start_after / limit / stream 만 지원하는 쿼리 (불변 객체처럼 체이닝)"""
+
+    def __init__(self, collection, filters=(), orders=(), cursor=None, limit=None):
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._cursor = cursor
+        self._limit = limit
+
+    def _copy(self, **changes):
+        params = dict(filters=self._filters, orders=self._orders, cursor=self._cursor, limit=self._limit)
+        params.update(changes)
+        return FakeQuery(self._collection, **params)
+
+    def where(self, field=None, op=None, value=None, filter=None):
+        if filter is not None:
+            field, op, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction=None):
+        return self._copy(orders=self._orders + (field,))
+
+    def start_after(self, cursor):
+        return self._copy(cursor=cursor)
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def select(self, fields):
+        return self
+
+    def _sort_key(self, doc_id, data):
+        return tuple(doc_id if field == "__name__" else data.get(field) for field in self._orders) + (doc_id,)
+
+    def stream(self):
+        if self._collection.store.latency:
+            time.sleep(self._collection.store.latency)  # 쿼리 한 번 = 왕복 한 번
+        rows = self._collection.sorted_rows(self._orders)
+        keys = self._collection.sorted_keys(self._orders)
+        start = 0
+        if self._cursor is not None:
+            if isinstance(self._cursor, dict):
+                fields = list(itertools.takewhile(lambda f: f in self._cursor, self._orders))
+                cursor_key = tuple(self._cursor[field] for field in fields)
+                start = bisect.bisect_right([k[:len(cursor_key)] for k in keys], cursor_key)
+            else:
+                start = bisect.bisect_right(keys, self._sort_key(self._cursor.id, self._cursor.to_dict()))
+        emitted = 0
+        for doc_id, data in rows[start:]:
+            if self._limit is not None and emitted >= self._limit:
+                return
+            if all(field in data and _OPS[op](data[field], value) for field, op, value in self._filters):
+                emitted += 1
+                yield FakeSnapshot(doc_id, data, FakeDocumentRef(self._collection, doc_id))
+
+    def get(self):
+        return list(self.stream())
+
+
+class FakeCollection:
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.docs = {}
+        self.version = 0
+        self._ids = itertools.count()
+        self._sorted = {}
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            doc_id = f"auto_{next(self._ids):08d}"
+        return FakeDocumentRef(self, doc_id)
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+    def sorted_rows(self, orders):
+        """정렬 결과를 문서가 바뀔 때까지 캐시합니다 (페이지마다 10만 건을 다시 정렬하지 않도록)."""
+        cached = self._sorted.get(orders)
+        if cached is None or cached[0] != self.version:
+            query = FakeQuery(self, orders=orders)
+            rows = [
+                (doc_id, data) for doc_id, data in self.docs.items()
+                if all(field == "__name__" or field in data for field in orders)
+            ]
+            rows.sort(key=lambda row: query._sort_key(*row))
+            cached = (self.version, rows, [query._sort_key(*row) for row in rows])
+            self._sorted[orders] = cached
+        return cached[1]
+
+    def sorted_keys(self, orders):
+        self.sorted_rows(orders)
+        return self._sorted[orders][2]
+
+    def where(self, *args, **kwargs):
+        return FakeQuery(self).where(*args, **kwargs)
+
+    def order_by(self, field, direction=None):
+        return FakeQuery(self).order_by(field, direction)
+
+    def limit(self, count):
+        return FakeQuery(self).limit(count)
+
+    def select(self, fields):
+        return self
+
+    def stream(self):
+        for doc_id, data in list(self.docs.items()):
+            yield FakeSnapshot(doc_id, data, FakeDocumentRef(self, doc_id))
+
+
+class FakeWriteBatch:
+    def __init__(self, store):
+        self._store = store
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append((ref, data, merge))
+
+    def commit(self):
+        if self._store.latency:
+            time.sleep(self._store.latency)
+        self._store.batch_commits += 1
+        for ref, data, merge in self._ops:
+            ref.set(data, merge=merge)
+        self._ops = []
+
+
+class FakeFirestore:
+    """firestore.Client 대체품 (collection/document/batch 일부만 구현)"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.collections = {}
+        self.lock = threading.RLock()
+        self.writes = 0
+        self.batch_commits = 0
+
+    def collection(self, name):
+        with self.lock:
+            if name not in self.collections:
+                self.collections[name] = FakeCollection(self, name)
+            return self.collections[name]
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self._bucket = bucket
+        self.name = name
+
+    @property
+    def public_url(self):
+        return f"https://storage.fake/{self._bucket.name}/{self.name}"
+
+    def upload_from_string(self, data, content_type=None):
+        if self._bucket.latency:
+            time.sleep(self._bucket.latency)
+        with self._bucket.lock:
+            self._bucket.uploads += 1
+            self._bucket.objects[self.name] = (bytes(data), content_type)
+            self._bucket.touch(self.name)
+
+    def make_public(self):
+        with self._bucket.lock:
+            self._bucket.public.add(self.name)
+            self._bucket.touch(self.name)
+
+    def exists(self):
+        if self._bucket.latency:
+            time.sleep(self._bucket.latency / 4)  # 메타데이터 조회 (업로드보다 가벼움)
+        self._bucket.exists_calls += 1
+        return self.name in self._bucket.objects
+
+    @property
+    def updated(self):
+        """메타데이터 마지막 수정 시각 (GCS Blob.updated처럼 UTC datetime)"""
+        stamp = self._bucket.updated.get(self.name)
+        return datetime.fromtimestamp(stamp, timezone.utc) if stamp is not None else None
+
+    @property
+    def size(self):
+        obj = self._bucket.objects.get(self.name)
+        return len(obj[0]) if obj else None
+
+    def download_as_bytes(self):
+        if self._bucket.latency:
+            time.sleep(self._bucket.latency)
+        return self._bucket.objects[self.name][0]
+
+    def delete(self):
+        with self._bucket.lock:
+            self._bucket.objects.pop(self.name, None)
+            self._bucket.deletes += 1
+
+
+class FakeBucket:
+    """storage.Bucket 대체품"""
+
+    def __init__(self, name="fake-bucket", latency=0.0):
+        self.name = name
+        self.latency = latency
+        self.objects = {}
+        self.public = set()
+        self.updated = {}
+        self.uploads = 0
+        self.exists_calls = 0
+        self.deletes = 0
+        self.lock = threading.Lock()
+        self.clock = time.time
+
+    def touch(self, name):
+        self.updated[name] = self.clock()
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def list_blobs(self, prefix=""):
+        return [FakeBlob(self, name) for name in list(self.objects) if name.startswith(prefix)]
+
+
+# ==========================================
+# Gemini
+# ==========================================
+FAKE_RESULT = {
+    "problem_text": "함수 $f(x)=x^2$에 대하여 $\\lim_{x \\to 1} f(x)$의 값은?",
+    "diagram_desc": "포물선 $y=x^2$",
+    "diagram_code": "import matplotlib.pyplot as plt\nfig, ax = plt.subplots()\nax.plot([0, 1], [0, 1])",
+    "subject": "수학II",
+    "unit_major": "함수의 극한과 연속",
+    "question_type": "계산형",
+    "concept": "기타",
+    "difficulty": "하",
+}
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    genai.GenerativeModel 대체품. latency(초)만큼 대기 후 고정 JSON을 돌려줍니다.
+    fail_first=n 이면 처음 n번은 예외를 던져 재시도 로직을 확인할 수 있습니다.
+    stream=True면 응답을 chunk_chars 글자씩 나눠 흘려보냅니다 (latency의 first_chunk 비율은 첫 조각 전, 나머지는 조각마다 나눠 대기).
+    이미지가 여러 장이면 (extract_batch) 장마다 결과를 하나씩 담은 JSON 배열을 돌려주고,
+    두 번째 이미지부터는 장당 latency * per_image만큼 더 걸립니다 (출력 토큰이 늘어나는 만큼).
+    """
+
+    def __init__(self, latency=0.0, result=None, fail_first=0, chunk_chars=40, first_chunk=0.2, per_image=0.3):
+        self.latency = latency
+        self.result = result or FAKE_RESULT
+        self.fail_first = fail_first
+        self.chunk_chars = chunk_chars
+        self.first_chunk = first_chunk
+        self.per_image = per_image
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _response_text(self, contents):
+        images = len(contents) - 1  # [프롬프트, 이미지...]
+        if images > 1:
+            return json.dumps([self.result] * images, ensure_ascii=False), images
+        return json.dumps(self.result, ensure_ascii=False), 1
+
+    def generate_content(self, contents, stream=False, **_):
+        with self._lock:
+            self.calls += 1
+            should_fail = self.calls <= self.fail_first
+        text, images = self._response_text(contents)
+        if stream:
+            return self._stream(text, should_fail)
+        if self.latency:
+            time.sleep(self.latency * (1 + self.per_image * (images - 1)))
+        if should_fail:
+            raise RuntimeError("429 Resource exhausted (fake)")
+        return FakeResponse(text)
+
+    def _stream(self, text, should_fail):
+        if self.latency:
+            time.sleep(self.latency * self.first_chunk)
+        if should_fail:
+            raise RuntimeError("429 Resource exhausted (fake)")
+        pieces = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+        per_chunk = self.latency * (1 - self.first_chunk) / len(pieces)
+        for i, piece in enumerate(pieces):
+            if i and per_chunk:
+                time.sleep(per_chunk)
+            yield FakeResponse(piece)
+
+    async def generate_content_async(self, contents, **_):
+        with self._lock:
+            self.calls += 1
+            should_fail = self.calls <= self.fail_first
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if should_fail:
+            raise RuntimeError("429 Resource exhausted (fake)")
+        return FakeResponse(json.dumps(self.result, ensure_ascii=False))
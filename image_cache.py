@@ -0,0 +1,112 @@
+"""
+TEMP_DIR 기반 영구 디스크 캐시 (LRU 제거).
+
+드라이브 원본 이미지를 (파일 ID + md5Checksum/modifiedTime) 키로 저장하여,
+rerun / '◀ 이전' / 앱 재시작 시 같은 파일을 다시 받지 않도록 합니다.
+파일이 드라이브에서 수정되면 checksum이 바뀌므로 자동으로 새 키가 됩니다.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+def cache_key(file_id, version=None):
+    raw = f"{file_id}:{version or ''}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def file_version(drive_file):
+    """드라이브 파일 메타데이터에서 버전 문자열을 뽑습니다 (checksum 우선)."""
+    return drive_file.get("md5Checksum") or drive_file.get("modifiedTime")
+
+
+class DiskImageCache:
+    """
+    바이트 예산(max_bytes)을 넘으면 가장 오래 사용하지 않은 항목부터 지웁니다.
+    최근 사용 순서는 파일 mtime으로도 기록하므로 재시작 후에도 LRU 순서가 유지됩니다.
+    프리페치 스레드에서 동시에 호출되므로 모든 연산은 락으로 보호합니다.
+    """
+
+    SUFFIX = ".bin"
+
+    def __init__(self, root, max_bytes=1024 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size (앞쪽이 가장 오래된 항목)
+        self._total = 0
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.root, key + self.SUFFIX)
+
+    def _load_index(self):
+        found = []
+        for name in os.listdir(self.root):
+            if not name.endswith(self.SUFFIX):
+                continue
+            info = os.stat(os.path.join(self.root, name))
+            found.append((info.st_mtime, name[: -len(self.SUFFIX)], info.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total += size
+        with self._lock:
+            self._evict()
+
+    def get(self, file_id, version=None):
+        key = cache_key(file_id, version)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                # 외부에서 파일이 지워진 경우
+                self._total -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, file_id, data, version=None):
+        key = cache_key(file_id, version)
+        if len(data) > self.max_bytes:
+            return
+        tmp_path = self._path(key) + f".{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            os.replace(tmp_path, self._path(key))
+            self._total -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._total += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total,
+            }
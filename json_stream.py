@@ -0,0 +1,375 @@
+"""
+모델 응답용 관대한(tolerant) JSON 디코더.
+
+- IncrementalJsonParser: 스트리밍 응답 조각(chunk)을 feed()로 넣을 때마다 지금까지 도착한 필드를 dict로 돌려줍니다.
+  아직 끝나지 않은 문자열 필드도 도착한 만큼 들어 있으므로 problem_text를 생성 도중에 화면에 보여줄 수 있습니다.
+  이미 처리한 위치부터 이어서 읽으므로 전체 비용은 응답 길이에 비례합니다.
+- loads_tolerant: 완성된 응답 전체를 한 번에 디코딩합니다 (extraction.parse_response).
+  실패하면 고쳐서 다시 파싱하는 대신, 처음부터 아래 규칙대로 이스케이프를 정리해 한 번만 디코딩합니다.
+
+두 디코더는 같은 규칙을 따릅니다.
+- ```json 마크다운 울타리 무시
+- JSON에 없는 이스케이프(\\alpha 등)는 백슬래시를 그대로 둔 문자열로 복구
+- \\b, \\f 뒤에 영문자가 오면(\\frac, \\beta ...) 제어 문자가 아니라 LaTeX 명령으로 보고 백슬래시를 남김
+- $...$ 수식 안에서 \\t, \\n, \\r 뒤의 단어가 알려진 LaTeX 명령 이름이면(\\theta, \\neq, \\to, \\rho ...)
+  탭/줄바꿈이 아니라 LaTeX 명령으로 봄. 그 밖("$$\\nlim"처럼 올바른 JSON의 줄바꿈, 수식 밖 diagram_code의
+  "\\nfig, ax = ..." 등)은 그대로 줄바꿈
+- 문자열 안의 이스케이프되지 않은 줄바꿈 등 제어 문자는 그대로 허용
+- 최상위가 리스트([...])면 IncrementalJsonParser는 첫 번째 객체만 사용 (loads_tolerant는 리스트 그대로 반환)
+"""
+import json
+import re
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_WHITESPACE = " \t\r\n"
+_SURROGATE = re.compile("[\ud800-\udfff]")
+_PLAIN = re.compile(r'[^"\\$]+')  # 문자열 안에서 한 번에 옮겨도 되는 구간
+# 수식 안에서 \n, \r, \t로 시작해도 줄바꿈/탭이 아니라 LaTeX로 보는 명령 (백슬래시 뒤 이름 전체)
+_LATEX_NRT = frozenset("""
+    natural nabla ne neg neq nearrow newline nexists ngeq ngtr ni nleq nless nmid nolimits not notin nsubseteq
+    nsupseteq nu nwarrow
+    rangle rceil rfloor rho right rightarrow rightleftharpoons rm root rvert
+    tag tan tanh tau tbinom text textbf textit textrm tfrac theta therefore tilde times to top triangle
+""".split())
+_LATEX_LONGEST = max(map(len, _LATEX_NRT))
+_LETTERS = re.compile("[A-Za-z]*")
+
+
+def _join(token):
+    """\\uD83D\\uDE00 같은 서로게이트 쌍을 한 글자로 합칩니다."""
+    value = "".join(token)
+    if _SURROGATE.search(value):
+        value = value.encode("utf-16", "surrogatepass").decode("utf-16", "replace")
+    return value
+
+
+def _latex_command(esc, word, in_math):
+    """
+    esc 뒤에 이어지는 영문자 단어(word)를 보고 JSON 이스케이프가 아니라 LaTeX 명령인지 판단합니다.
+    \\b / \\f 뒤 영문자는 항상 LaTeX (\\frac, \\beta ...). 제어 문자 \\b, \\f는 수학 문제에 나올 일이 없습니다.
+    \\t / \\n / \\r은 수식 안에서 이름 전체가 _LATEX_NRT에 있을 때만 LaTeX로 봅니다 (\\theta, \\neq, \\to ...)
+    """
+    if esc in "bf":
+        return bool(word)
+    return in_math and esc + word in _LATEX_NRT
+
+
+class IncrementalJsonParser:
+    def __init__(self):
+        self.result = {}
+        self.done = False        # 최상위 객체가 닫혔는지
+        self.error = None        # 형식이 깨졌으면 메시지 (이후 입력은 무시)
+        self.current_key = None  # 값이 아직 도착 중인 필드
+        self._chunks = []        # 받은 조각 전체 (text)
+        self._buf = ""           # 아직 처리하지 않은 입력 (처리한 앞부분은 feed마다 잘라냄)
+        self._offset = 0         # _buf[0]의 전체 응답 기준 위치 (오류 메시지용)
+        self._pos = 0            # _buf 안의 위치
+        self._state = "start"
+        self._in_list = False
+        self._token = []         # 읽는 중인 문자열/값 조각
+        self._partial = ""       # 읽는 중인 문자열에서 이미 합쳐 둔 앞부분
+        self._depth = 0          # 중첩 객체/배열 깊이
+        self._raw_in_string = False
+        self._raw_escape = False
+        self._math = False       # 읽는 중인 문자열에서 $...$ 수식 안인지
+
+    @property
+    def text(self):
+        """지금까지 받은 응답 전체"""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def feed(self, chunk):
+        """chunk를 이어 붙이고 지금까지의 결과 dict를 반환합니다."""
+        self._chunks.append(chunk)
+        if not self.done and self.error is None:
+            self._offset += self._pos
+            self._buf = self._buf[self._pos:] + chunk
+            self._pos = 0
+            try:
+                self._advance()
+            except ValueError as e:
+                self.error = str(e)
+        return self.snapshot()
+
+    def snapshot(self):
+        """완성된 필드 + 도착 중인 문자열 필드"""
+        result = dict(self.result)
+        if self.current_key is not None and self._state == "string_value":
+            # _read_string이 도착한 조각을 _partial에 합쳐 두므로, _token에는 짝을 기다리는 상위 서로게이트만 남아 있습니다
+            result[self.current_key] = self._partial
+        return result
+
+    # ------------------------------------------
+    # 상태 기계
+    # ------------------------------------------
+    def _advance(self):
+        text = self._buf
+        while self._pos < len(text) and not self.done:
+            state = self._state
+            if state in ("string_key", "string_value"):
+                if not self._read_string():
+                    return
+                continue
+            if state == "raw_value":
+                if not self._read_raw():
+                    return
+                continue
+            if state == "scalar_value":
+                if not self._read_scalar():
+                    return
+                continue
+
+            ch = text[self._pos]
+            if ch in _WHITESPACE:
+                self._pos += 1
+            elif state == "start":
+                if not self._start(ch):
+                    return
+            elif state == "key_or_end":
+                if ch == "}":
+                    self._close()
+                elif ch == '"':
+                    self._pos += 1
+                    self._token = []
+                    self._partial = ""
+                    self._math = False
+                    self._state = "string_key"
+                else:
+                    raise ValueError(f"키가 필요한 위치입니다 ({self._where()}: {ch!r})")
+            elif state == "colon":
+                if ch != ":":
+                    raise ValueError(f"':'가 필요한 위치입니다 ({self._where()}: {ch!r})")
+                self._pos += 1
+                self._state = "value"
+            elif state == "value":
+                self._token = []
+                if ch == '"':
+                    self._pos += 1
+                    self._partial = ""
+                    self._math = False
+                    self._state = "string_value"
+                elif ch in "{[":
+                    self._depth = 0
+                    self._raw_in_string = self._raw_escape = False
+                    self._state = "raw_value"
+                else:
+                    self._state = "scalar_value"
+            elif state == "comma_or_end":
+                if ch == ",":
+                    self._pos += 1
+                    self._state = "key_or_end"
+                elif ch == "}":
+                    self._close()
+                else:
+                    raise ValueError(f"',' 또는 '}}'가 필요한 위치입니다 ({self._where()}: {ch!r})")
+
+    def _where(self):
+        return self._offset + self._pos
+
+    def _start(self, ch):
+        """여는 '{'까지 진행합니다. 울타리 줄이 아직 다 안 왔으면 False"""
+        if ch == "`":
+            # ```json 울타리는 줄 끝까지 건너뜁니다
+            end = self._buf.find("\n", self._pos)
+            if end == -1:
+                return False
+            self._pos = end + 1
+        elif ch == "[" and not self._in_list:
+            self._in_list = True
+            self._pos += 1
+        elif ch == "{":
+            self._pos += 1
+            self._state = "key_or_end"
+        else:
+            raise ValueError(f"JSON 객체가 아닙니다 ({self._where()}: {ch!r})")
+        return True
+
+    def _close(self):
+        self._pos += 1
+        self.done = True
+        self.current_key = None
+        self._state = "closed"
+
+    def _read_string(self):
+        """문자열을 끝까지 읽으면 True, 입력이 모자라면 (읽은 만큼 보관하고) False"""
+        text = self._buf
+        pos = self._pos
+        token = self._token
+        while pos < len(text):
+            plain = _PLAIN.match(text, pos)
+            if plain:
+                token.append(plain.group())
+                pos = plain.end()
+                continue
+            ch = text[pos]
+            if ch == '"':
+                self._pos = pos + 1
+                value = self._partial + _join(token)
+                if self._state == "string_key":
+                    self.current_key = value
+                    self._state = "colon"
+                else:
+                    self.result[self.current_key] = value
+                    self.current_key = None
+                    self._state = "comma_or_end"
+                return True
+            if ch == "\\":
+                if pos + 1 >= len(text):
+                    break
+                esc = text[pos + 1]
+                if esc == "u":
+                    if pos + 6 > len(text):
+                        break
+                    try:
+                        code = int(text[pos + 2:pos + 6], 16)
+                    except ValueError:
+                        token.append(text[pos:pos + 2])  # 잘못된 \u는 글자 그대로
+                        pos += 2
+                        continue
+                    token.append(chr(code))
+                    pos += 6
+                elif esc in "bfnrt":
+                    word = _LETTERS.match(text, pos + 2).group()
+                    if pos + 2 + len(word) >= len(text) and len(word) <= _LATEX_LONGEST:
+                        break  # 단어가 끝나야 LaTeX 명령인지 알 수 있습니다
+                    token.append("\\" + esc if _latex_command(esc, word, self._math) else _ESCAPES[esc])
+                    pos += 2
+                elif esc in _ESCAPES:
+                    token.append(_ESCAPES[esc])
+                    pos += 2
+                else:
+                    # LaTeX 명령(\alpha, \sqrt ...) 복구: 백슬래시를 그대로 남깁니다
+                    token.append("\\" + esc)
+                    pos += 2
+                continue
+            prev = token[-1][-1] if token else self._partial[-1:]
+            if ch == "$" and not (prev and prev in "$\\"):
+                self._math = not self._math  # $$는 한 번, \\$는 글자 그대로
+            token.append(ch)
+            pos += 1
+        self._pos = pos  # 도착한 부분은 snapshot()이 보여줍니다
+        # 도착한 조각은 합쳐 두어 snapshot()이 매번 처음부터 합치지 않게 합니다 (짝을 기다리는 상위 서로게이트만 남김)
+        keep = 1 if token and "\ud800" <= token[-1] <= "\udbff" else 0
+        if len(token) > keep:
+            self._partial += _join(token[:len(token) - keep])
+            del token[:len(token) - keep]
+        return False
+
+    def _read_raw(self):
+        """중첩 객체/배열은 닫힐 때까지 모았다가 한 번에 디코딩합니다."""
+        text = self._buf
+        pos = self._pos
+        start = pos
+        while pos < len(text):
+            ch = text[pos]
+            pos += 1
+            if self._raw_in_string:
+                if self._raw_escape:
+                    self._raw_escape = False
+                elif ch == "\\":
+                    self._raw_escape = True
+                elif ch == '"':
+                    self._raw_in_string = False
+            elif ch == '"':
+                self._raw_in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._token.append(text[start:pos])
+                    self.result[self.current_key] = loads_tolerant("".join(self._token))
+                    self.current_key = None
+                    self._pos = pos
+                    self._state = "comma_or_end"
+                    return True
+        self._token.append(text[start:pos])
+        self._pos = pos
+        return False
+
+    def _read_scalar(self):
+        text = self._buf
+        pos = self._pos
+        while pos < len(text) and text[pos] not in ",}]" + _WHITESPACE:
+            pos += 1
+        self._token.append(text[self._pos:pos])
+        self._pos = pos
+        if pos >= len(text):
+            return False
+        raw = "".join(self._token)
+        try:
+            self.result[self.current_key] = json.loads(raw)
+        except ValueError:
+            raise ValueError(f"알 수 없는 값: {raw!r}")
+        self.current_key = None
+        self._state = "comma_or_end"
+        return True
+
+
+# ------------------------------------------
+# 응답 전체 디코딩 (한 번에)
+# ------------------------------------------
+# 백슬래시마다: 올바른 JSON 이스케이프면 그대로, 아니면(LaTeX 명령) 백슬래시를 하나 더 붙여 글자 그대로 읽히게 합니다.
+# '\\' 쌍을 한 덩어리로 먹으므로 이미 제대로 이스케이프된 '\\frac'은 건드리지 않습니다.
+# 1번 그룹: \\n, \\r, \\t 뒤의 단어 (_LATEX_NRT에 있고 수식 안이면 LaTeX), 2번 그룹: 올바른 JSON 이스케이프
+_BACKSLASH = re.compile(r'\\(?:([nrt][A-Za-z]*)|(u[0-9a-fA-F]{4}|[bf](?![A-Za-z])|[\\"/]))?')
+# 수식 안인지 셀 때의 구분자: 1번 그룹은 문자열 경계 '"', 나머지는 $ (연속된 $는 한 번, 백슬래시 뒤의 $는 글자 그대로).
+# 이스케이프(\\" 등)는 두 글자씩 먹어 구분자로 세지 않습니다.
+_DELIM = re.compile(r'\\.|(")|(?<![\\$])\$+', re.S)
+# strict=False: 문자열 안의 이스케이프되지 않은 줄바꿈 등 제어 문자 허용
+_DECODER = json.JSONDecoder(strict=False)
+
+
+def _escape_latex(text):
+    """
+    LaTeX 백슬래시를 JSON에서 글자 그대로 읽히게 고칩니다 (IncrementalJsonParser와 같은 규칙).
+    수식 안인지는 \\n, \\r, \\t 명령을 만날 때만 지난 위치부터 이어서 세므로 전체가 응답 길이에 비례합니다.
+    """
+    pieces = []
+    last = cursor = 0
+    in_string = in_math = False
+    for match in _BACKSLASH.finditer(text):
+        if match.group(2):
+            continue
+        word = match.group(1)
+        if word is not None:
+            if word not in _LATEX_NRT:
+                continue
+            for delim in _DELIM.finditer(text, cursor, match.start()):
+                if delim.group(1):
+                    in_string, in_math = not in_string, False
+                elif delim.group(0)[0] == "$":
+                    in_math = in_string and not in_math
+            cursor = match.start()
+            if not in_math:
+                continue
+        pieces.append(text[last:match.start()])
+        pieces.append("\\")
+        last = match.start()
+    pieces.append(text[last:])
+    return "".join(pieces)
+
+
+def _value_start(text):
+    """울타리와 앞쪽 설명 문장을 건너뛴 첫 '{' 또는 '[' 위치"""
+    pos = len(text) - len(text.lstrip())
+    if text.startswith("```", pos):
+        newline = text.find("\n", pos)
+        pos = len(text) if newline == -1 else newline + 1
+    starts = [i for i in (text.find("{", pos), text.find("[", pos)) if i != -1]
+    if not starts:
+        raise json.JSONDecodeError("JSON 객체/배열이 없습니다", text, pos)
+    return min(starts)
+
+
+def loads_tolerant(text):
+    """
+    모델 응답 전체를 한 번에 디코딩합니다. 뒤에 붙은 닫는 울타리 등은 무시합니다.
+    이스케이프를 한 번 정리한 뒤 C 디코더로 한 번만 읽으므로, 실패 후 고쳐서 다시 파싱하지 않습니다.
+    실패하면 json.JSONDecodeError (ValueError)
+    """
+    start = _value_start(text)
+    value, _ = _DECODER.raw_decode(_escape_latex(text[start:]))
+    return value
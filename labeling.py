@@ -0,0 +1,104 @@
+"""
+라벨링 한 건의 처리 단계 (Streamlit 없음).
+
+app_deploy.py와 벤치마크(benchmarks/bench_e2e.py)가 같은 코드를 쓰도록 화면과 무관한 단계만 모았습니다.
+- fetch_image: 디스크 캐시 → 드라이브 다운로드 → 디코딩
+- fetch_page: 디스크 캐시 → 드라이브 다운로드 → 압축 바이트 + 화면용 축소본 (앱 세션 보관용)
+- build_save_job: 저장용 전처리 + math_dataset 문서 구성 (업로드/기록은 SaveQueue가 담당)
+- enqueue_jobs: 한 페이지 여러 문제를 대기열에 한 번에 기록
+"""
+import hashlib
+import io
+
+from PIL import Image
+
+import drive_io
+import preprocess
+from image_cache import file_version
+from metrics import maybe_span
+from page_image import PROXY_SIZE, PageImage
+from perceptual import dhash, to_signed64
+
+LABELER_VERSION = "v3.2-split-actions"
+STORAGE_PREFIX = "cropped_problems"
+
+
+def _fetch_bytes(drive_file, image_cache, service_factory, tags):
+    version = file_version(drive_file)
+    data = image_cache.get(drive_file['id'], version)
+    tags["cache"] = "hit" if data is not None else "miss"
+    if data is None:
+        data = drive_io.download_bytes(drive_io.thread_service(service_factory), drive_file['id'])
+        image_cache.put(drive_file['id'], data, version)
+    return data
+
+
+def fetch_image(drive_file, image_cache, service_factory, metrics=None):
+    """
+    다운로드 + 디코딩까지 끝낸 이미지를 반환합니다. (백그라운드 스레드에서 사용 가능)
+    디스크 캐시에 같은 버전이 있으면 드라이브를 거치지 않습니다.
+    service_factory: 스레드 전용 드라이브 서비스를 만드는 함수
+    """
+    with maybe_span(metrics, "drive_download") as tags:
+        data = _fetch_bytes(drive_file, image_cache, service_factory, tags)
+        img = Image.open(io.BytesIO(data))
+        img.load()  # 지연 디코딩을 여기서 끝내둡니다
+        return img
+
+
+def fetch_page(drive_file, image_cache, service_factory, metrics=None, proxy_size=PROXY_SIZE):
+    """fetch_image와 같지만 압축 바이트 + 화면용 축소본(PageImage)만 만듭니다. (세션 보관용)"""
+    with maybe_span(metrics, "drive_download") as tags:
+        return PageImage.from_bytes(_fetch_bytes(drive_file, image_cache, service_factory, tags), proxy_size)
+
+
+class SaveJob:
+    """SaveQueue.enqueue에 넘길 값 묶음"""
+
+    def __init__(self, doc, prepared, storage_path, phash):
+        self.doc = doc
+        self.prepared = prepared
+        self.storage_path = storage_path
+        self.phash = phash
+
+    def enqueue(self, save_queue):
+        """(job_id, doc_id)"""
+        return save_queue.enqueue(self.doc, self.prepared.data, self.storage_path, self.prepared.mime_type)
+
+    def as_item(self):
+        return (self.doc, self.prepared.data, self.storage_path, self.prepared.mime_type)
+
+
+def enqueue_jobs(save_queue, jobs):
+    """한 페이지의 여러 문제를 한 번에 기록합니다. [(job_id, doc_id)] (jobs 순서)"""
+    return save_queue.enqueue_many([job.as_item() for job in jobs])
+
+
+def content_path(data, ext):
+    """인코딩된 바이트의 SHA-256으로 정한 Storage 경로. 같은 이미지는 몇 번 저장해도 같은 객체를 가리킵니다"""
+    return f"{STORAGE_PREFIX}/{hashlib.sha256(data).hexdigest()}.{ext}"
+
+
+def build_save_job(drive_file, image, meta, content, profile=preprocess.STORAGE_PROFILE, region=None):
+    """
+    meta: subject / grade / source / unit / difficulty / question_type / concept
+    content: problem / diagram_desc / diagram_code
+    region: 한 페이지에서 여러 문제를 잘랐을 때 몇 번째 영역인지 (0부터)
+    image_url / created_at은 SaveQueue가 flush 시점에 채웁니다.
+    이미지 경로는 내용 해시라서, 이미 올라가 있는 이미지면 SaveQueue가 업로드를 건너뜁니다.
+    """
+    prepared = preprocess.prepare(image, profile)
+    storage_path = content_path(prepared.data, prepared.ext)
+    phash = dhash(image)
+    doc = {
+        "original_filename": drive_file['name'],
+        "drive_file_id": drive_file['id'],
+        "storage_path": storage_path,
+        "phash": to_signed64(phash),
+        "meta": dict(meta),
+        "content": dict(content),
+        "labeler_version": LABELER_VERSION,
+    }
+    if region is not None:
+        doc["region"] = region
+    return SaveJob(doc, prepared, storage_path, phash)
@@ -0,0 +1,202 @@
+"""
+여러 라벨러가 같은 작업 폴더를 나눠 쓰기 위한 파일 임대(lease).
+
+세션마다 서로 겹치지 않는 파일 묶음을 만료 시각이 있는 임대로 가져갑니다.
+- claim(owner, file_ids, count): 비어 있거나 만료된(또는 이미 내 것인) 파일을 목록 순서대로 count개까지 임대
+- renew(owner, file_ids): 작업 중인 파일의 만료 시각 연장. 아직 내 것인 ID만 반환 (만료되어 남이 가져간 파일은 빠짐)
+- held_by_others(owner, file_ids): 다른 세션이 지금 작업 중인(만료 전) 파일 ID
+- release(owner, file_ids, done): 'Move & Next' 시 반납. done=True면 완료로 남겨 오래된 목록을 가진 세션에도 다시 나눠주지 않음
+  (done=False로 다시 반납하면 완료 표시가 지워지므로, 이동이 실패한 파일은 release → claim으로 되찾습니다)
+세션이 닫혀 갱신이 멈추면 ttl 뒤에 다른 세션이 가져갈 수 있습니다.
+
+- MemoryLeaseStore: 프로세스 내 (가짜 백엔드, 벤치마크)
+- FirestoreLeaseStore: labeling_leases 컬렉션 (문서 ID = 드라이브 파일 ID), 트랜잭션으로 임대
+만료 비교는 각 클라이언트 시계 기준이므로 ttl은 시계 오차보다 충분히 길게 잡습니다.
+"""
+import threading
+import time
+
+LEASE_COLLECTION = "labeling_leases"
+DEFAULT_TTL = 600.0  # 10분
+
+
+def available(lease, owner, now):
+    """lease: 저장된 임대 dict 또는 None"""
+    if lease is None:
+        return True
+    if lease.get("done"):
+        return False  # 완료된 파일은 이동 전의 오래된 목록에 남아 있어도 다시 나눠주지 않습니다
+    return lease.get("owner") == owner or lease.get("expires", 0) <= now
+
+
+def held_by_other(lease, owner, now):
+    return bool(lease) and not lease.get("done") and lease.get("owner") != owner and lease.get("expires", 0) > now
+
+
+def make_lease(owner, now, ttl, done=False):
+    return {"owner": owner, "expires": now + ttl, "done": done, "updated": now}
+
+
+class MemoryLeaseStore:
+    """
+    스레드 안전한 프로세스 내 임대 저장소.
+    latency: 호출마다 대기할 시간(초). Firestore 트랜잭션 왕복을 흉내 냅니다 (잠금 밖에서 대기)
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, latency=0.0, clock=time.time):
+        self.ttl = ttl
+        self.latency = latency
+        self.clock = clock
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def claim(self, owner, file_ids, count):
+        self._wait()
+        claimed = []
+        with self._lock:
+            now = self.clock()
+            for file_id in file_ids:
+                if len(claimed) >= count:
+                    break
+                if available(self._leases.get(file_id), owner, now):
+                    self._leases[file_id] = make_lease(owner, now, self.ttl)
+                    claimed.append(file_id)
+        return claimed
+
+    def renew(self, owner, file_ids):
+        self._wait()
+        held = []
+        with self._lock:
+            now = self.clock()
+            for file_id in file_ids:
+                lease = self._leases.get(file_id)
+                if lease and lease["owner"] == owner and not lease["done"]:
+                    lease["expires"] = now + self.ttl
+                    lease["updated"] = now
+                    held.append(file_id)
+        return held
+
+    def held_by_others(self, owner, file_ids):
+        self._wait()
+        with self._lock:
+            now = self.clock()
+            return {file_id for file_id in file_ids if held_by_other(self._leases.get(file_id), owner, now)}
+
+    def release(self, owner, file_ids, done=False):
+        self._wait()
+        with self._lock:
+            now = self.clock()
+            for file_id in file_ids:
+                lease = self._leases.get(file_id)
+                if not lease or lease["owner"] != owner:
+                    continue
+                if done:
+                    self._leases[file_id] = make_lease(owner, now, 0, done=True)
+                else:
+                    del self._leases[file_id]
+
+    def stats(self):
+        with self._lock:
+            now = self.clock()
+            leases = list(self._leases.values())
+        return {
+            "active": sum(1 for lease in leases if not lease["done"] and lease["expires"] > now),
+            "done": sum(1 for lease in leases if lease["done"]),
+        }
+
+
+class FirestoreLeaseStore:
+    """
+    db: firestore.Client. 임대 하나 = 문서 하나 {owner, expires, done, updated}
+    claim은 window개씩 읽고 쓰는 트랜잭션으로 처리하므로, 두 세션이 같은 파일을 동시에 잡으면 한쪽 트랜잭션이 재시도됩니다.
+    """
+
+    def __init__(self, db, collection=LEASE_COLLECTION, ttl=DEFAULT_TTL, window=20, clock=time.time):
+        self.db = db
+        self.collection = db.collection(collection)
+        self.ttl = ttl
+        self.window = window
+        self.clock = clock
+
+    def _read(self, transaction, file_ids):
+        refs = [self.collection.document(file_id) for file_id in file_ids]
+        snaps = {snap.id: snap for snap in self.db.get_all(refs, transaction=transaction)}
+        # get_all은 순서를 보장하지 않으므로 요청 순서로 되돌립니다
+        return [
+            (ref, snaps[ref.id].to_dict() if ref.id in snaps and snaps[ref.id].exists else None)
+            for ref in refs
+        ]
+
+    def claim(self, owner, file_ids, count):
+        from firebase_admin import firestore
+
+        @firestore.transactional
+        def take(transaction, window, need):
+            now = self.clock()
+            taken = []
+            for ref, lease in self._read(transaction, window):
+                if len(taken) >= need:
+                    break
+                if available(lease, owner, now):
+                    transaction.set(ref, make_lease(owner, now, self.ttl))
+                    taken.append(ref.id)
+            return taken
+
+        claimed = []
+        file_ids = list(file_ids)
+        for start in range(0, len(file_ids), self.window):
+            if len(claimed) >= count:
+                break
+            claimed += take(self.db.transaction(), file_ids[start:start + self.window], count - len(claimed))
+        return claimed
+
+    def renew(self, owner, file_ids):
+        from firebase_admin import firestore
+
+        @firestore.transactional
+        def extend(transaction, window):
+            now = self.clock()
+            held = []
+            for ref, lease in self._read(transaction, window):
+                if lease and lease.get("owner") == owner and not lease.get("done"):
+                    transaction.set(ref, make_lease(owner, now, self.ttl))
+                    held.append(ref.id)
+            return held
+
+        file_ids = list(file_ids)
+        held = []
+        for start in range(0, len(file_ids), self.window):
+            held += extend(self.db.transaction(), file_ids[start:start + self.window])
+        return held
+
+    def held_by_others(self, owner, file_ids):
+        file_ids = list(file_ids)
+        now = self.clock()
+        held = set()
+        for start in range(0, len(file_ids), self.window):
+            for ref, lease in self._read(None, file_ids[start:start + self.window]):
+                if held_by_other(lease, owner, now):
+                    held.add(ref.id)
+        return held
+
+    def release(self, owner, file_ids, done=False):
+        from firebase_admin import firestore
+
+        @firestore.transactional
+        def give_back(transaction, window):
+            now = self.clock()
+            for ref, lease in self._read(transaction, window):
+                if not lease or lease.get("owner") != owner:
+                    continue
+                if done:
+                    transaction.set(ref, make_lease(owner, now, 0, done=True))
+                else:
+                    transaction.delete(ref)
+
+        file_ids = list(file_ids)
+        for start in range(0, len(file_ids), self.window):
+            give_back(self.db.transaction(), file_ids[start:start + self.window])
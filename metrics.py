@@ -0,0 +1,151 @@
+"""
+단계별 지연 시간 측정 (span).
+
+    with recorder.span("extract"):
+        ...
+
+단계마다 최근 max_samples개의 소요 시간을 보관해 p50/p95를 계산하고, export_json/export_csv로 내보냅니다.
+sink를 주면 span이 끝날 때마다 sink(stage, seconds, tags)를 호출합니다 (외부 지표 수집기 연동용).
+sink 예외는 무시하므로 수집기가 죽어도 앱 동작에는 영향이 없습니다.
+"""
+import csv
+import importlib
+import io
+import json
+import math
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+
+def percentile(sorted_values, q):
+    """nearest-rank 백분위수 (sorted_values는 오름차순)"""
+    if not sorted_values:
+        return None
+    rank = min(len(sorted_values), max(1, math.ceil(q / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+class SpanRecorder:
+    def __init__(self, max_samples=1000, sink=None):
+        self.max_samples = max_samples
+        self.sink = sink
+        self.started = time.time()
+        self._samples = {}  # stage -> deque[(시작 시각, 소요 초, tags)]
+        self._counts = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage, **tags):
+        started = time.perf_counter()
+        try:
+            yield tags  # 블록 안에서 tags["cache"] = "hit" 처럼 결과를 덧붙일 수 있습니다
+        except BaseException:
+            tags["error"] = True
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - started, **tags)
+
+    def record(self, stage, seconds, **tags):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.max_samples)
+            samples.append((time.time(), seconds, tags))
+            self._counts[stage] = self._counts.get(stage, 0) + 1
+            self._totals[stage] = self._totals.get(stage, 0.0) + seconds
+        if self.sink is not None:
+            try:
+                self.sink(stage, seconds, tags)
+            except Exception:
+                pass
+
+    def summary(self):
+        """{stage: {count, p50_ms, p95_ms, max_ms, total_s, per_hour}} (백분위수는 최근 max_samples개 기준)"""
+        with self._lock:
+            snapshot = {stage: sorted(s[1] for s in samples) for stage, samples in self._samples.items()}
+            counts = dict(self._counts)
+            totals = dict(self._totals)
+        hours = max(time.time() - self.started, 1e-9) / 3600
+        return {
+            stage: {
+                "count": counts[stage],
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "max_ms": values[-1] * 1000,
+                "total_s": totals[stage],
+                "per_hour": counts[stage] / hours,
+            }
+            for stage, values in snapshot.items()
+        }
+
+    def spans(self):
+        """보관 중인 span 전체 [(stage, 시작 시각, 소요 초, tags)] (시간순)"""
+        with self._lock:
+            rows = [(stage, *sample) for stage, samples in self._samples.items() for sample in samples]
+        rows.sort(key=lambda row: row[1])
+        return rows
+
+
+def export_json(recorders):
+    """recorders: {출처 이름: SpanRecorder} → 요약 + span 목록 JSON 문자열"""
+    return json.dumps({
+        source: {
+            "started": recorder.started,
+            "summary": recorder.summary(),
+            "spans": [
+                {"stage": stage, "at": at, "ms": seconds * 1000, "tags": tags}
+                for stage, at, seconds, tags in recorder.spans()
+            ],
+        }
+        for source, recorder in recorders.items()
+    }, ensure_ascii=False, indent=2, default=str)
+
+
+def export_csv(recorders):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["source", "stage", "at", "ms", "tags"])
+    rows = [(source, *span) for source, recorder in recorders.items() for span in recorder.spans()]
+    rows.sort(key=lambda row: row[2])
+    for source, stage, at, seconds, tags in rows:
+        writer.writerow([source, stage, f"{at:.3f}", f"{seconds * 1000:.2f}",
+                         json.dumps(tags, ensure_ascii=False, default=str)])
+    return buf.getvalue()
+
+
+def maybe_span(recorder, stage, **tags):
+    """recorder가 None이면 아무것도 하지 않는 span (측정이 선택 사항인 모듈용)"""
+    return recorder.span(stage, **tags) if recorder is not None else nullcontext(tags)
+
+
+def statsd_sink(address, prefix="math_labeler"):
+    """
+    StatsD(UDP) 타이머로 보내는 sink. address: "host:port"
+    UDP라 전송 실패가 앱을 막지 않습니다.
+    """
+    host, _, port = address.rpartition(":")
+    target = (host or "127.0.0.1", int(port or 8125))
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def sink(stage, seconds, tags):
+        sock.sendto(f"{prefix}.{stage}:{seconds * 1000:.3f}|ms".encode(), target)
+
+    return sink
+
+
+def load_sink(spec):
+    """
+    설정 문자열로 sink를 만듭니다.
+    - "statsd://host:port" → StatsD UDP 타이머
+    - "패키지.모듈:함수" → 그 함수 (sink(stage, seconds, tags) 형태)
+    """
+    if not spec:
+        return None
+    if spec.startswith("statsd://"):
+        return statsd_sink(spec[len("statsd://"):])
+    module, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module), attr)
@@ -0,0 +1,195 @@
+"""
+'완료 폴더로 이동' 배치 처리기.
+
+'Move & Next'는 이동 요청을 큐에 넣고 곧바로 다음 문제로 넘어갑니다.
+백그라운드 스레드가 batch_size개가 모이거나 flush_interval초가 지나면
+Drive 배치 HTTP 요청 하나로 묶어 보냅니다.
+실패한 이동은 지수 백오프(extraction.backoff_delay)로 시각을 미뤄 max_attempts까지 재시도하고,
+그래도 실패하면 요청한 세션(owner)이 take_failed()로 받아 로컬 목록에 되돌려 놓습니다.
+on_settled(owner, file_ids, moved)를 주면 이동이 확정(성공 또는 최종 실패)될 때마다 불립니다 (앱은 임대를 여기서 반납).
+대기열은 메모리에만 있으므로 프로세스가 끝나면 예약한 이동은 사라집니다. 그 파일은 작업 폴더에 그대로 남고,
+임대도 완료로 표시되지 않았으므로 ttl 뒤에 다시 나눠집니다.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import drive_io
+from extraction import backoff_delay
+from metrics import maybe_span
+
+OUTCOME_LIMIT = 10000  # wait_settled()용으로 기억하는 최근 확정 결과 수
+
+
+class MoveBatcher:
+    def __init__(self, service_factory, batch_size=20, flush_interval=2.0, max_attempts=3, base_delay=1.0,
+                 metrics=None, on_settled=None):
+        """
+        service_factory: 스레드 전용 드라이브 서비스를 만드는 함수 (drive_io.thread_service 참고)
+        base_delay: 첫 재시도까지의 대기(초). 429 userRateLimitExceeded나 잠깐의 네트워크 오류가 곧바로 재시도를 다 쓰지 않도록
+        metrics: metrics.SpanRecorder (선택). drive_move_batch 단계를 기록합니다
+        on_settled: on_settled(owner, file_ids, moved) 콜백 (선택, 백그라운드 스레드에서 호출)
+        """
+        self.service_factory = service_factory
+        self.batch_size = min(batch_size, drive_io.BATCH_LIMIT)
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.metrics = metrics
+        self.on_settled = on_settled
+        self.moved = 0
+        self.batches = 0
+        self._pending = []  # dict(file, src, dst, owner, attempts, error, next_attempt)
+        self._failed = []
+        self._outcomes = OrderedDict()  # 최근 확정된 이동: 파일 ID → 이동 성공 여부
+        self._lock = threading.Lock()
+        self._settled = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def enqueue(self, drive_file, current_folder_id, done_folder_id, owner=None):
+        with self._lock:
+            self._outcomes.pop(drive_file["id"], None)  # 다시 예약하면 이전 결과는 잊습니다
+            self._pending.append({
+                "file": drive_file, "src": current_folder_id, "dst": done_folder_id,
+                "owner": owner, "attempts": 0, "error": None, "next_attempt": 0.0,
+            })
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="drive-move", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(5)
+        self.flush_all()
+
+    def _run(self):
+        while not self._stop.is_set():
+            # 배치가 가득 차면 바로, 아니면 flush_interval마다 비웁니다
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush_all(wait=False)
+            except Exception:
+                pass
+
+    def flush(self):
+        """재시도 시각이 된 이동 한 묶음을 배치 요청으로 보내고 성공 건수를 반환합니다."""
+        with self._flush_lock:
+            with self._lock:
+                now = time.time()
+                items = [item for item in self._pending if item["next_attempt"] <= now][:self.batch_size]
+                taken = {id(item) for item in items}
+                self._pending = [item for item in self._pending if id(item) not in taken]
+            if not items:
+                return 0
+            try:
+                with maybe_span(self.metrics, "drive_move_batch", files=len(items)):
+                    results = drive_io.batch_move(
+                        drive_io.thread_service(self.service_factory),
+                        [(item["file"]["id"], item["src"], item["dst"]) for item in items],
+                    )
+            except Exception as e:
+                # 배치 요청 자체가 실패하면 전체를 재시도 대상으로 돌립니다
+                results = {item["file"]["id"]: e for item in items}
+            self.batches += 1
+
+            moved = 0
+            retry = []
+            settled = defaultdict(lambda: ([], []))  # owner → (이동한 ID, 최종 실패한 ID)
+            with self._lock:
+                for item in items:
+                    error = results.get(item["file"]["id"])
+                    if error is None:
+                        moved += 1
+                        settled[item["owner"]][0].append(item["file"]["id"])
+                        continue
+                    item["attempts"] += 1
+                    item["error"] = str(error)
+                    if item["attempts"] >= self.max_attempts:
+                        self._failed.append(item)
+                        settled[item["owner"]][1].append(item["file"]["id"])
+                    else:
+                        item["next_attempt"] = time.time() + backoff_delay(item["attempts"] - 1, self.base_delay)
+                        retry.append(item)
+                self._pending[:0] = retry
+                self.moved += moved
+                for owner_ids in settled.values():
+                    self._outcomes.update((file_id, True) for file_id in owner_ids[0])
+                    self._outcomes.update((file_id, False) for file_id in owner_ids[1])
+                while len(self._outcomes) > OUTCOME_LIMIT:
+                    self._outcomes.popitem(last=False)
+                self._settled.notify_all()
+            if self.on_settled:
+                for owner, (done, failed) in settled.items():
+                    if done:
+                        self.on_settled(owner, done, True)
+                    if failed:
+                        self.on_settled(owner, failed, False)
+            return moved
+
+    def flush_all(self, on_progress=None, wait=True):
+        """
+        대기열이 빌 때까지 (재시도 포함) 비웁니다.
+        재시도 시각이 아직 안 된 이동은 wait=True면 그 시각까지 기다리고, wait=False면 남겨 둔 채 반환합니다.
+        """
+        total = 0
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return total
+                delay = min(item["next_attempt"] for item in self._pending) - time.time()
+            if delay > 0:
+                if not wait:
+                    return total
+                time.sleep(delay)
+                continue
+            total += self.flush()
+            if on_progress:
+                on_progress(total)
+
+    def take_failed(self, owner=None):
+        """owner가 요청했다가 최종 실패한 이동을 꺼냅니다 (로컬 목록 복구용)."""
+        with self._lock:
+            mine = [item for item in self._failed if item["owner"] == owner]
+            self._failed = [item for item in self._failed if item["owner"] != owner]
+        return mine
+
+    def pending_ids(self):
+        with self._lock:
+            return {item["file"]["id"] for item in self._pending}
+
+    def wait_settled(self, file_ids, timeout=None):
+        """
+        file_ids의 이동이 확정(성공 또는 최종 실패)될 때까지 기다려, 실제로 이동한 ID 집합을 반환합니다.
+        백오프 중이거나 다른 스레드가 보내는 중인 이동도 기다리며, timeout이 지나면 그때까지 이동한 것만 돌려줍니다.
+        """
+        file_ids = set(file_ids)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._settled:
+            while not file_ids <= self._outcomes.keys():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._settled.wait(remaining)
+            return {file_id for file_id in file_ids if self._outcomes.get(file_id)}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "failed": len(self._failed),
+                "moved": self.moved,
+                "batches": self.batches,
+            }
+
@@ -0,0 +1,77 @@
+"""
+세션에 보관하는 페이지 이미지 (압축 바이트 + 화면용 축소본).
+
+전체 해상도로 디코딩한 PIL 이미지(A4 200dpi ≈ 15MB)를 세션마다 들고 있지 않고,
+드라이브에서 받은 JPEG/PNG 바이트와 cropper 캔버스 크기의 축소본(proxy)만 둡니다.
+cropper는 축소본 좌표로 영역을 돌려주고, 전체 해상도 crop은 분석/저장할 때만 바이트를 다시 디코딩해 만듭니다.
+"""
+import io
+
+from PIL import Image
+
+# streamlit_cropper 캔버스 최대 크기. 이보다 크면 cropper가 rerun마다 원본을 복사하고 다시 축소합니다
+PROXY_SIZE = (700, 700)
+
+
+def _open(data):
+    return Image.open(io.BytesIO(data))
+
+
+class PageImage:
+    def __init__(self, data, size, proxy):
+        self.data = data
+        self.size = size      # 전체 해상도 (width, height)
+        self.proxy = proxy    # 화면/cropper용 축소본
+
+    @classmethod
+    def from_bytes(cls, data, proxy_size=PROXY_SIZE):
+        img = _open(data)
+        size = img.size
+        # JPEG은 디코딩 단계에서 1/2, 1/4, 1/8로 줄여 읽습니다 (전체 해상도 디코딩 생략)
+        img.draft(None, proxy_size)
+        img.thumbnail(proxy_size)
+        img.load()
+        return cls(data, size, img)
+
+    @property
+    def scale(self):
+        """전체 해상도 / 축소본 배율 (x, y)"""
+        return self.size[0] / self.proxy.width, self.size[1] / self.proxy.height
+
+    def full_box(self, box):
+        """
+        cropper가 돌려준 축소본 좌표 {left, top, width, height} → 전체 해상도 (left, upper, right, lower)
+        """
+        sx, sy = self.scale
+        left = max(0, round(box['left'] * sx))
+        top = max(0, round(box['top'] * sy))
+        right = min(self.size[0], round((box['left'] + box['width']) * sx))
+        bottom = min(self.size[1], round((box['top'] + box['height']) * sy))
+        return left, top, max(right, left + 1), max(bottom, top + 1)
+
+    def proxy_crop(self, box):
+        """미리보기용 축소본 crop (축소본 좌표)"""
+        return self.proxy.crop((box['left'], box['top'], box['left'] + box['width'], box['top'] + box['height']))
+
+    def crop(self, full_box):
+        """전체 해상도 crop. 바이트를 다시 디코딩하므로 분석/저장 시점에만 부릅니다."""
+        return self.crop_many([full_box])[0]
+
+    def crop_many(self, full_boxes):
+        """여러 영역을 한 번의 디코딩으로 잘라냅니다."""
+        img = _open(self.data)
+        return [img.crop(box) for box in full_boxes]
+
+    def nbytes(self):
+        """세션에 남는 대략의 메모리 (압축 바이트 + 축소본 픽셀)"""
+        return len(self.data) + _pixel_bytes(self.proxy)
+
+
+def _pixel_bytes(img):
+    # PIL은 RGB도 픽셀당 4바이트로 보관합니다
+    return img.width * img.height * (1 if img.mode in ("1", "L", "P") else 4)
+
+
+def decoded_bytes(img):
+    """디코딩된 전체 이미지의 픽셀 메모리 (비교용)"""
+    return _pixel_bytes(img)
@@ -0,0 +1,49 @@
+"""
+지각 해시(perceptual hash) 유틸리티.
+
+살짝 다르게 자른 crop, 재스캔 등 "거의 같은" 이미지를 찾기 위해
+64비트 dHash를 계산하고 해밍 거리로 비교합니다.
+"""
+import hashlib
+
+HASH_BITS = 64
+
+
+def dhash(image, size=8):
+    """
+    difference hash: 흑백 (size+1) x size 로 축소한 뒤 가로로 이웃한 픽셀의 밝기 비교 결과를 비트로 씁니다.
+    크기/압축률/미세한 밝기 차이에 강하고 계산이 매우 가볍습니다.
+    """
+    from PIL import Image
+
+    small = image.convert("L").resize((size + 1, size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def pixel_digest(image):
+    """
+    디코딩된 픽셀 기준의 정확한 해시. JPEG 인코더 차이와 무관하게 같은 crop이면 같은 값입니다.
+    """
+    h = hashlib.sha256()
+    h.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode())
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def to_signed64(value):
+    """SQLite INTEGER(부호 있는 64비트)에 넣기 위한 변환"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def from_signed64(value):
+    return value + (1 << 64) if value < 0 else value
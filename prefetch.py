@@ -0,0 +1,80 @@
+"""
+다음 N개의 드라이브 이미지를 백그라운드에서 미리 받아두는 프리페처.
+
+라벨러가 현재 이미지를 자르는 동안 스레드 풀이 다음 파일들을 다운로드 + 디코딩해 두어,
+'다음 ▶' / 'Move & Next' 클릭 시 대기 시간이 거의 없도록 합니다.
+작업 스레드에서는 Streamlit API를 호출하지 않습니다 (fetch_fn은 순수 함수여야 함).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ImagePrefetcher:
+    """
+    fetch_fn(item) -> 결과(디코딩된 이미지 등)를 스레드 풀에서 실행합니다.
+    item은 파일 ID 문자열이나 드라이브 파일 dict 등 무엇이든 되며, key(item)으로 식별합니다.
+    schedule()이 호출될 때마다 현재 위치 기준 [idx, idx + depth] 창 밖의 작업은 취소/폐기합니다.
+    """
+
+    def __init__(self, fetch_fn, depth=3, executor=None, max_workers=3, key=None):
+        self.fetch_fn = fetch_fn
+        self.key = key or (lambda item: item)
+        self.depth = depth
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, items, idx, include_current=True):
+        """
+        현재 인덱스부터 depth개 앞까지 순서대로 예약합니다. 현재 파일이 가장 먼저 실행됩니다.
+        현재 파일이 이미 화면에 로드되어 있다면 include_current=False로 중복 다운로드를 막습니다.
+        """
+        start = idx if include_current else idx + 1
+        window = {self.key(item): item for item in items[start: idx + self.depth + 1]}
+        with self._lock:
+            # '◀ 이전' 등으로 위치가 바뀌면 창 밖의 작업은 취소 (이미 실행 중이면 결과만 버림)
+            for file_id in list(self._futures):
+                if file_id not in window:
+                    self._futures.pop(file_id).cancel()
+            for file_id, item in window.items():
+                if file_id not in self._futures:
+                    self._futures[file_id] = self._executor.submit(self.fetch_fn, item)
+
+    def take(self, file_id, timeout=None):
+        """
+        미리 받아둔 결과를 꺼냅니다. 아직 다운로드 중이면 완료될 때까지 기다립니다.
+        예약되지 않았거나 실패/취소된 경우 None을 반환하므로 호출 측에서 직접 받으면 됩니다.
+        """
+        with self._lock:
+            future = self._futures.pop(file_id, None)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return None
+
+    def is_ready(self, file_id):
+        with self._lock:
+            future = self._futures.get(file_id)
+        return bool(future and future.done() and not future.cancelled())
+
+    def stats(self):
+        with self._lock:
+            futures = list(self._futures.values())
+        return {
+            "pending": sum(not f.done() for f in futures),
+            "ready": sum(f.done() and not f.cancelled() for f in futures),
+        }
+
+    def clear(self):
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+
+    def shutdown(self):
+        self.clear()
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
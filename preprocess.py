@@ -0,0 +1,174 @@
+"""
+모델 호출 / Storage 업로드 전 이미지 전처리.
+
+st_cropper 결과를 그대로 보내면 스캔 원본 해상도 그대로라 업로드 바이트, 모델 지연, Storage 비용이 큽니다.
+1. 긴 변 기준 축소 (max_side)
+2. 채색이 없으면 흑백(L), 글자만 있는 페이지(흑/백 이봉 분포)면 이진화
+3. 내용에 맞는 포맷 선택: 이진/저색상 → PNG, 사진/그라데이션 → JPEG·WebP 중 작은 쪽
+"""
+import io
+
+from PIL import Image
+
+# 모델 입력용: Gemini는 큰 이미지를 어차피 타일로 나눠 처리하므로 긴 변 1600px면 충분합니다
+MODEL_PROFILE = {
+    "max_side": 1600,
+    "grayscale": "auto",   # "auto" | True | False
+    "binarize": "auto",    # "auto" | True | False
+    "format": "auto",      # "auto" | "PNG" | "JPEG" | "WEBP"
+    "jpeg_quality": 85,
+    "webp_quality": 80,
+    "webp_method": 2,      # 0(빠름)~6(작음). 4 이상은 크기 이득에 비해 인코딩이 2배 이상 느립니다
+}
+# 저장용: 학습 데이터로 쓰므로 해상도를 조금 더 남깁니다
+STORAGE_PROFILE = dict(MODEL_PROFILE, max_side=2000)
+
+MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+
+# 내용 판별 임계값
+SATURATION_LEVEL = 60      # 채도(0~255)가 이 이상인 픽셀을 '채색' 픽셀로 봅니다
+COLOR_RATIO = 0.005        # 채색 픽셀 비율이 이 이상이면 컬러 이미지
+MIDTONE_RATIO = 0.06       # 중간 밝기(64~191) 픽셀 비율이 이보다 낮으면 글자 전용(이진)으로 봅니다
+BINARIZE_LEVEL = 160
+
+
+class Prepared:
+    """전처리 + 인코딩 결과"""
+
+    def __init__(self, image, data, fmt, original_size, baseline_bytes, content):
+        self.image = image
+        self.data = data
+        self.format = fmt
+        self.original_size = original_size
+        self.baseline_bytes = baseline_bytes
+        self.content = content
+
+    @property
+    def mime_type(self):
+        return MIME_TYPES[self.format]
+
+    @property
+    def ext(self):
+        return EXTENSIONS[self.format]
+
+    def as_part(self):
+        """generate_content()에 그대로 넣을 수 있는 inline blob"""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+    def stats(self):
+        return {
+            "content": self.content,
+            "format": self.format,
+            "size": f"{self.original_size[0]}x{self.original_size[1]} → {self.image.size[0]}x{self.image.size[1]}",
+            "bytes_before": self.baseline_bytes,
+            "bytes_after": len(self.data),
+        }
+
+
+def classify(image):
+    """
+    'text' (글자 위주 흑백), 'gray' (흑백 사진/그라데이션), 'color' 중 하나를 반환합니다.
+    작은 샘플로 판별하므로 큰 스캔에서도 수 ms 이내입니다.
+    보간 축소를 하면 글자 획이 회색으로 번져 판별이 틀어지므로 NEAREST로 픽셀을 샘플링합니다.
+    """
+    scale = max(1, max(image.size) // 512)
+    sample = image.convert("RGB").resize(
+        (max(1, image.size[0] // scale), max(1, image.size[1] // scale)), Image.NEAREST
+    )
+    total = sample.size[0] * sample.size[1]
+    saturation = sample.convert("HSV").getchannel("S").histogram()
+    if sum(saturation[SATURATION_LEVEL:]) / total >= COLOR_RATIO:
+        return "color"
+    histogram = sample.convert("L").histogram()
+    if sum(histogram[64:192]) / total < MIDTONE_RATIO:
+        return "text"
+    return "gray"
+
+
+def transform(image, profile, content=None):
+    """축소 + 흑백/이진화. 원본 이미지는 수정하지 않습니다."""
+    content = content or classify(image)
+    img = image.convert("RGBA") if image.mode in ("P", "LA") else image
+    if img.mode == "RGBA":
+        # 투명 배경은 흰색으로 채웁니다 (JPEG 저장 불가 + 모델 입력 일관성)
+        background = Image.new("RGB", img.size, "white")
+        background.paste(img, mask=img.split()[3])
+        img = background
+    elif img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    grayscale = profile.get("grayscale", "auto")
+    binarize = profile.get("binarize", "auto")
+    binarize = binarize is True or (binarize == "auto" and content == "text")
+    if binarize or grayscale is True or (grayscale == "auto" and content != "color"):
+        # 축소 전에 흑백으로 바꾸면 리샘플링할 채널이 1/3로 줄어듭니다
+        img = img.convert("L")
+
+    max_side = profile.get("max_side")
+    if max_side and max(img.size) > max_side:
+        img = img.copy()
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    if binarize:
+        img = img.point(lambda v: 255 if v >= BINARIZE_LEVEL else 0, mode="1")
+    return img, content
+
+
+def encode(image, fmt, profile):
+    buf = io.BytesIO()
+    if fmt != "PNG" and image.mode == "1":
+        image = image.convert("L")
+    if fmt == "PNG":
+        image.save(buf, format="PNG", optimize=True)
+    elif fmt == "JPEG":
+        image.save(buf, format="JPEG", quality=profile.get("jpeg_quality", 85), optimize=True)
+    elif fmt == "WEBP":
+        image.save(buf, format="WEBP", quality=profile.get("webp_quality", 80),
+                   method=profile.get("webp_method", 2))
+    else:
+        raise ValueError(f"지원하지 않는 포맷: {fmt}")
+    return buf.getvalue()
+
+
+def candidate_formats(content):
+    if content == "text":
+        return ["PNG"]
+    formats = ["JPEG"]
+    if webp_supported():
+        formats.append("WEBP")
+    return formats
+
+
+_webp = None
+
+
+def webp_supported():
+    global _webp
+    if _webp is None:
+        from PIL import features
+        _webp = bool(features.check("webp"))
+    return _webp
+
+
+def baseline_size(image):
+    """기존 업로드 방식(기본 품질 JPEG, 원본 해상도)의 바이트 수"""
+    buf = io.BytesIO()
+    image.convert("RGB").save(buf, format="JPEG")
+    return buf.tell()
+
+
+def prepare(image, profile=MODEL_PROFILE, measure=False):
+    """
+    전처리 후 가장 작은 후보 포맷으로 인코딩합니다.
+    measure=True면 기존 방식 대비 바이트 비교를 위해 baseline도 계산합니다.
+    (원본 해상도 JPEG 인코딩을 한 번 더 하므로 벤치마크에서만 켭니다)
+    """
+    processed, content = transform(image, profile)
+    fmt = profile.get("format", "auto")
+    formats = candidate_formats(content) if fmt == "auto" else [fmt]
+    encoded = min(((encode(processed, f, profile), f) for f in formats), key=lambda x: len(x[0]))
+    return Prepared(
+        processed, encoded[0], encoded[1], image.size,
+        baseline_size(image) if measure else None, content,
+    )
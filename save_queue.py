@@ -0,0 +1,349 @@
+"""
+Write-behind 저장 대기열 (SQLite 영구 큐).
+
+'💾 데이터 저장'은 문서 + 이미지 바이트를 로컬 큐에 기록(commit)하는 즉시 반환하고,
+백그라운드 스레드가 다음 순서로 비웁니다.
+1. 이미지 업로드 (스레드 풀 병렬, make_public 포함)
+   경로가 내용 해시(labeling.content_path)라서, 이미 있는 객체면 업로드를 건너뜁니다.
+   확인한 경로는 known_blobs 테이블에 blob_cache_ttl 동안 기억해 같은 이미지를 다시 확인하지 않습니다.
+2. Firestore WriteBatch 한 번에 여러 문서 기록
+실패한 작업은 지수 백오프로 재시도하며, max_attempts를 넘으면 'failed'로 남겨 사이드바에서 재시도할 수 있습니다.
+문서 ID는 큐에 넣을 때 미리 정하므로 배치가 재시도되어도 문서가 중복되지 않습니다.
+앱이 중간에 죽어도 큐 파일에 남은 작업은 다음 실행 때 이어서 처리됩니다.
+완료된 작업 행은 done_retention(기본 7일)이 지나면 지웁니다 (그 뒤로는 Firestore 문서만 남음).
+"""
+import json
+import random
+import sqlite3
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from extraction import backoff_delay
+from metrics import maybe_span
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS save_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    doc_id TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    image BLOB,
+    storage_path TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    image_url TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_save_jobs_state ON save_jobs (state, next_attempt);
+CREATE TABLE IF NOT EXISTS known_blobs (
+    storage_path TEXT PRIMARY KEY,
+    image_url TEXT NOT NULL,
+    checked REAL NOT NULL
+);
+"""
+
+_ID_CHARS = string.ascii_letters + string.digits
+DONE_RETENTION = 7 * 24 * 3600.0
+PURGE_INTERVAL = 3600.0
+
+
+def new_doc_id():
+    """Firestore 자동 ID와 같은 형식(영숫자 20자)"""
+    return "".join(random.SystemRandom().choice(_ID_CHARS) for _ in range(20))
+
+
+class SaveQueue:
+    """
+    db: firestore.Client 호환 객체 (collection/document/batch)
+    bucket: storage.Bucket 호환 객체 (blob -> upload_from_string/make_public/public_url)
+    server_timestamp: 문서에 넣을 created_at 값 (firestore.SERVER_TIMESTAMP)
+    metrics: metrics.SpanRecorder (선택). storage_upload / firestore_batch 단계를 기록합니다
+    blob_cache_ttl: 올렸거나 있다고 확인한 객체를 다시 확인하지 않는 시간(초).
+        storage_gc.py의 min_age보다 짧아야 GC가 막 재사용된 객체를 지우지 않습니다
+    done_retention: 완료된 작업 행을 남겨 두는 시간(초, 넣은 시각 기준). 백그라운드 스레드가 한 시간마다 정리합니다
+    """
+
+    def __init__(self, path, db, bucket, server_timestamp=None, batch_size=20, upload_workers=4,
+                 flush_interval=0.5, max_attempts=5, base_delay=1.0, metrics=None, blob_cache_ttl=3600.0,
+                 done_retention=DONE_RETENTION):
+        self.db = db
+        self.bucket = bucket
+        self.server_timestamp = server_timestamp
+        self.batch_size = min(batch_size, 500)  # WriteBatch 최대 500건
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.metrics = metrics
+        self.blob_cache_ttl = blob_cache_ttl
+        self.done_retention = done_retention
+        self._purged = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._uploads = ThreadPoolExecutor(max_workers=upload_workers, thread_name_prefix="save-upload")
+        self._thread = None
+
+    # ------------------------------------------
+    # 요청 스레드 (Streamlit) 측 API
+    # ------------------------------------------
+    def enqueue(self, doc, image_bytes, storage_path, content_type, collection="math_dataset"):
+        """
+        문서와 이미지를 큐에 기록하고 (job_id, doc_id)를 반환합니다.
+        반환 시점에 이미 로컬 디스크에 commit 되어 있으므로 이것이 '저장 확인(ack)'입니다.
+        doc의 image_url은 업로드 후 채워집니다.
+        """
+        doc_id = new_doc_id()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO save_jobs (doc_id, collection, doc, image, storage_path, content_type, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (doc_id, collection, json.dumps(doc, ensure_ascii=False), image_bytes,
+                 storage_path, content_type, time.time()),
+            )
+            self._conn.commit()
+        self._wake.set()
+        return cur.lastrowid, doc_id
+
+    def enqueue_many(self, items, collection="math_dataset"):
+        """
+        items: [(doc, image_bytes, storage_path, content_type)] → [(job_id, doc_id)]
+        한 트랜잭션으로 기록하므로 모두 저장되거나 하나도 저장되지 않고,
+        연속된 작업이라 (batch_size 이하면) 같은 WriteBatch 한 번으로 Firestore에 기록됩니다.
+        """
+        created = time.time()
+        rows = [
+            (new_doc_id(), collection, json.dumps(doc, ensure_ascii=False), image_bytes,
+             storage_path, content_type, created)
+            for doc, image_bytes, storage_path, content_type in items
+        ]
+        ids = []
+        with self._lock:
+            try:
+                for row in rows:
+                    cur = self._conn.execute(
+                        "INSERT INTO save_jobs (doc_id, collection, doc, image, storage_path, content_type, created)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        row,
+                    )
+                    ids.append((cur.lastrowid, row[0]))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        self._wake.set()
+        return ids
+
+    def status(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT state, error FROM save_jobs WHERE id = ?", (job_id,)).fetchone()
+        return {"state": row[0], "error": row[1]} if row else None
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM save_jobs GROUP BY state").fetchall()
+            last_error = self._conn.execute(
+                "SELECT error FROM save_jobs WHERE error IS NOT NULL AND state != 'done' ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        counts = dict(rows)
+        return {
+            "pending": counts.get("pending", 0) + counts.get("uploaded", 0),
+            "failed": counts.get("failed", 0),
+            "done": counts.get("done", 0),
+            "last_error": last_error[0] if last_error else None,
+        }
+
+    def queued_drive_file_ids(self):
+        """대기열에 들어온(실패 제외) 문서의 drive_file_id 집합. 아직 Firestore에 없는 저장분도 포함됩니다."""
+        with self._lock:
+            rows = self._conn.execute("SELECT doc FROM save_jobs WHERE state != 'failed'").fetchall()
+        return {json.loads(row[0]).get("drive_file_id") for row in rows} - {None}
+
+    def retry_failed(self):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE save_jobs SET state = CASE WHEN image_url IS NULL THEN 'pending' ELSE 'uploaded' END,"
+                " attempts = 0, next_attempt = 0 WHERE state = 'failed'"
+            )
+            self._conn.commit()
+        self._wake.set()
+
+    def purge(self, now=None):
+        """
+        done_retention이 지난 완료 작업과 blob_cache_ttl이 지난 known_blobs 행을 지웁니다.
+        반환: 지운 작업 수
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM save_jobs WHERE state = 'done' AND created < ?", (now - self.done_retention,)
+            )
+            self._conn.execute("DELETE FROM known_blobs WHERE checked < ?", (now - self.blob_cache_ttl,))
+            self._conn.commit()
+        self._purged = now
+        return cur.rowcount
+
+    # ------------------------------------------
+    # 백그라운드 플러시
+    # ------------------------------------------
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="save-queue", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._uploads.shutdown(wait=False)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if time.time() - self._purged >= PURGE_INTERVAL:
+                    self.purge()
+                flushed = self.flush_once()
+            except Exception:
+                flushed = 0
+            if not flushed:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+
+    def _due_jobs(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, doc_id, collection, doc, image, storage_path, content_type, image_url, attempts"
+                " FROM save_jobs WHERE state IN ('pending', 'uploaded') AND next_attempt <= ?"
+                " ORDER BY id LIMIT ?",
+                (time.time(), self.batch_size),
+            ).fetchall()
+
+    def _known_url(self, storage_path):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT image_url FROM known_blobs WHERE storage_path = ? AND checked > ?",
+                (storage_path, time.time() - self.blob_cache_ttl),
+            ).fetchone()
+        return row[0] if row else None
+
+    def _remember(self, storage_path, url):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO known_blobs (storage_path, image_url, checked) VALUES (?, ?, ?)",
+                (storage_path, url, time.time()),
+            )
+            self._conn.commit()
+
+    def _upload(self, storage_path, image, content_type):
+        with maybe_span(self.metrics, "storage_upload", bytes=len(image)) as tags:
+            url = self._known_url(storage_path)
+            if url:
+                tags["skipped"] = "cache"
+                return url
+            blob = self.bucket.blob(storage_path)
+            if blob.exists():
+                tags["skipped"] = "exists"
+            else:
+                blob.upload_from_string(image, content_type=content_type)
+            # 이미 있던 객체도 다시 공개 처리합니다 (이전 업로드가 make_public 전에 끊겼을 수 있고,
+            # 메타데이터 수정 시각이 갱신되어 GC가 방금 재사용된 객체를 지우지 않습니다)
+            blob.make_public()
+            self._remember(storage_path, blob.public_url)
+            return blob.public_url
+
+    def _fail(self, job_ids_attempts, error):
+        with self._lock:
+            for job_id, attempts in job_ids_attempts:
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    self._conn.execute(
+                        "UPDATE save_jobs SET state = 'failed', attempts = ?, error = ? WHERE id = ?",
+                        (attempts, error, job_id),
+                    )
+                else:
+                    self._conn.execute(
+                        "UPDATE save_jobs SET attempts = ?, error = ?, next_attempt = ? WHERE id = ?",
+                        (attempts, error, time.time() + backoff_delay(attempts - 1, self.base_delay), job_id),
+                    )
+            self._conn.commit()
+
+    def flush_once(self):
+        """대기 중인 작업 한 묶음을 처리하고 완료된 건수를 반환합니다."""
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        jobs = self._due_jobs()
+        if not jobs:
+            return 0
+
+        # 1. 업로드 (아직 URL이 없는 작업만, 병렬). 같은 경로(같은 이미지)는 한 번만 올립니다
+        urls = {job[0]: job[7] for job in jobs}
+        by_path = {}
+        futures = {}
+        for job in jobs:
+            if job[7] is None:
+                if job[5] not in by_path:
+                    by_path[job[5]] = self._uploads.submit(self._upload, job[5], job[4], job[6])
+                futures[job[0]] = by_path[job[5]]
+        for job in jobs:
+            future = futures.get(job[0])
+            if future is None:
+                continue
+            try:
+                urls[job[0]] = future.result()
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE save_jobs SET image_url = ?, state = 'uploaded' WHERE id = ?",
+                        (urls[job[0]], job[0]),
+                    )
+                    self._conn.commit()
+            except Exception as e:
+                urls[job[0]] = None
+                self._fail([(job[0], job[8])], f"업로드 실패: {e}")
+
+        # 2. Firestore WriteBatch 커밋
+        ready = [job for job in jobs if urls[job[0]]]
+        if not ready:
+            return 0
+        batch = self.db.batch()
+        for job in ready:
+            doc = json.loads(job[3])
+            doc["image_url"] = urls[job[0]]
+            if self.server_timestamp is not None:
+                doc["created_at"] = self.server_timestamp
+            batch.set(self.db.collection(job[2]).document(job[1]), doc)
+        try:
+            with maybe_span(self.metrics, "firestore_batch", docs=len(ready)):
+                batch.commit()
+        except Exception as e:
+            self._fail([(job[0], job[8]) for job in ready], f"Firestore 기록 실패: {e}")
+            return 0
+
+        with self._lock:
+            # 완료된 작업은 이미지 바이트를 지워 큐 파일이 커지지 않게 합니다
+            self._conn.executemany(
+                "UPDATE save_jobs SET state = 'done', image = NULL, error = NULL WHERE id = ?",
+                [(job[0],) for job in ready],
+            )
+            self._conn.commit()
+        return len(ready)
+
+    def drain(self, timeout=30.0):
+        """대기열이 빌 때까지 (또는 timeout까지) 동기적으로 비웁니다. 테스트/종료 시 사용."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if not self.stats()["pending"]:
+                return True
+            if not self.flush_once():
+                time.sleep(0.05)
+        return False
@@ -0,0 +1,100 @@
+"""
+cropped_problems/ Storage 객체 정리 (참조 카운트 GC).
+
+이미지 경로가 내용 해시(labeling.content_path)라서 여러 문서가 같은 객체를 함께 가리킬 수 있습니다.
+math_dataset 문서마다 storage_path(예전 문서는 image_url에서 복원)를 세어 참조 수를 만들고,
+참조가 0인 객체만 지웁니다. 예전 방식(파일명_타임스탬프)으로 중복 업로드되어 버려진 객체도 함께 정리됩니다.
+
+- 기본은 미리보기(dry run). 실제로 지우려면 --delete
+- 메타데이터 수정 시각이 --min-age-hours보다 최근인 객체는 건너뜁니다.
+  저장 대기열이 아직 문서를 기록하지 않았거나, 업로드를 건너뛰고 막 재사용한 객체일 수 있기 때문입니다.
+  (SaveQueue는 재사용할 때 make_public으로 수정 시각을 갱신하고, blob_cache_ttl은 이 값보다 짧습니다)
+
+사용 예:
+    python storage_gc.py
+    python storage_gc.py --delete
+"""
+import argparse
+import sys
+import time
+from collections import Counter
+
+from export_dataset import BUCKET_NAME, COLLECTION, KEY_FILE, storage_path_of
+from labeling import STORAGE_PREFIX
+
+DEFAULT_MIN_AGE = 24 * 3600.0
+
+
+def reference_counts(db, bucket_name=None, collection=COLLECTION):
+    """Storage 경로 → 그 경로를 가리키는 문서 수"""
+    refs = Counter()
+    for snap in db.collection(collection).select(["storage_path", "image_url"]).stream():
+        path = storage_path_of(snap.to_dict() or {}, bucket_name)
+        if path:
+            refs[path] += 1
+    return refs
+
+
+def collect_garbage(db, bucket, collection=COLLECTION, prefix=STORAGE_PREFIX + "/", min_age=DEFAULT_MIN_AGE,
+                    delete=False, now=None, on_delete=None):
+    """
+    참조가 없는 prefix 아래 객체를 찾아 (delete=True면) 지웁니다.
+    반환: objects / referenced / shared(2개 이상 문서가 공유) / orphans / recent(min_age 미만이라 보류) / deleted / freed_bytes
+    """
+    now = time.time() if now is None else now
+    refs = reference_counts(db, getattr(bucket, "name", None), collection)
+    summary = {"objects": 0, "referenced": 0, "shared": 0, "orphans": 0, "recent": 0, "deleted": 0, "freed_bytes": 0}
+    for blob in bucket.list_blobs(prefix=prefix):
+        summary["objects"] += 1
+        count = refs.get(blob.name, 0)
+        if count:
+            summary["referenced"] += 1
+            summary["shared"] += count > 1
+            continue
+        summary["orphans"] += 1
+        updated = blob.updated.timestamp() if blob.updated is not None else None
+        if updated is None or now - updated < min_age:
+            summary["recent"] += 1
+            continue
+        if delete:
+            size = blob.size or 0
+            blob.delete()
+            summary["deleted"] += 1
+            summary["freed_bytes"] += size
+            if on_delete:
+                on_delete(blob.name)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="참조되지 않는 cropped_problems/ 객체 정리")
+    parser.add_argument("--key-file", default=KEY_FILE, help="서비스 계정 키 파일")
+    parser.add_argument("--collection", default=COLLECTION)
+    parser.add_argument("--prefix", default=STORAGE_PREFIX + "/")
+    parser.add_argument("--min-age-hours", type=float, default=DEFAULT_MIN_AGE / 3600,
+                        help="이보다 최근에 수정된 객체는 참조가 없어도 남김")
+    parser.add_argument("--delete", action="store_true", help="실제로 삭제 (없으면 미리보기)")
+    args = parser.parse_args(argv)
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore, storage
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(args.key_file), {'storageBucket': BUCKET_NAME})
+
+    summary = collect_garbage(
+        firestore.client(), storage.bucket(), collection=args.collection, prefix=args.prefix,
+        min_age=args.min_age_hours * 3600, delete=args.delete,
+        on_delete=lambda name: print(f"🗑️ {name}", flush=True),
+    )
+    print(f"객체 {summary['objects']}개: 참조 {summary['referenced']}개 (공유 {summary['shared']}개), "
+          f"참조 없음 {summary['orphans']}개 (최근 수정이라 보류 {summary['recent']}개)")
+    if args.delete:
+        print(f"삭제: {summary['deleted']}개 ({summary['freed_bytes'] / 1e6:.1f}MB)")
+    else:
+        print(f"미리보기: {summary['orphans'] - summary['recent']}개 삭제 대상. 지우려면 --delete")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
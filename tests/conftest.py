@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 저장소 루트의 모듈(save_queue, leases ...)을 패키지 없이 바로 import 합니다
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,64 @@
+import pytest
+
+import drive_io
+from drive_sync import FolderSync
+from fakes import FakeDriveService, FakeHttpError
+
+SRC = "src"
+
+
+@pytest.fixture
+def drive():
+    return FakeDriveService.with_images(SRC, 3)
+
+
+def start(drive):
+    sync = FolderSync(SRC)
+    token = drive_io.start_page_token(drive)
+    version = sync.reset(list(drive_io.iter_drive_images(drive, SRC)), token)
+    return sync, version
+
+
+def test_poll_merges_changes(drive):
+    sync, version = start(drive)
+    drive.add_file(SRC, {"id": "new", "name": "new.jpg", "mimeType": "image/jpeg"})
+    drive.delete_file("file_000000")
+    assert sync.poll(drive) == 2
+    upserts, removed, _ = sync.changes_since(version)
+    assert [f["id"] for f in upserts] == ["new"] and removed == {"file_000000"}
+
+
+def test_failed_poll_waits_for_interval(drive):
+    sync, _ = start(drive)
+    drive.changes_calls = 0
+    sync.token = "broken"  # 가짜 서비스의 changes().list가 ValueError를 냄
+    with pytest.raises(ValueError):
+        sync.poll(drive, min_interval=60)
+    assert sync.poll(drive, min_interval=60) is None
+    assert drive.changes_calls == 1  # 실패한 한 번뿐
+
+
+def test_rejected_token_resyncs_from_full_list(drive):
+    sync, version = start(drive)
+    drive.delete_file("file_000001")
+    drive.add_file(SRC, {"id": "new", "name": "new.jpg", "mimeType": "image/jpeg"})
+    drive.change_floor = len(drive.change_log)  # 기존 토큰 만료
+    assert sync.poll(drive) == 2
+    assert sync.token == str(len(drive.change_log))
+    assert sync.changes_since(version) is None  # 세션은 스냅숏과 비교
+    files, latest = sync.snapshot()
+    assert [f["id"] for f in files] == ["file_000000", "file_000002", "new"] and latest > version
+    drive.delete_file("new")
+    assert sync.poll(drive) == 1
+
+
+def test_rate_limit_does_not_resync(drive, monkeypatch):
+    sync, version = start(drive)
+
+    def limited(*args, **kwargs):
+        raise FakeHttpError(429, "Rate Limit Exceeded")
+
+    monkeypatch.setattr(drive_io, "iter_changes", limited)
+    with pytest.raises(FakeHttpError):
+        sync.poll(drive)
+    assert sync.version == version
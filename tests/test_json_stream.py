@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from json_stream import IncrementalJsonParser, loads_tolerant
+
+
+def stream(text, size=1):
+    parser = IncrementalJsonParser()
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    return parser
+
+
+def decode(text):
+    """loads_tolerant와 한 글자씩 받은 IncrementalJsonParser가 같은 결과를 내는지 확인하고 그 결과를 반환"""
+    value = loads_tolerant(text)
+    parser = stream(text)
+    assert parser.done and parser.error is None
+    assert parser.result == (value[0] if isinstance(value, list) else value)
+    assert parser.text == text
+    return value
+
+
+def test_latex_commands_inside_and_outside_math():
+    text = r'{"problem_text": "$\frac{1}{2} \theta \neq \to x$ \frac \theta \neq \to"}'
+    assert decode(text)["problem_text"] == (
+        "$\\frac{1}{2} \\theta \\neq \\to x$ \\frac \theta \neq \to"
+    )
+
+
+def test_escaped_backslash_before_closing_quote():
+    # "C:\\" 뒤의 따옴표는 문자열 끝. 앞 문자열의 $가 다음 문자열의 수식 판단에 넘어가지 않아야 합니다
+    text = r'{"a": "$x\\", "b": "\theta", "c": "$\theta$"}'
+    assert decode(text) == {"a": "$x\\", "b": "\theta", "c": "$\\theta$"}
+
+
+def test_fence_and_list_wrapper():
+    text = '```json\n[{"problem_text": "$\\alpha$", "n": 2}]\n```'
+    assert decode(text) == [{"problem_text": "$\\alpha$", "n": 2}]
+
+
+def test_surrogate_pair():
+    text = r'{"a": "x\uD83D\uDE00y"}'
+    assert decode(text) == {"a": "x😀y"}
+    # 두 \u 사이에서 끊겨도 짝이 맞춰진 뒤에만 보여줍니다
+    parser = IncrementalJsonParser()
+    assert parser.feed(r'{"a": "x\uD83D') == {"a": "x"}
+    assert parser.feed(r'\uDE00y"}') == {"a": "x😀y"}
+
+
+@pytest.mark.parametrize("text", [
+    r'{"a": "$\theta + \nu$\nfig \u00e9\\ \"q\" $$\neq$$"}',
+    r'{"a": "\frac{1}{2} \beta \b \uD83D\uDE00"}',
+])
+def test_every_chunk_split(text):
+    expected = loads_tolerant(text)
+    for cut in range(1, len(text)):
+        parser = IncrementalJsonParser()
+        parser.feed(text[:cut])
+        parser.feed(text[cut:])
+        assert parser.result == expected, cut
+
+
+def test_split_at_backslash_waits_for_the_command():
+    parser = IncrementalJsonParser()
+    assert parser.feed('{"a": "$x \\') == {"a": "$x "}
+    assert parser.feed("the") == {"a": "$x "}  # \the... 가 \theta인지 아직 모름
+    assert parser.feed("ta$") == {"a": "$x \\theta$"}
+    parser = IncrementalJsonParser()
+    assert parser.feed('{"a": "x\\u00') == {"a": "x"}
+    assert parser.feed('e9"}') == {"a": "xé"}
+
+
+def test_truncated_input():
+    text = '{"problem_text": "$\\frac{1}{2}$ 를 계산", "diagram_code": "fig'
+    parser = stream(text, size=5)
+    assert not parser.done and parser.error is None
+    assert parser.snapshot() == {"problem_text": "$\\frac{1}{2}$ 를 계산", "diagram_code": "fig"}
+    assert parser.current_key == "diagram_code"
+    with pytest.raises(ValueError):
+        loads_tolerant(text)
+
+
+@pytest.mark.parametrize("value", [
+    {"problem_text": "$$\nlim_{x}$$", "diagram_code": "import x\nfig, ax = 1\tb"},
+    {"problem_text": "$\\frac{1}{2}$ \\\\ \"인용\" $\\theta$", "n": [1, {"k": "$\n$"}], "ok": True},
+    {"problem_text": "$x$\ntheta \r\n 😀 é"},
+])
+def test_valid_json_is_left_alone(value):
+    for text in (json.dumps(value), json.dumps(value, ensure_ascii=False)):
+        assert decode(text) == value
+
+
+def test_error_reports_position_in_whole_response():
+    parser = stream('{"a": 1 x', size=3)
+    assert parser.error is not None and "8" in parser.error
@@ -0,0 +1,73 @@
+import pytest
+
+from leases import MemoryLeaseStore
+
+FILES = [f"file_{i:06d}" for i in range(6)]
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def store(clock):
+    return MemoryLeaseStore(ttl=60, clock=clock)
+
+
+def test_sessions_claim_disjoint_files(store):
+    a = store.claim("a", FILES, 2)
+    b = store.claim("b", FILES, 2)
+    c = store.claim("c", FILES, 5)
+    assert a == FILES[:2] and b == FILES[2:4] and c == FILES[4:]
+    assert store.held_by_others("a", FILES) == set(FILES[2:])
+    # 이미 내 것인 파일은 다시 받아도 그대로
+    assert store.claim("a", FILES, 2) == FILES[:2]
+
+
+def test_expired_lease_is_handed_over(store, clock):
+    store.claim("a", FILES[:2], 2)
+    clock.advance(30)
+    assert store.renew("a", FILES[:1]) == FILES[:1]
+    clock.advance(45)  # FILES[1]만 만료 (갱신한 FILES[0]은 15초 남음)
+    assert store.claim("b", FILES[:2], 2) == FILES[1:2]
+    assert store.renew("a", FILES[:2]) == FILES[:1]
+    assert store.held_by_others("b", FILES[:2]) == {FILES[0]}
+
+
+def test_done_lease_is_never_reissued(store, clock):
+    store.claim("a", FILES[:1], 1)
+    store.release("a", FILES[:1], done=True)
+    clock.advance(3600)
+    assert store.claim("a", FILES[:1], 1) == []
+    assert store.claim("b", FILES[:1], 1) == []
+    assert store.renew("a", FILES[:1]) == []
+    assert store.held_by_others("b", FILES[:1]) == set()
+    assert store.stats() == {"active": 0, "done": 1}
+
+
+def test_failed_move_is_released_and_reclaimed(store):
+    # 이동 배치가 최종 실패하면 보통 반납 → reconcile_failed_moves가 다시 잡음
+    store.claim("a", FILES[:2], 2)
+    store.release("a", FILES[:1], done=True)   # 옮겨진 파일
+    store.release("a", FILES[1:2], done=False)  # 실패한 파일
+    assert store.claim("a", FILES[:2], 2) == FILES[1:2]
+    assert store.claim("b", FILES[:2], 2) == []
+
+
+def test_release_ignores_other_owners(store):
+    store.claim("a", FILES[:1], 1)
+    store.release("b", FILES[:1], done=True)
+    assert store.claim("b", FILES[:1], 1) == []
+    assert store.renew("a", FILES[:1]) == FILES[:1]
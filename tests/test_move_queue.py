@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+import drive_io
+from fakes import FakeDriveService
+from move_queue import MoveBatcher
+
+SRC, DONE = "src", "done"
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    # thread_service는 스레드마다 서비스를 캐시하므로 테스트마다 비웁니다
+    monkeypatch.setattr(drive_io, "_local", threading.local())
+    return FakeDriveService.with_images(SRC, 4)
+
+
+def make_batcher(drive, **kwargs):
+    settled = []
+    kwargs.setdefault("base_delay", 0.05)
+    batcher = MoveBatcher(lambda: drive, on_settled=lambda *args: settled.append(args), **kwargs)
+    return batcher, settled
+
+
+def enqueue(batcher, drive, owner="me"):
+    for f in list(drive.folders[SRC]):
+        batcher.enqueue(f, SRC, DONE, owner=owner)
+
+
+def test_moves_settle_as_moved(drive):
+    batcher, settled = make_batcher(drive)
+    enqueue(batcher, drive)
+    assert batcher.flush_all() == 4
+    assert drive.folders[SRC] == [] and len(drive.folders[DONE]) == 4
+    assert drive.batch_calls == 1
+    assert settled == [("me", [f"file_{i:06d}" for i in range(4)], True)]
+    assert batcher.wait_settled(["file_000000", "file_000003"], timeout=0) == {"file_000000", "file_000003"}
+
+
+def test_failed_moves_back_off_before_retrying(drive, monkeypatch):
+    calls = []
+    real = drive_io.batch_move
+
+    def batch_move(service, moves):
+        calls.append(time.monotonic())
+        return real(service, moves)
+
+    monkeypatch.setattr(drive_io, "batch_move", batch_move)
+    drive.fail_ids = {"file_000001"}
+    batcher, _ = make_batcher(drive, max_attempts=3, base_delay=0.1)
+    enqueue(batcher, drive)
+
+    assert batcher.flush() == 3
+    assert batcher.flush() == 0  # 재시도 시각 전이라 보내지 않음
+    assert batcher.pending_ids() == {"file_000001"}
+    assert batcher.flush_all() == 0
+    # 두 번의 재시도는 각각 backoff_delay(0) >= 0.05초, backoff_delay(1) >= 0.1초 뒤
+    assert len(calls) == 3
+    assert calls[1] - calls[0] >= 0.05 and calls[2] - calls[1] >= 0.1
+
+
+def test_final_failure_goes_to_owner_and_settles_unmoved(drive):
+    drive.fail_ids = {"file_000002"}
+    batcher, settled = make_batcher(drive, max_attempts=2, base_delay=0)
+    enqueue(batcher, drive, owner="a")
+    batcher.flush_all()
+
+    assert ("a", ["file_000002"], False) in settled
+    assert batcher.take_failed("b") == []
+    failed = batcher.take_failed("a")
+    assert [item["file"]["id"] for item in failed] == ["file_000002"]
+    assert failed[0]["attempts"] == 2 and "403" in failed[0]["error"]
+    assert batcher.take_failed("a") == []
+    assert batcher.wait_settled(["file_000001", "file_000002"], timeout=0) == {"file_000001"}
+    assert batcher.stats() == {"pending": 0, "failed": 0, "moved": 3, "batches": 2}
+
+
+def test_wait_settled_waits_for_background_flush(drive):
+    drive.fail_ids = {"file_000000"}
+    batcher, _ = make_batcher(drive, flush_interval=0.02, base_delay=0.05)
+    batcher.start()
+    try:
+        enqueue(batcher, drive)
+        ids = [f"file_{i:06d}" for i in range(4)]
+        drive.fail_ids = set()  # 다음 재시도에서 성공
+        assert batcher.wait_settled(ids, timeout=5) == set(ids)
+    finally:
+        batcher.stop()
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from fakes import FakeBlob, FakeBucket, FakeFirestore, FakeWriteBatch
+from save_queue import SaveQueue
+
+DOC = {"drive_file_id": "file_1", "problem": "1+1"}
+PATH = "cropped_problems/abc.webp"
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "save_queue.sqlite3")
+
+
+def make_queue(path, db=None, bucket=None, **kwargs):
+    kwargs.setdefault("base_delay", 0)  # 백오프 없이 바로 다시 시도
+    return SaveQueue(path, db or FakeFirestore(), bucket or FakeBucket(), **kwargs)
+
+
+def test_upload_failures_end_failed_until_retry(queue_path, monkeypatch):
+    db, bucket = FakeFirestore(), FakeBucket()
+    queue = make_queue(queue_path, db, bucket, max_attempts=2)
+
+    def broken(self, data, content_type=None):
+        raise OSError("503")
+
+    monkeypatch.setattr(FakeBlob, "upload_from_string", broken)
+    job_id, doc_id = queue.enqueue(DOC, b"img", PATH, "image/webp")
+    assert queue.flush_once() == 0
+    assert queue.status(job_id)["state"] == "pending"
+    assert queue.flush_once() == 0
+    assert queue.status(job_id) == {"state": "failed", "error": "업로드 실패: 503"}
+    assert queue.stats()["failed"] == 1
+    assert queue.flush_once() == 0  # 실패한 작업은 더 시도하지 않음
+
+    monkeypatch.undo()
+    queue.retry_failed()
+    assert queue.drain(timeout=5)
+    assert queue.status(job_id)["state"] == "done"
+    doc = db.collection("math_dataset").document(doc_id).get().to_dict()
+    assert doc["image_url"].endswith(PATH)
+
+
+def test_uploaded_jobs_resume_without_reupload(queue_path):
+    bucket = FakeBucket()
+
+    class DownBatch(FakeWriteBatch):
+        def commit(self):
+            raise OSError("unavailable")
+
+    class DownFirestore(FakeFirestore):
+        def batch(self):
+            return DownBatch(self)
+
+    crashed = make_queue(queue_path, DownFirestore(), bucket)
+    job_id, doc_id = crashed.enqueue(DOC, b"img", PATH, "image/webp")
+    assert crashed.flush_once() == 0
+    assert crashed.status(job_id)["state"] == "uploaded"
+    crashed.stop()  # 프로세스가 죽은 것처럼 버리고 같은 큐 파일로 다시 엽니다
+
+    db = FakeFirestore()
+    resumed = make_queue(queue_path, db, bucket)
+    assert resumed.drain(timeout=5)
+    assert resumed.status(job_id)["state"] == "done"
+    assert bucket.uploads == 1
+    assert db.collection("math_dataset").document(doc_id).get().exists
+
+
+def test_purge_removes_old_done_jobs_only(queue_path):
+    queue = make_queue(queue_path, done_retention=3600)
+    done_id, _ = queue.enqueue(DOC, b"img", PATH, "image/webp")
+    assert queue.drain(timeout=5)
+    pending_id, _ = queue.enqueue(dict(DOC, drive_file_id="file_2"), b"img2", PATH + "2", "image/webp")
+
+    assert queue.purge() == 0
+    assert queue.queued_drive_file_ids() == {"file_1", "file_2"}
+    assert queue.purge(now=time.time() + 7200) == 1
+    assert queue.status(done_id) is None
+    assert queue.status(pending_id)["state"] == "pending"
+    assert queue.queued_drive_file_ids() == {"file_2"}